@@ -15,58 +15,124 @@ Author: CabaBot Team
 Version: 1.2.0
 """
 
+import time
+from core.startup import StartupTimer
+
+# Cronômetro do boot: começa antes dos imports pesados
+STARTUP = StartupTimer()
+
 import random
 import discord
 import asyncio
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import math
 import os
-import yt_dlp  # type: ignore[import-untyped]
-import spotipy  # type: ignore[import-untyped]
-from spotipy.oauth2 import SpotifyClientCredentials  # type: ignore[import-untyped]
+import signal
+import sys
+import threading
 from discord import app_commands
 from dotenv import load_dotenv, find_dotenv
 from pathlib import Path
-import json
-from typing import Dict, Any, List, Optional
-from dashboard.server import WebServer # Importa o servidor web
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from core.audio_profiles import AudioGovernor, AudioProfile
+from core.config_store import ConfigStore
+from core.extraction_chain import AttemptClock, ExtractionChain, ExtractionProfile
+from core.ffmpeg import FFmpegLease, FFmpegSupervisor
+from core.history import PlayHistoryStore
+from core.ipc import IpcServer, use_unix_socket
+from core.logs import SAMPLED, LogPipeline
+from core.monitor import LoopLagMonitor
+from core.pipeline import ordered_map
+from core.appendlog import AppendLog
+from core.ratelimit import AdmissionController, AdmissionResult
+from core.scheduler import ExtractionScheduler, Lane
+from core.sessions import SessionStore
+from core.settings import env_flag, env_float, env_int
+from core.sharding import ShardConfig
+from core.spotify import MatchStore, SpotifyResolver, parse_spotify_url, track_query
+from core.stream_cache import StreamCache, video_id_from_url
+from core.timers import TimerEntry, TimerScheduler
+from core.voice import VoiceConnections
+from core import tracing
+from core.tracing import Tracer
+from core.track_queue import TrackQueue, track_key
+from core.title_index import TitleIndex
+
+# yt-dlp, spotipy e o dashboard (aiohttp/jinja2) são importados só quando
+# usados pela primeira vez, fora do caminho crítico do boot.
+STARTUP.mark("imports")
 
 # Carrega as variáveis de ambiente do arquivo .env
 # find_dotenv() procura automaticamente na árvore de diretórios
 load_dotenv(find_dotenv())
 
+# Log com níveis por subsistema (LOG_LEVELS="voice=DEBUG,player=WARNING"),
+# escrito por uma thread para o stdout nunca segurar o event loop
+LOGS = LogPipeline(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    levels=os.getenv("LOG_LEVELS", ""),
+    sample_interval=env_float("LOG_SAMPLE_SECONDS", 10.0),
+    queue_size=env_int("LOG_QUEUE_SIZE", 10000),
+)
+LOGS.start()
+log = logging.getLogger("cababot")
+player_log = logging.getLogger("cababot.player")
+voice_log = logging.getLogger("cababot.voice")
+extraction_log = logging.getLogger("cababot.extraction")
+spotify_log = logging.getLogger("cababot.spotify")
+session_log = logging.getLogger("cababot.sessions")
+command_log = logging.getLogger("cababot.commands")
+dashboard_log = logging.getLogger("cababot.dashboard")
+timer_log = logging.getLogger("cababot.timers")
+
 # Define o caminho base do script e a localização do ffmpeg local
 SCRIPT_DIR = Path(__file__).parent
 LOCAL_FFMPEG_WIN = SCRIPT_DIR / "bin" / "ffmpeg" / "ffmpeg.exe"
 LOCAL_FFMPEG_NIX = SCRIPT_DIR / "bin" / "ffmpeg" / "ffmpeg"
 
-# Lógica de seleção do FFmpeg:
-# 1. Tenta usar o executável local (Windows)
-# 2. Tenta usar o executável local (Linux/Mac)
-# 3. Se não existir, assume que está no PATH do sistema
-if LOCAL_FFMPEG_WIN.exists():
-    FFMPEG_PATH = str(LOCAL_FFMPEG_WIN)
-    print(f"✅ Usando FFmpeg local (Windows): {FFMPEG_PATH}")
-elif LOCAL_FFMPEG_NIX.exists():
-    FFMPEG_PATH = str(LOCAL_FFMPEG_NIX)
-    print(f"✅ Usando FFmpeg local (Linux/Mac): {FFMPEG_PATH}")
-else:
-    FFMPEG_PATH = "ffmpeg"
-    print("✅ Usando FFmpeg do sistema (PATH)")
-
-# Configuração do Spotify
-spotify_client = None
-try:
-    if os.getenv("SPOTIPY_CLIENT_ID") and os.getenv("SPOTIPY_CLIENT_SECRET"):
-        spotify_client = spotipy.Spotify(
-            auth_manager=SpotifyClientCredentials(
-                client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-                client_secret=os.getenv("SPOTIPY_CLIENT_SECRET")
-            )
+
+@functools.lru_cache(maxsize=None)
+def _ffmpeg_path() -> str:
+    """
+    Caminho do executável do FFmpeg, descoberto na primeira reprodução.
+
+    1. Tenta usar o executável local (Windows)
+    2. Tenta usar o executável local (Linux/Mac)
+    3. Se não existir, assume que está no PATH do sistema
+    """
+    if LOCAL_FFMPEG_WIN.exists():
+        log.info("✅ Usando FFmpeg local (Windows): %s", LOCAL_FFMPEG_WIN)
+        return str(LOCAL_FFMPEG_WIN)
+    if LOCAL_FFMPEG_NIX.exists():
+        log.info("✅ Usando FFmpeg local (Linux/Mac): %s", LOCAL_FFMPEG_NIX)
+        return str(LOCAL_FFMPEG_NIX)
+    log.info("✅ Usando FFmpeg do sistema (PATH)")
+    return "ffmpeg"
+
+
+# Configuração do Spotify (o cliente só é criado na primeira consulta)
+SPOTIFY_CONFIGURED = bool(os.getenv("SPOTIPY_CLIENT_ID") and os.getenv("SPOTIPY_CLIENT_SECRET"))
+if not SPOTIFY_CONFIGURED:
+    spotify_log.warning("⚠️ Credenciais do Spotify não encontradas. Funcionalidade limitada.")
+
+
+def _make_spotify_client() -> Any:
+    """Cria o cliente do spotipy (roda numa thread, na primeira chamada à API)."""
+    import spotipy  # type: ignore[import-untyped]
+    from spotipy.oauth2 import SpotifyClientCredentials  # type: ignore[import-untyped]
+
+    client = spotipy.Spotify(
+        auth_manager=SpotifyClientCredentials(
+            client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+            client_secret=os.getenv("SPOTIPY_CLIENT_SECRET")
         )
-        print("✅ Cliente Spotify configurado com sucesso")
-    else:
-        print("⚠️ Credenciais do Spotify não encontradas. Funcionalidade limitada.")
-except Exception as e:
-    print(f"⚠️ Erro ao configurar Spotify: {e}")
+    )
+    spotify_log.info("✅ Cliente Spotify configurado com sucesso")
+    return client
 
 # Áudio a ser reproduzido quando o bot ficar online (padrão: vídeo do YouTube)
 STARTUP_AUDIO_URL = random.choice(["https://www.youtube.com/watch?v=YeJj7v3f-vA", "https://www.youtube.com/watch?v=6xoJCJYLzZw", "https://www.youtube.com/watch?v=biZlbJAdyTE", "https://www.youtube.com/watch?v=sR9KWAIFSfc", "https://www.youtube.com/watch?v=xmf99leO-Z0", "https://www.youtube.com/watch?v=8zslY2eYJ9M"])
@@ -74,8 +140,71 @@ STARTUP_AUDIO_URL = random.choice(["https://www.youtube.com/watch?v=YeJj7v3f-vA"
 # Path para configuração persistente por guild
 CONFIG_PATH = SCRIPT_DIR / "config.json"
 
+# Diretório para dados persistentes gerados pelo bot (caches, índices, etc)
+DATA_DIR = Path(os.getenv("CABABOT_DATA_DIR") or (SCRIPT_DIR / "data"))
+
+# URLs de stream do YouTube expiram (~6h); acima disso a faixa é re-extraída
+STREAM_URL_TTL = env_float("STREAM_URL_TTL", 4 * 3600.0)
+
+# Quantas faixas mais tocadas pré-aquecer no cache de extração ao iniciar
+HISTORY_PREWARM_TOP_N = env_int("HISTORY_PREWARM_TOP_N", 20)
+
+# Shards do gateway deste processo (SHARD_COUNT, SHARD_IDS, SHARD_GROUP)
+SHARDING = ShardConfig.from_env()
+# Com vários processos nos mesmos arquivos, só o coordenador compacta os logs
+AppendLog.compact_on_load = env_flag("CABABOT_COMPACT_LOGS", not SHARDING.multiprocess)
+
+# Dashboard: embedded (no loop do bot), ipc, process (processo separado) ou off
+DASHBOARD_MODE = (os.getenv("DASHBOARD_MODE") or "embedded").strip().lower()
+DASHBOARD_IPC_PATH = Path(
+    os.getenv("DASHBOARD_IPC_PATH")
+    or DATA_DIR / (f"dashboard-{SHARDING.group}.sock" if SHARDING.multiprocess else "dashboard.sock")
+)
+DASHBOARD_IPC_PORT = env_int("DASHBOARD_IPC_PORT", 8790 + SHARDING.group)
+# X-Forwarded-For só vale atrás do coordenador de shards (que o preenche) ou
+# de um proxy reverso configurado para isso; fora daí o header é do cliente
+DASHBOARD_TRUST_FORWARDED = env_flag("DASHBOARD_TRUST_FORWARDED", SHARDING.multiprocess)
+
+# Timers: limite de duração, timers por usuário, antecedência da extração do
+# alarme e atraso máximo para ainda tocar um timer que venceu com o bot fora
+TIMER_MAX_SECONDS = env_int("TIMER_MAX_SECONDS", 1200)
+TIMER_MAX_PER_USER = env_int("TIMER_MAX_PER_USER", 10)
+TIMER_PREPARE_LEAD = env_float("TIMER_PREPARE_LEAD", 30.0)
+TIMER_MAX_LATE = env_float("TIMER_MAX_LATE", 300.0)
+
+# Snapshots da fila para retomar a reprodução após reinício/crash
+SESSION_RESTORE_ENABLED = env_flag("SESSION_RESTORE_ENABLED", True)
+SESSION_SNAPSHOT_INTERVAL = env_float("SESSION_SNAPSHOT_INTERVAL", 10.0)
+
+# Expansão de playlists/álbuns do Spotify
+SPOTIFY_COLLECTION_LIMIT = env_int("SPOTIFY_COLLECTION_LIMIT", 100)
+SPOTIFY_MATCH_CONCURRENCY = env_int("SPOTIFY_MATCH_CONCURRENCY", 4)
+
+# Traces dos pedidos (comando -> primeiro áudio): quantos guardar por guild e
+# exportação opcional em data/traces.jsonl (um arquivo por processo de shards)
+TRACE_PER_GUILD = env_int("TRACE_PER_GUILD", 50)
+TRACE_AUDIO_TIMEOUT = env_float("TRACE_AUDIO_TIMEOUT", 30.0)
+TRACE_EXPORT_PATH = (
+    DATA_DIR / (f"traces-{SHARDING.group}.jsonl" if SHARDING.multiprocess else "traces.jsonl")
+    if env_flag("TRACE_EXPORT", False) else None
+)
+
+# Playlists/mixes do YouTube: quantas entradas ler e de quanto em quanto tempo
+# (s) a mensagem de progresso do /musica é editada
+PLAYLIST_LIMIT = env_int("PLAYLIST_LIMIT", 20)
+PLAYLIST_PROGRESS_INTERVAL = env_float("PLAYLIST_PROGRESS_INTERVAL", 1.5)
+
+# Conexão de voz que caiu: quanto esperar o reconnect automático do discord.py
+# antes de desconectar e conectar de novo
+VOICE_RECONNECT_GRACE = env_float("VOICE_RECONNECT_GRACE", 5.0)
+
+# Processos FFmpeg: limite global (0 = sem limite; acima dele as reproduções
+# esperam vaga), intervalo da faxina/medição e tempo até matar um abandonado
+FFMPEG_MAX_PROCESSES = env_int("FFMPEG_MAX_PROCESSES", 0)
+FFMPEG_SWEEP_INTERVAL = env_float("FFMPEG_SWEEP_INTERVAL", 10.0)
+FFMPEG_STALE_SECONDS = env_float("FFMPEG_STALE_SECONDS", 30.0)
+
 # Configurações reutilizáveis para yt-dlp (evita duplicação de código)
-# 'client': 'android' ajuda a evitar erros 403 Forbidden do YouTube
 YTDLP_OPTIONS = {
     'format': 'bestaudio[ext=m4a]/bestaudio/best',
     'noplaylist': True,
@@ -90,47 +219,85 @@ YTDLP_OPTIONS = {
     }
 }
 
+# Perfis de extração, tentados em ordem quando o anterior falha (403, cliente
+# estrangulado, timeout). Um perfil com falhas seguidas é pulado por
+# EXTRACTION_BREAKER_COOLDOWN segundos (ver core/extraction_chain.py).
+# Outros clientes do player (ex.: 'android') ajudam a fugir de 403 do YouTube.
+# EXTRACTION_PROFILES escolhe e ordena os perfis pelo nome.
+EXTRACTION_TIMEOUT = env_float("EXTRACTION_TIMEOUT", 15.0)
+_EXTRACTION_PROFILES = {
+    profile.name: profile
+    for profile in (
+        ExtractionProfile("default", {}, EXTRACTION_TIMEOUT),
+        ExtractionProfile(
+            "android",
+            {'format': 'bestaudio/best', 'extractor_args': {'youtube': {'player_client': ['android']}}},
+            EXTRACTION_TIMEOUT,
+        ),
+        ExtractionProfile(
+            "ios",
+            {'format': 'bestaudio/best', 'extractor_args': {'youtube': {'player_client': ['ios']}}},
+            EXTRACTION_TIMEOUT,
+        ),
+        ExtractionProfile(
+            "mweb",
+            {'format': 'bestaudio/best', 'extractor_args': {'youtube': {'player_client': ['mweb']}}},
+            EXTRACTION_TIMEOUT * 1.5,
+        ),
+    )
+}
+EXTRACTION_PROFILES = tuple(
+    _EXTRACTION_PROFILES[name.strip()]
+    for name in os.getenv("EXTRACTION_PROFILES", "default,android,ios,mweb").split(",")
+    if name.strip() in _EXTRACTION_PROFILES
+) or tuple(_EXTRACTION_PROFILES.values())
+EXTRACTION_MAX_ATTEMPTS = env_int("EXTRACTION_MAX_ATTEMPTS", 3)
+EXTRACTION_RETRY_RATIO = env_float("EXTRACTION_RETRY_RATIO", 0.2)
+EXTRACTION_BREAKER_COOLDOWN = env_float("EXTRACTION_BREAKER_COOLDOWN", 30.0)
+# Hedge (só pedidos interativos): passou do percentil da latência recente sem
+# resposta, dispara uma segunda extração em paralelo e fica com a primeira
+EXTRACTION_HEDGE = env_flag("EXTRACTION_HEDGE", False)
+EXTRACTION_HEDGE_PERCENTILE = env_float("EXTRACTION_HEDGE_PERCENTILE", 95.0)
+EXTRACTION_HEDGE_MIN_DELAY = env_float("EXTRACTION_HEDGE_MIN_DELAY", 0.5)
+# Erros do yt-dlp que nenhum outro perfil resolve: o vídeo em si não está disponível
+_PERMANENT_EXTRACTION_ERRORS = (
+    "video unavailable", "private video", "has been removed", "members-only",
+    "unsupported url", "is not a valid url",
+)
+
 # Configurações reutilizáveis para FFmpeg
 FFMPEG_OPTIONS = {
     'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
-    # -af "loudnorm...": Normaliza o áudio para -14 LUFS (padrão confortável)
-    # -loglevel error: Reduz o lixo no terminal
-    'options': '-vn -loglevel error -af "loudnorm=I=-14:TP=-1.5:LRA=11"',
+    # -loglevel error: Reduz o lixo no terminal (o -af vem do perfil de áudio)
+    'options': '-vn -loglevel error',
 }
 
-def load_config() -> Dict[str, Any]:
-    """Carrega o arquivo de configuração (JSON). Retorna dicionário vazio se não existir."""
-    try:
-        if CONFIG_PATH.exists():
-            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except Exception:
-        # Se houver problema ao ler, retorna configuração vazia
-        pass
-    return {}
-
-
-def save_config(cfg: Dict[str, Any]) -> None:
-    """Salva o dicionário de configuração no arquivo JSON (assíncrono em executor)."""
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            loop.run_in_executor(None, lambda: _save_sync(cfg))
-        else:
-             _save_sync(cfg)
-    except RuntimeError:
-        _save_sync(cfg)
-
-def _save_sync(cfg: Dict[str, Any]):
-    try:
-        with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-            json.dump(cfg, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"Erro ao salvar config: {e}")
+# Perfis de áudio, do mais caro ao mais barato. Sob pressão de CPU ou com
+# underruns, as streams novas descem de perfil (ver core/audio_profiles.py):
+# - full: loudnorm normaliza para -14 LUFS (padrão confortável)
+# - light: sem loudnorm e com um resampler mais simples
+# - opus: o FFmpeg já entrega Opus (cópia direta se a origem for Opus), sem
+#   a codificação em Python do discord.py
+AUDIO_PROFILES = (
+    AudioProfile("full", filters="loudnorm=I=-14:TP=-1.5:LRA=11"),
+    AudioProfile("light", filters="aresample=48000:filter_size=8"),
+    AudioProfile("opus", filters="aresample=48000:filter_size=8", opus=True),
+)
+# Fixa um perfil (full, light ou opus); vazio = adaptação automática
+AUDIO_PROFILE = os.getenv("AUDIO_PROFILE", "").strip().lower() or None
+AUDIO_CPU_HIGH = env_float("AUDIO_CPU_HIGH", 85.0)
+AUDIO_CPU_LOW = env_float("AUDIO_CPU_LOW", 60.0)
+AUDIO_UNDERRUN_HIGH = env_float("AUDIO_UNDERRUN_HIGH", 0.5)
+AUDIO_PROFILE_COOLDOWN = env_float("AUDIO_PROFILE_COOLDOWN", 30.0)
 
+# Custo (em fichas do token bucket) de cada pedido que dispara extração.
+# Playlists expandem várias entradas de uma vez, então custam mais.
+ADMISSION_TRACK_COST = env_float("ADMISSION_TRACK_COST", 1.0)
+ADMISSION_PLAYLIST_COST = env_float("ADMISSION_PLAYLIST_COST", 5.0)
 
-# Carrega configuração inicial na memória
-_CONFIG = load_config()
+# Configuração persistente: globais no config.json, por guild num log à parte
+CONFIG = ConfigStore(CONFIG_PATH, DATA_DIR / "guilds.jsonl", debounce=env_float("CONFIG_SAVE_DELAY", 1.0))
+CONFIG.load()
 
 
 def guild_startup_enabled(guild_id: int) -> bool:
@@ -138,18 +305,32 @@ def guild_startup_enabled(guild_id: int) -> bool:
 
     Prioriza configuração por guild; se ausente, retorna True por padrão.
     """
-    key = str(guild_id)
-    guilds = _CONFIG.get("guilds", {})
-    return bool(guilds.get(key, True))
+    return bool(CONFIG.guild(guild_id).get('startup_audio', True))
 
 
 def set_guild_startup(guild_id: int, enabled: bool) -> None:
-    """Define e persiste a configuração de startup para uma guild."""
-    key = str(guild_id)
-    if "guilds" not in _CONFIG:
-        _CONFIG["guilds"] = {}
-    _CONFIG["guilds"][key] = bool(enabled)
-    save_config(_CONFIG)
+    """Define a configuração de startup para uma guild (gravada em segundo plano)."""
+    CONFIG.set_guild(guild_id, 'startup_audio', bool(enabled))
+
+
+# /fila: faixas por página, páginas montadas guardadas por guild e por quanto
+# tempo (s) os botões de navegação respondem
+QUEUE_PAGE_SIZE = 10
+QUEUE_PAGE_CACHE = env_int("QUEUE_PAGE_CACHE", 16)
+QUEUE_VIEW_TIMEOUT = env_float("QUEUE_VIEW_TIMEOUT", 300.0)
+
+# Padrão para guilds que não escolheram com /duplicatas
+QUEUE_ALLOW_DUPLICATES = env_flag("QUEUE_ALLOW_DUPLICATES", True)
+
+
+def guild_allows_duplicates(guild_id: int) -> bool:
+    """Retorna True se a guild aceita a mesma música mais de uma vez na fila."""
+    return bool(CONFIG.guild(guild_id).get('allow_duplicates', QUEUE_ALLOW_DUPLICATES))
+
+
+def set_guild_duplicates(guild_id: int, allowed: bool) -> None:
+    """Define se a guild aceita músicas repetidas na fila (gravada em segundo plano)."""
+    CONFIG.set_guild(guild_id, 'allow_duplicates', bool(allowed))
 
 # Obtém o token do Discord das variáveis de ambiente
 # Aceita tanto TOKEN quanto DISCORD_TOKEN como nomes de variável
@@ -165,10 +346,15 @@ TOKEN = _token_raw.strip().strip('"').strip("'")
 
 # Valida que o token foi carregado com sucesso
 # Exibe apenas o comprimento por segurança (nunca exibe o token real)
-print(f"✅ TOKEN carregado com sucesso ({len(TOKEN)} caracteres)")
+log.info("✅ TOKEN carregado com sucesso (%d caracteres)", len(TOKEN))
+STARTUP.mark("config")
+
 
+# Sharding muda só a classe base; o resto do bot não precisa saber
+_ClientBase = discord.AutoShardedClient if SHARDING.enabled else discord.Client
 
-class CabaBot(discord.Client):
+
+class CabaBot(_ClientBase):  # type: ignore[valid-type,misc]
     """
     Cliente Discord customizado com suporte a slash commands e gerenciamento de filas.
     
@@ -177,7 +363,7 @@ class CabaBot(discord.Client):
         
     Atributos:
         tree (app_commands.CommandTree): Árvore de comandos para slash commands
-        music_queue (dict): Dicionário que armazena filas de música por guild ID
+        music_queue (dict): Filas de música (`TrackQueue`) por guild ID
     """
     
     def __init__(self):
@@ -194,10 +380,13 @@ class CabaBot(discord.Client):
         # Necessário para ler o conteúdo das mensagens em certos contextos
         intents.message_content = True
         
-        super().__init__(intents=intents)
+        if SHARDING.enabled:
+            super().__init__(intents=intents, shard_count=SHARDING.count, shard_ids=SHARDING.ids)
+        else:
+            super().__init__(intents=intents)
         self.tree = app_commands.CommandTree(self)
         # Fila de músicas por guild - permite gerenciar múltiplos servidores
-        self.music_queue = {}
+        self.music_queue: Dict[int, TrackQueue] = {}
         # Controle de loop por guild: {'guild_id': {'loop_track': bool, 'loop_queue': bool}}
         self.loop_control = {}
         # Música atual tocando por guild: {'guild_id': MusicTrack}
@@ -208,21 +397,174 @@ class CabaBot(discord.Client):
         self.last_player_message = {}
         # Histórico de músicas tocadas por guild: {'guild_id': [MusicTrack, ...]}
         self.music_history = {}
+        # Resoluções de stream em segundo plano (próxima faixa), por ID do vídeo
+        self.stream_prefetches: Dict[str, asyncio.Task] = {}
+        # Páginas já montadas do /fila por guild: (id da fila, versão, {página: embed})
+        self.queue_pages: Dict[int, Tuple[int, int, Dict[int, discord.Embed]]] = {}
+        # Monitor de lag do event loop (o detector de bloqueio é opcional)
+        self.loop_monitor = LoopLagMonitor(
+            interval=env_float("LOOP_LAG_INTERVAL", 0.5),
+            warn_ms=env_float("LOOP_LAG_WARN_MS", 100.0),
+            detect_blocking=env_flag("LOOP_BLOCKING_DETECTOR", False),
+            blocking_ms=env_float("LOOP_BLOCKING_THRESHOLD_MS", 250.0),
+        )
+        # Limites de extração por guild e por solicitante (token buckets)
+        self.admission = AdmissionController(
+            guild_rate=env_float("ADMISSION_GUILD_RATE", 0.5),
+            guild_burst=env_float("ADMISSION_GUILD_BURST", 10.0),
+            user_rate=env_float("ADMISSION_USER_RATE", 0.2),
+            user_burst=env_float("ADMISSION_USER_BURST", 5.0),
+            max_defer=env_float("ADMISSION_MAX_DEFER", 3.0),
+        )
+        # Pool de extração (yt-dlp) com lanes de prioridade
+        self.extraction = ExtractionScheduler(
+            workers=env_int("EXTRACTION_WORKERS", 4),
+            reserved_interactive=env_int("EXTRACTION_RESERVED_INTERACTIVE", 1),
+            aging=env_float("EXTRACTION_AGING_SECONDS", 10.0),
+        )
+        # Perfis do yt-dlp com fallback, circuit breaker e orçamento de retentativas
+        self.extraction_chain = ExtractionChain(
+            EXTRACTION_PROFILES,
+            max_attempts=EXTRACTION_MAX_ATTEMPTS,
+            retry_ratio=EXTRACTION_RETRY_RATIO,
+            breaker={'cooldown': EXTRACTION_BREAKER_COOLDOWN},
+            hedge_percentile=EXTRACTION_HEDGE_PERCENTILE,
+            hedge_min_delay=EXTRACTION_HEDGE_MIN_DELAY,
+        )
+        # Resolução do Spotify fora do loop, com cache por id e chamadas em lote
+        self.spotify = SpotifyResolver(
+            _make_spotify_client,
+            ttl=env_float("SPOTIFY_CACHE_TTL", 86400.0),
+        ) if SPOTIFY_CONFIGURED else None
+        # Casamentos Spotify -> YouTube já feitos (persistidos em disco)
+        self.spotify_matches = MatchStore(DATA_DIR / "spotify_matches.jsonl")
+        # Índice local de títulos já tocados (autocomplete do /musica)
+        self.title_index = TitleIndex(DATA_DIR / "title_index.jsonl")
+        # Histórico persistente de reproduções (SQLite, gravação em lote)
+        self.history = PlayHistoryStore(DATA_DIR / "history.db")
+        # Cache de extrações por ID de vídeo (URL do stream + metadados)
+        self.stream_cache = StreamCache(ttl=STREAM_URL_TTL)
+        # Lock por guild para não iniciar duas faixas ao mesmo tempo
+        self.play_locks = {}
+        # Lock por guild para não abrir dois handshakes de voz (e os tempos deles)
+        self.voice = VoiceConnections()
+        # Timers persistentes (um heap e uma task para todos)
+        self.timers = TimerScheduler(
+            DATA_DIR / "timers.jsonl",
+            on_fire=lambda entry: _fire_timer(entry),
+            on_prepare=lambda entry: _prepare_timer(entry),
+            prepare_lead=TIMER_PREPARE_LEAD,
+            accept=lambda entry: SHARDING.owns(entry.guild_id),
+        )
+        # Traces por pedido, do comando ao primeiro quadro de áudio
+        self.tracer = Tracer(TRACE_EXPORT_PATH, per_guild=TRACE_PER_GUILD, audio_timeout=TRACE_AUDIO_TIMEOUT)
+        # Processos FFmpeg abertos: limite global, faxina e CPU/RSS por stream
+        self.ffmpeg = FFmpegSupervisor(
+            FFMPEG_MAX_PROCESSES,
+            in_use=lambda lease: _ffmpeg_in_use(lease),
+            interval=FFMPEG_SWEEP_INTERVAL,
+            stale_after=FFMPEG_STALE_SECONDS,
+        )
+        # Perfil de áudio das streams novas, conforme a CPU e os underruns
+        self.audio = AudioGovernor(
+            AUDIO_PROFILES,
+            streams=lambda: len(self.ffmpeg),
+            cpu_high=AUDIO_CPU_HIGH,
+            cpu_low=AUDIO_CPU_LOW,
+            underrun_high=AUDIO_UNDERRUN_HIGH,
+            cooldown=AUDIO_PROFILE_COOLDOWN,
+            forced=AUDIO_PROFILE,
+        )
+        # Dashboard fora do processo: canal IPC e processo vigiado
+        self.ipc = None
+        self.dashboard_task = None
+        self.dashboard_process = None
+        # Tempos de cada fase do boot (exposto no dashboard)
+        self.startup = STARTUP
+        # Fila e descartes do log (exposto no dashboard)
+        self.logs = LOGS
+        # Fonte de áudio em reprodução por guild (sabe a posição atual)
+        self.audio_sources = {}
+        # Snapshots de fila/faixa atual por guild, para retomar após reinício
+        self.sessions = SessionStore(
+            DATA_DIR / "sessions",
+            positions_file=f"positions-{SHARDING.group}.json" if SHARDING.multiprocess else "positions.json",
+        )
+        # Shards deste processo (consultado pelo dashboard/coordenador)
+        self.sharding = SHARDING
+        self._session_fingerprints = {}
+        self._session_task = None
+        self._restored_sessions = {}
 
     async def setup_hook(self):
         """
         Hook chamado antes do bot começar.
         
-        Sincroniza todos os slash commands registrados com a API do Discord.
-        Isso garante que os comandos apareçam no menu de slash commands.
+        Carrega os dados persistentes e agenda em background o que não precisa
+        segurar a conexão: sync dos slash commands (só se a árvore mudou),
+        import do yt-dlp, pré-aquecimento de cache e dashboard.
         """
-        await self.tree.sync()
-        print("✅ Comandos sincronizados com sucesso!")
-        
-        # Inicia o Dashboard Web
-        self.web_server = WebServer(self)
-        # Roda em background sem bloquear
-        self.loop.create_task(self.web_server.start())
+        # Começa a medir o lag do loop o quanto antes
+        self.loop_monitor.start()
+        self.ffmpeg.start()
+        self.audio.start()
+
+        # `docker stop` manda SIGTERM: encerra pelo close() para gravar o que está pendente
+        try:
+            self.loop.add_signal_handler(signal.SIGTERM, lambda: self.loop.create_task(self.close()))
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows não suporta handlers de sinal no loop
+
+        STARTUP.mark("login")
+
+        # Caches em disco carregam em paralelo; as sessões precisam estar
+        # prontas antes do on_ready para a retomada das calls
+        loads = [self.spotify_matches.load_async(), self.title_index.load_async(), self.history.open()]
+        if SESSION_RESTORE_ENABLED:
+            loads.append(_load_sessions())
+        results = await asyncio.gather(*loads)
+        if SESSION_RESTORE_ENABLED:
+            self._restored_sessions = results[-1]
+        self._session_task = self.loop.create_task(_session_snapshot_loop())
+        STARTUP.mark("stores")
+
+        # Nada abaixo segura a conexão com o gateway
+        # Comandos são globais: com vários processos, só o grupo 0 sincroniza
+        if SHARDING.is_primary:
+            self.loop.create_task(_sync_commands_if_changed())
+        # yt-dlp demora para importar: carrega numa thread antes do primeiro /musica
+        self.loop.run_in_executor(None, importlib.import_module, "yt_dlp")
+        # Pré-aquece o cache com as mais tocadas sem atrasar o login
+        self.loop.create_task(_prewarm_caches())
+        # Inicia o Dashboard Web em background
+        self.loop.create_task(_start_dashboard())
+
+    async def close(self):
+        """Encerra o bot liberando os recursos próprios (threads, caches pendentes)."""
+        # O snapshot final vem antes de desconectar das calls (que mexe na fila)
+        if self._session_task is not None:
+            self._session_task.cancel()
+            self._session_task = None
+            _snapshot_sessions_sync()
+            self.sessions.close()
+        self.timers.stop()
+        self.audio.stop()
+        self.extraction.shutdown()
+        self.spotify_matches.flush()
+        self.title_index.flush()
+        self.history.close()
+        self.tracer.close()
+        CONFIG.flush()
+        if self.dashboard_task is not None:
+            self.dashboard_task.cancel()
+            await asyncio.gather(self.dashboard_task, return_exceptions=True)
+            self.dashboard_task = None
+        if self.ipc is not None:
+            await self.ipc.close()
+            self.ipc = None
+        await super().close()
+        # Depois de sair das calls: o que sobrou aberto é processo perdido
+        self.ffmpeg.shutdown()
 
     async def on_ready(self):
         """
@@ -230,12 +572,23 @@ class CabaBot(discord.Client):
         
         Exibe informações de conexão e status do bot.
         """
-        print(f'🤖 {self.user} tá on — pronto pra tocar umas arretadas!')
+        log.info('🤖 %s tá on — pronto pra tocar umas arretadas!', self.user)
 
         # Evita executar o startup mais de uma vez (on_ready pode disparar várias vezes)
         if getattr(self, "_startup_done", False):
             return
         self._startup_done = True
+        STARTUP.mark("gateway")
+
+        # Volta para as calls onde estava tocando antes do reinício
+        resumed = await _resume_sessions()
+        STARTUP.mark("voice")
+
+        # Timers só começam com o cache de guilds pronto (os vencidos disparam já)
+        restored_timers = await self.timers.start()
+        if restored_timers:
+            timer_log.info("⏱️ %d timer(s) pendente(s) restaurado(s)", restored_timers)
+        log.info("⏱️ Boot em %s", STARTUP.summary())
         # Tenta tocar o áudio de boas-vindas em guilds onde há membros em canais de voz
         async def _play_startup_for_guild(guild: discord.Guild):
             try:
@@ -258,58 +611,75 @@ class CabaBot(discord.Client):
 
                 # Busca a URL de áudio via yt-dlp
                 query = STARTUP_AUDIO_URL if STARTUP_AUDIO_URL.startswith("http") else f'ytsearch:{STARTUP_AUDIO_URL}'
-                results = await search_ytdlp_async(query, YTDLP_OPTIONS)
+                results = await search_ytdlp_async(query, YTDLP_OPTIONS, lane=Lane.STARTUP)
                 if not results:
                     return
                 track = results['entries'][0] if 'entries' in results else results
-                # Debug: inspeciona chave/estrutura retornada pelo yt-dlp
-                try:
-                    print(f"DEBUG startup track keys: {list(track.keys())}")
-                except Exception:
-                    print("DEBUG startup: track is not a mapping")
                 audio_url = _get_stream_url(track)
                 title = track.get('title', 'Música de boas-vindas')
                 if not audio_url or "youtube.com/watch" in audio_url:
                     return
 
-                source = discord.FFmpegPCMAudio(
-                    audio_url,
-                    executable=str(FFMPEG_PATH),
-                    before_options=FFMPEG_OPTIONS['before_options'],
-                    options=FFMPEG_OPTIONS['options']
-                )
-
+                source = await _open_audio(guild.id, MusicTrack(audio_url, title, "CabaBot", 0))
 
                 if isinstance(voice_client, discord.VoiceClient):
                     voice_client.play(source)
-                    print(f"Tocando áudio de startup em {guild.name}: {title}")
+                    player_log.info("Tocando áudio de startup em %s: %s", guild.name, title)
+                else:
+                    source.cleanup()
             except Exception as exc:
-                print(f"Erro ao tocar áudio de startup em {guild.name}: {exc}")
+                player_log.error("Erro ao tocar áudio de startup em %s: %s", guild.name, exc)
 
         # Dispara tarefas para cada guild
         for g in list(self.guilds):
-            asyncio.create_task(_play_startup_for_guild(g))
+            if g.id not in resumed:
+                asyncio.create_task(_play_startup_for_guild(g))
 
 
-async def search_ytdlp_async(query: str, ydl_opts: dict) -> dict:
+async def search_ytdlp_async(query: str, ydl_opts: dict, lane: Lane = Lane.INTERACTIVE) -> dict:
     """
     Busca informações de vídeo no YouTube de forma assíncrona.
     
-    Executa a operação de I/O bloqueante (yt-dlp) em uma thread separada
-    para não bloquear o event loop do Discord.
+    Executa a operação de I/O bloqueante (yt-dlp) em uma thread do agendador
+    de extração para não bloquear o event loop do Discord. A `lane` define a
+    prioridade: pedidos interativos furam a fila de trabalhos de fundo. Se um
+    perfil de extração falhar ou estourar o prazo, o próximo é tentado; com
+    `EXTRACTION_HEDGE`, pedidos interativos lentos ganham uma tentativa extra
+    em paralelo.
     
     Args:
         query (str): URL do YouTube ou termo de busca
         ydl_opts (dict): Opções de configuração para yt-dlp
+        lane (Lane): Classe de prioridade da extração
         
     Returns:
         dict: Informações do vídeo extraídas pelo yt-dlp
     """
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, lambda: _extract(query, ydl_opts))
+    # Playlists extraem várias entradas numa chamada só: prazo maior
+    scale = 1.0 if ydl_opts.get('noplaylist', True) else 3.0
+
+    async def attempt(profile: ExtractionProfile, clock: AttemptClock) -> dict:
+        if profile is not bot.extraction_chain.profiles[0]:
+            tracing.event("extraction_fallback", profile=profile.name)
+        opts = {**ydl_opts, **profile.options, 'socket_timeout': profile.timeout}
+        return await bot.extraction.run(
+            _extract, query, opts, lane=lane, timeout=profile.timeout * scale, on_start=clock.start
+        )
 
+    return await bot.extraction_chain.run(
+        attempt,
+        retryable=_retryable_extraction_error,
+        hedge=EXTRACTION_HEDGE and lane == Lane.INTERACTIVE,
+    )
+
+
+def _retryable_extraction_error(error: BaseException) -> bool:
+    """Diz se vale tentar outro perfil (403, bloqueio, rede) ou se o vídeo é que não existe."""
+    message = str(error).lower()
+    return not any(marker in message for marker in _PERMANENT_EXTRACTION_ERRORS)
 
-def _extract(query: str, ydl_opts: dict) -> dict:
+
+def _extract(query: str, ydl_opts: dict, process: bool = True) -> dict:
     """
     Extrai informações de um vídeo do YouTube usando yt-dlp.
     
@@ -319,12 +689,49 @@ def _extract(query: str, ydl_opts: dict) -> dict:
     Args:
         query (str): URL do YouTube ou termo de busca (com 'ytsearch:' para buscar)
         ydl_opts (dict): Opções de configuração para yt-dlp
+        process (bool): False devolve o resultado cru, sem resolver os streams
+            (em playlists, `entries` vira um gerador que pagina sob demanda)
         
     Returns:
         dict: Informações do vídeo (URL, título, duração, etc.)
     """
+    import yt_dlp  # type: ignore[import-untyped]
+
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:  # type: ignore[arg-type]
-        return ydl.extract_info(query, download=False)  # type: ignore[return-value]
+        return ydl.extract_info(query, download=False, process=process)  # type: ignore[return-value]
+
+
+def _extract_playlist_entries(query: str, ydl_opts: dict, limit: int, emit: Callable[[dict], bool]) -> int:
+    """
+    Lista as entradas de uma playlist sem resolver os streams (roda numa thread).
+
+    Cada entrada vai para `emit` assim que o yt-dlp a lê; se `emit` devolver
+    False (quem pediu desistiu), a leitura para.
+
+    Returns:
+        int: Quantidade de entradas entregues
+    """
+    info = _extract(query, ydl_opts, process=False)
+    # Link de vídeo com lista (watch?v=...&list=...) só aponta para a playlist
+    for _ in range(2):
+        if not isinstance(info, dict) or info.get('_type') not in ('url', 'url_transparent'):
+            break
+        info = _extract(info['url'], ydl_opts, process=False)
+    if not isinstance(info, dict):
+        return 0
+    entries = info.get('entries')
+    if entries is None:
+        return 1 if emit(info) else 0
+    count = 0
+    for entry in entries:
+        if count >= limit:
+            break
+        if not isinstance(entry, dict):
+            continue
+        if not emit(entry):
+            break
+        count += 1
+    return count
 
 
 def _get_stream_url(track: dict) -> Optional[str]:
@@ -356,20 +763,155 @@ def _get_stream_url(track: dict) -> Optional[str]:
     return None
 
 
-async def fetch_tracks(query: str, allow_playlist: bool = False) -> List[dict]:
+def _youtube_id(track: dict) -> Optional[str]:
+    """Retorna o ID do vídeo se a entrada do yt-dlp for do YouTube."""
+    if not isinstance(track, dict):
+        return None
+    if track.get('extractor_key') == 'Youtube' or 'youtube.com/watch' in (track.get('webpage_url') or ''):
+        return track.get('id')
+    # Entrada crua de playlist (sem processar): só tem o extrator e o id
+    if track.get('ie_key') == 'Youtube':
+        return track.get('id')
+    return None
+
+
+async def fetch_tracks(query: str, allow_playlist: bool = False, lane: Lane = Lane.INTERACTIVE) -> List[dict]:
     """Retorna uma lista de track dicts a partir de uma query (pode ser playlist)."""
     opts = dict(YTDLP_OPTIONS)
     # permitir playlist apenas quando explicitado
     opts['noplaylist'] = not allow_playlist
-    # Se for playlist, adiciona 'playlistend' para parar de baixar após 20 músicas
+    # Se for playlist, adiciona 'playlistend' para parar de baixar após PLAYLIST_LIMIT músicas
     if allow_playlist:
-        opts['playlistend'] = 20
-    results = await search_ytdlp_async(query, opts)
+        opts['playlistend'] = PLAYLIST_LIMIT
+
+    # Vídeo único extraído há pouco: responde do cache, sem passar pelo yt-dlp
+    video_id = video_id_from_url(query) if query.startswith("http") else None
+    if video_id:
+        cached = bot.stream_cache.get(video_id)
+        if cached:
+            tracing.event("stream_cache_hit", video_id=video_id)
+            return [cached]
+
+    with tracing.span("ytdlp", lane=lane.name.lower(), playlist=allow_playlist):
+        results = await search_ytdlp_async(query, opts, lane=lane)
     if not results:
         return []
     if 'entries' in results and isinstance(results['entries'], list):
-        return results['entries']
-    return [results]
+        entries = results['entries']
+    else:
+        entries = [results]
+    # Momento da extração, para a faixa saber quando o stream vai expirar
+    # (entradas vindas do cache já trazem o delas)
+    resolved_at = time.monotonic()
+    for entry in entries:
+        entry['resolved_at'] = resolved_at
+        _cache_entry(entry)
+    return entries
+
+
+async def _iter_playlist_entries(query: str, limit: int = PLAYLIST_LIMIT, lane: Lane = Lane.INTERACTIVE) -> AsyncIterator[dict]:
+    """
+    Entradas de uma playlist do YouTube, na ordem, conforme o yt-dlp as lê.
+
+    A listagem não resolve os streams (isso fica para a hora de tocar), então
+    a primeira entrada chega bem antes da playlist inteira. Erros do yt-dlp
+    são levantados no fim da iteração.
+    """
+    loop = asyncio.get_running_loop()
+    entries: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def emit(entry: dict) -> bool:
+        if stop.is_set():
+            return False
+        loop.call_soon_threadsafe(entries.put_nowait, entry)
+        return True
+
+    opts = {**YTDLP_OPTIONS, 'noplaylist': False, 'playlistend': limit}
+    # A listagem não passa pela cadeia de perfis: ela não toca nos streams,
+    # que é onde os 403 e estrangulamentos acontecem
+    job = asyncio.ensure_future(bot.extraction.run(_extract_playlist_entries, query, opts, limit, emit, lane=lane))
+    # Agendado depois de todos os emit() da thread: marca o fim da fila
+    job.add_done_callback(lambda _: entries.put_nowait(None))
+    try:
+        while True:
+            entry = await entries.get()
+            if entry is None:
+                break
+            yield entry
+        await job
+    finally:
+        stop.set()
+        job.cancel()
+
+
+def _cache_entry(entry: dict) -> None:
+    """Guarda no cache de extração uma entrada do YouTube com stream válido."""
+    video_id = _youtube_id(entry)
+    audio_url = _get_stream_url(entry)
+    if video_id and audio_url and "youtube.com/watch" not in audio_url:
+        bot.stream_cache.put(
+            video_id, audio_url, entry.get('title', 'Música'), entry.get('duration'),
+            resolved_at=entry.get('resolved_at'),
+        )
+
+
+async def _prewarm_caches() -> None:
+    """Extrai (na lane de prefetch) as faixas mais tocadas para deixar o cache quente."""
+    if HISTORY_PREWARM_TOP_N <= 0:
+        return
+    try:
+        top = await bot.history.most_played(limit=HISTORY_PREWARM_TOP_N)
+    except Exception as e:
+        extraction_log.error("Erro ao consultar histórico para pré-aquecer: %s", e)
+        return
+
+    async def _warm(video_id: str) -> bool:
+        try:
+            return bool(await fetch_tracks(f"https://www.youtube.com/watch?v={video_id}", lane=Lane.PREFETCH))
+        except Exception:
+            return False
+
+    warmed = await asyncio.gather(*(_warm(entry['video_id']) for entry in top))
+    if top:
+        extraction_log.info("🔥 Cache pré-aquecido com %d/%d faixas mais tocadas", sum(warmed), len(top))
+
+
+def _extraction_cost(query: str) -> float:
+    """Retorna o custo de admissão de uma query (playlists custam mais)."""
+    if query.startswith("http") and ("list=" in query or "playlist" in query or "/album/" in query):
+        return ADMISSION_PLAYLIST_COST
+    return ADMISSION_TRACK_COST
+
+
+def _admission_message(result: AdmissionResult) -> str:
+    """Monta a mensagem amigável para um pedido barrado ou adiado pelo limite."""
+    who = "Esse servidor tá" if result.scope == "guild" else "Tu tá"
+    if not result.allowed:
+        # Taxa configurada como 0: o bucket nunca enche, não há quando tentar de novo
+        if not math.isfinite(result.retry_after):
+            return f"⏳ Calma aí, visse? {who} no limite de pedidos de música por aqui."
+        return (
+            f"⏳ Calma aí, visse? {who} pedindo música demais de uma vez. "
+            f"Tenta de novo em {math.ceil(result.retry_after)}s."
+        )
+    return f"⏳ Muitos pedidos agora — o teu entra em {math.ceil(result.wait)}s, segura aí."
+
+
+def traced(func):
+    """
+    Abre um trace para cada execução de um slash command.
+
+    Vai logo acima do `def` (abaixo de `@bot.tree.command`/`@app_commands.describe`).
+    O id do trace fica em `interaction.extras['trace_id']`.
+    """
+    @functools.wraps(func)
+    async def wrapper(interaction: discord.Interaction, *args, **kwargs):
+        command = interaction.command.qualified_name if interaction.command else func.__name__
+        with bot.tracer.trace(f"/{command}", guild_id=interaction.guild_id, user_id=interaction.user.id) as trace:
+            interaction.extras['trace_id'] = trace.trace_id
+            return await func(interaction, *args, **kwargs)
+    return wrapper
 
 
 async def _validate_guild_and_member(interaction: discord.Interaction) -> discord.Member | None:
@@ -406,6 +948,11 @@ async def _get_or_connect_voice_client(
 ) -> discord.VoiceClient | discord.VoiceProtocol | None:
     """
     Obtém o cliente de voz atual ou conecta a um novo canal.
+
+    Uma conexão por vez em cada guild: quem chega durante um handshake espera
+    e reaproveita a conexão aberta. Trocar de canal usa `move_to` (mantém a
+    sessão de voz e a faixa tocando); desconectar e conectar de novo fica só
+    como plano B.
     
     Args:
         guild (discord.Guild): O servidor
@@ -414,23 +961,61 @@ async def _get_or_connect_voice_client(
     Returns:
         discord.VoiceClient | discord.VoiceProtocol | None: Cliente de voz conectado ou None se erro
     """
-    voice_client = guild.voice_client
-    
-    try:
-        print(f"DEBUG: _get_or_connect_voice_client guild={getattr(guild,'name',guild.id)} channel={getattr(voice_channel,'name',None)} current_vc={voice_client}")
-        if voice_client is None:
-            print("DEBUG: connecting to voice channel...")
-            return await voice_channel.connect()
-        elif voice_client.channel != voice_channel:
-            print(f"DEBUG: moving voice client from {voice_client.channel} to {voice_channel}")
-            await voice_client.disconnect(force=True)
-            return await voice_channel.connect()
-        else:
-            print("DEBUG: already connected to requested channel")
-        return voice_client
-    except Exception as e:
-        print(f"Erro ao conectar ao canal de voz: {e}")
-        return None
+    async with bot.voice.lock(guild.id):
+        # Lido só depois do lock: outro comando pode ter acabado de conectar
+        voice_client = guild.voice_client
+        try:
+            if isinstance(voice_client, discord.VoiceClient) and not voice_client.is_connected():
+                # Caiu (ex.: oscilação de rede enquanto estava parado): dá tempo
+                # ao reconnect automático do discord.py antes de refazer tudo
+                if not await _wait_voice_reconnect(voice_client, VOICE_RECONNECT_GRACE):
+                    voice_log.info("Conexão de voz em %s não voltou sozinha; reconectando", guild.id)
+                    await voice_client.disconnect(force=True)
+                    voice_client = None
+
+            if voice_client is None:
+                voice_log.debug("Conectando em %s (%s)", getattr(voice_channel, 'name', None), guild.id)
+                with tracing.span("voice_connect", action="connect"), bot.voice.measure("connect"):
+                    return await voice_channel.connect()
+            elif voice_client.channel != voice_channel:
+                voice_log.debug("Trocando de canal em %s: %s -> %s", guild.id, voice_client.channel, voice_channel)
+                return await _move_voice_client(guild, voice_client, voice_channel)
+            else:
+                voice_log.debug("Já conectado em %s (%s)", getattr(voice_channel, 'name', None), guild.id, extra=SAMPLED)
+                bot.voice.reused += 1
+                tracing.event("voice_reused")
+            return voice_client
+        except Exception as e:
+            voice_log.error("Erro ao conectar ao canal de voz: %s", e)
+            return None
+
+
+async def _move_voice_client(
+    guild: discord.Guild,
+    voice_client: discord.VoiceClient | discord.VoiceProtocol,
+    voice_channel: discord.VoiceChannel | discord.StageChannel,
+) -> discord.VoiceClient | discord.VoiceProtocol:
+    """Leva a conexão para outro canal sem refazer o handshake (nem matar o FFmpeg)."""
+    if isinstance(voice_client, discord.VoiceClient):
+        try:
+            with tracing.span("voice_connect", action="move"), bot.voice.measure("move"):
+                await voice_client.move_to(voice_channel)
+            return voice_client
+        except Exception as e:
+            voice_log.warning("move_to falhou em %s (%s); reconectando do zero", guild.id, e)
+    with tracing.span("voice_connect", action="reconnect"), bot.voice.measure("reconnect"):
+        await voice_client.disconnect(force=True)
+        return await voice_channel.connect()
+
+
+async def _wait_voice_reconnect(voice_client: discord.VoiceClient, timeout: float) -> bool:
+    """Espera até `timeout` s a conexão de voz voltar sozinha."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        if voice_client.is_connected():
+            return True
+    return voice_client.is_connected()
 
 
 
@@ -439,20 +1024,43 @@ async def _get_or_connect_voice_client(
 class MusicTrack:
     """Representa uma faixa de música na fila."""
 
-    def __init__(self, url: str, title: str, requester, channel_id: int, requester_name: Optional[str] = None):
+    def __init__(
+        self,
+        url: str,
+        title: str,
+        requester,
+        channel_id: int,
+        requester_name: Optional[str] = None,
+        video_id: Optional[str] = None,
+        duration: Optional[float] = None,
+        resolved_at: Optional[float] = None,
+    ):
         """
         Inicializa uma faixa de música.
 
         Args:
-            url (str): URL do áudio
+            url (str): URL do áudio (vazia se o stream ainda não foi resolvido)
             title (str): Título da música
             requester (int|str): ID do usuário que requisitou ou nome
             channel_id (int): ID do canal de texto onde a música foi pedida (para enviar o player)
             requester_name (str | None): Nome do usuário (se requester for id)
+            video_id (str | None): ID do vídeo no YouTube, para re-extrair o stream
+            duration (float | None): Duração em segundos, se conhecida
+            resolved_at (float | None): `time.monotonic()` da extração do stream
+                (entradas do cache podem ser de horas atrás); None = agora
         """
         self.url = url
         self.title = title
         self.channel_id = channel_id
+        self.video_id = video_id
+        self.duration = duration
+        # Momento em que a URL de stream foi obtida (URLs do YouTube expiram)
+        if not url:
+            self.resolved_at = 0.0
+        else:
+            self.resolved_at = time.monotonic() if resolved_at is None else resolved_at
+        # Posição (s) de onde retomar, quando restaurada de um snapshot
+        self.resume_at: Optional[float] = None
         if isinstance(requester, int):
             self.requester_id: int | None = requester
             self.requester = requester_name or str(requester)
@@ -460,6 +1068,241 @@ class MusicTrack:
             self.requester_id = None
             self.requester = str(requester)
 
+    def needs_resolve(self, ttl: float) -> bool:
+        """True se o stream ainda não foi resolvido ou já pode ter expirado."""
+        if not self.url:
+            return True
+        return self.video_id is not None and time.monotonic() - self.resolved_at > ttl
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma serializável (JSON) usada nos snapshots de sessão.
+
+        A URL do stream só é guardada quando não há ID de vídeo para re-extrair.
+        """
+        data: Dict[str, Any] = {
+            'title': self.title,
+            'channel_id': self.channel_id,
+            'requester': self.requester,
+            'requester_id': self.requester_id,
+        }
+        if self.video_id:
+            data['video_id'] = self.video_id
+        else:
+            data['url'] = self.url
+        if self.duration is not None:
+            data['duration'] = self.duration
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MusicTrack":
+        """Recria a faixa de um snapshot; o stream é resolvido só na hora de tocar."""
+        requester_id = data.get('requester_id')
+        track = cls(
+            '' if data.get('video_id') else data.get('url', ''),
+            data.get('title', 'Desconhecido'),
+            requester_id if requester_id is not None else data.get('requester', '?'),
+            data.get('channel_id', 0),
+            requester_name=data.get('requester'),
+            video_id=data.get('video_id'),
+            duration=data.get('duration'),
+        )
+        # URL guardada pode ter expirado: força a tentativa mesmo assim, sem TTL
+        track.resolved_at = 0.0
+        return track
+
+    def session_key(self) -> str:
+        """Identifica a faixa entre snapshots (para casar a posição salva)."""
+        return self.video_id or self.title
+
+
+class TrackedAudio(discord.AudioSource):
+    """Envolve a fonte de áudio contando os quadros lidos para saber a posição.
+
+    Cada `read()` entrega 20 ms de áudio, então a posição não anda durante
+    pausas e sempre bate com o que já foi tocado. Com um `trace`, o primeiro
+    quadro marca o tempo até o primeiro áudio do pedido; com uma `lease`, o
+    `cleanup` devolve a vaga do FFmpeg ao supervisor. Leituras que chegam mais
+    de um quadro atrasadas são avisadas ao `governor` como underrun.
+    """
+
+    FRAME_SECONDS = 0.02
+    # Intervalo entre leituras acima do qual a diferença é pausa, não engasgo
+    PAUSE_GAP = 1.0
+
+    def __init__(
+        self,
+        source: discord.AudioSource,
+        track: "MusicTrack",
+        offset: float = 0.0,
+        trace: Optional[tracing.Trace] = None,
+        lease: Optional[FFmpegLease] = None,
+        profile: str = "full",
+        governor: Optional[AudioGovernor] = None,
+    ):
+        self.source = source
+        self.track = track
+        self.offset = offset
+        self.frames = 0
+        self.trace = trace
+        # Vaga do processo no supervisor, devolvida no cleanup
+        self.lease = lease
+        # Perfil de áudio com que o FFmpeg foi aberto (mostrado no dashboard)
+        self.profile = profile
+        self.governor = governor
+        self._last_read = 0.0
+        if trace is not None:
+            trace.expect_audio()
+
+    @property
+    def position(self) -> float:
+        return self.offset + self.frames * self.FRAME_SECONDS
+
+    def read(self) -> bytes:
+        if self.governor is not None:
+            now = time.perf_counter()
+            if self._last_read and 2 * self.FRAME_SECONDS < now - self._last_read < self.PAUSE_GAP:
+                self.governor.underrun()
+            self._last_read = now
+        data = self.source.read()
+        if data:
+            if self.frames == 0 and self.trace is not None:
+                self.trace.first_audio()
+            self.frames += 1
+        return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self) -> None:
+        try:
+            self.source.cleanup()
+        finally:
+            if self.lease is not None:
+                self.lease.release()
+
+
+async def _open_audio(guild_id: int, track: MusicTrack, offset: float = 0.0) -> TrackedAudio:
+    """
+    Abre o FFmpeg para a faixa (a partir de `offset` s) já contando a posição.
+
+    Pega antes uma vaga no supervisor de FFmpeg; com o limite atingido, espera
+    na fila até alguma reprodução terminar.
+    """
+    before_options = FFMPEG_OPTIONS['before_options']
+    if offset > 0:
+        before_options = f"-ss {offset:.2f} {before_options}"
+    started = time.perf_counter()
+    lease = await bot.ffmpeg.acquire(guild_id, track.title)
+    trace = tracing.current()
+    waited = time.perf_counter() - started
+    if trace is not None and waited >= 0.001:
+        trace.add_span("ffmpeg_slot_wait", started, started + waited)
+    # O perfil é escolhido na hora de abrir: a faixa fica nele até acabar
+    profile = bot.audio.profile
+    passthrough = profile.opus and _is_opus_stream(track.url)
+    options = FFMPEG_OPTIONS['options']
+    if profile.filters and not passthrough:
+        options = f'{options} -af "{profile.filters}"'
+    try:
+        with tracing.span("ffmpeg_spawn", profile=profile.name):
+            if profile.opus:
+                source = discord.FFmpegOpusAudio(
+                    track.url,
+                    codec='copy' if passthrough else None,
+                    executable=_ffmpeg_path(),
+                    before_options=before_options,
+                    options=options
+                )
+            else:
+                source = discord.FFmpegPCMAudio(
+                    track.url,
+                    executable=_ffmpeg_path(),
+                    before_options=before_options,
+                    options=options
+                )
+    except BaseException:
+        lease.release()
+        raise
+    audio = TrackedAudio(
+        source, track, offset, trace=trace, lease=lease, profile=profile.name, governor=bot.audio
+    )
+    lease.attach(getattr(source, '_process', None), audio)
+    return audio
+
+
+def _is_opus_stream(url: str) -> bool:
+    """Diz se o stream já é Opus (WebM do YouTube ou .opus), para copiar sem recodificar."""
+    lowered = url.lower()
+    path = lowered.split('?', 1)[0]
+    return 'mime=audio%2fwebm' in lowered or 'mime=audio/webm' in lowered or path.endswith(('.opus', '.webm'))
+
+
+def _ffmpeg_in_use(lease: FFmpegLease) -> bool:
+    """Diz se a fonte da vaga ainda é a que está tocando (ou pausada) na guild."""
+    guild = bot.get_guild(lease.guild_id)
+    voice_client = guild.voice_client if guild else None
+    if not isinstance(voice_client, discord.VoiceClient) or not voice_client.is_connected():
+        return False
+    return voice_client.source is lease.owner
+
+
+def _remember_play(guild_id: int, track: MusicTrack) -> None:
+    """Registra a reprodução no índice de títulos e no histórico persistente."""
+    if track.video_id:
+        bot.title_index.record_play(track.video_id, track.title, track.duration)
+        bot.history.record(guild_id, track.video_id, track.title, track.duration, track.requester_id)
+
+
+async def _ensure_stream_url(track: MusicTrack, lane: Lane = Lane.INTERACTIVE) -> bool:
+    """
+    Garante que a faixa tenha uma URL de stream válida, extraindo de novo se preciso.
+
+    Returns:
+        bool: True se a faixa pode ser tocada
+    """
+    if not track.needs_resolve(STREAM_URL_TTL):
+        return True
+    if not track.video_id:
+        return bool(track.url)
+    prefetch = bot.stream_prefetches.get(track.video_id)
+    if prefetch is not None and lane != Lane.PREFETCH:
+        # O prefetch dessa faixa já está rodando: espera ele em vez de extrair de novo
+        # (se for de outra entrada com o mesmo vídeo, o cache de streams responde)
+        await asyncio.wait({prefetch})
+        if not track.needs_resolve(STREAM_URL_TTL):
+            return True
+    try:
+        entries = await fetch_tracks(f"https://www.youtube.com/watch?v={track.video_id}", lane=lane)
+    except Exception as e:
+        extraction_log.error("Erro ao extrair stream de %s: %s", track.title, e)
+        return False
+    audio_url = _get_stream_url(entries[0]) if entries else None
+    if not audio_url or "youtube.com/watch" in audio_url:
+        return False
+    track.url = audio_url
+    # Resposta do cache: o stream tem a idade da entrada, não a de agora
+    track.resolved_at = entries[0].get('resolved_at', time.monotonic())
+    return True
+
+
+def _prefetch_next(guild_id: int) -> None:
+    """
+    Resolve em segundo plano (lane de prefetch) o stream da próxima faixa da fila.
+
+    Faixas de playlists e do Spotify entram na fila só com o ID do vídeo; sem
+    isso cada troca de faixa ficaria em silêncio durante uma extração inteira.
+    Chamar de novo com a mesma próxima faixa não faz nada.
+    """
+    queue = bot.music_queue.get(guild_id)
+    if not queue:
+        return
+    track = queue[0]
+    if not track.video_id or not track.needs_resolve(STREAM_URL_TTL) or track.video_id in bot.stream_prefetches:
+        return
+    task = asyncio.ensure_future(_ensure_stream_url(track, lane=Lane.PREFETCH))
+    bot.stream_prefetches[track.video_id] = task
+    task.add_done_callback(lambda _: bot.stream_prefetches.pop(track.video_id, None))
+
 
 class MusicPlayerView(discord.ui.View):
     """View que contém os controles de reprodução de música (Botões)."""
@@ -518,7 +1361,7 @@ class MusicPlayerView(discord.ui.View):
 
         # Limpa a fila
         if self.guild_id in bot.music_queue:
-            bot.music_queue[self.guild_id] = []
+            bot.music_queue[self.guild_id].clear()
         
         # Reseta loops
         if self.guild_id in bot.loop_control:
@@ -545,9 +1388,108 @@ class MusicPlayerView(discord.ui.View):
         await interaction.followup.send(f"🔁 Loop da música {state}.", ephemeral=True)
 
 
+def _guild_queue(guild_id: int) -> TrackQueue:
+    """Fila da guild (criada vazia no primeiro uso)."""
+    queue = bot.music_queue.get(guild_id)
+    if queue is None:
+        queue = bot.music_queue[guild_id] = TrackQueue()
+    return queue
+
+
+def _is_duplicate(guild_id: int, key: Optional[str]) -> bool:
+    """True se a guild recusa repetidas e essa música já está tocando ou na fila."""
+    if key is None or guild_allows_duplicates(guild_id):
+        return False
+    current = bot.current_track.get(guild_id)
+    if current is not None and track_key(current) == key:
+        return True
+    queue = bot.music_queue.get(guild_id)
+    return queue is not None and queue.has(key)
+
+
+def _queue_page(guild_id: int, page: int) -> Tuple[Optional[discord.Embed], int, int]:
+    """
+    Embed de uma página do /fila, montado só na primeira vez que é pedido.
+
+    As páginas ficam guardadas até a fila mudar (a `version` da `TrackQueue`),
+    e montar uma página só fatia e formata as QUEUE_PAGE_SIZE faixas dela, então
+    o custo não cresce com o tamanho da fila.
+
+    Returns:
+        tuple: (embed ou None se a fila está vazia, página ajustada, total de páginas)
+    """
+    queue = bot.music_queue.get(guild_id)
+    if not queue:
+        bot.queue_pages.pop(guild_id, None)
+        return None, 0, 0
+    pages = -(-len(queue) // QUEUE_PAGE_SIZE)
+    page = min(max(page, 0), pages - 1)
+
+    cached = bot.queue_pages.get(guild_id)
+    if cached is None or cached[0] != id(queue) or cached[1] != queue.version:
+        cached = bot.queue_pages[guild_id] = (id(queue), queue.version, {})
+    rendered = cached[2]
+    embed = rendered.get(page)
+    if embed is None:
+        start = page * QUEUE_PAGE_SIZE
+        embed = discord.Embed(
+            title="📋 Fila de Músicas",
+            description=f"Total: **{len(queue)}** música(s) enfileirada(s)",
+            color=discord.Color.blue()
+        )
+        for idx, track in enumerate(queue[start:start + QUEUE_PAGE_SIZE], start + 1):
+            embed.add_field(
+                name=f"#{idx}",
+                value=f"**{track.title}**\nRequisitado por: {track.requester}",
+                inline=False
+            )
+        embed.set_footer(text=f"Página {page + 1}/{pages}")
+        if len(rendered) >= QUEUE_PAGE_CACHE:
+            # Descarta a página montada há mais tempo
+            del rendered[next(iter(rendered))]
+        rendered[page] = embed
+    return embed, page, pages
+
+
+class QueueView(discord.ui.View):
+    """Botões de anterior/próxima do /fila."""
+
+    def __init__(self, guild_id: int, page: int, pages: int):
+        super().__init__(timeout=QUEUE_VIEW_TIMEOUT)
+        self.guild_id = guild_id
+        self.page = page
+        self._sync(pages)
+
+    def _sync(self, pages: int) -> None:
+        self.previous.disabled = self.page <= 0
+        self.next.disabled = self.page >= pages - 1
+
+    async def _show(self, interaction: discord.Interaction, page: int) -> None:
+        embed, self.page, pages = _queue_page(self.guild_id, page)
+        if embed is None:
+            await interaction.response.edit_message(content="📋 A fila tá vazia, não tem música enfileirada.", embed=None, view=None)
+            self.stop()
+            return
+        self._sync(pages)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(emoji="⬅️", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Página anterior."""
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(emoji="➡️", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Próxima página."""
+        await self._show(interaction, self.page + 1)
+
+
 async def _play_next_track(guild: discord.Guild) -> None:
     """
     Reproduz a próxima música da fila e envia o player interativo.
+
+    Chamadas concorrentes para a mesma guild são serializadas; se algo já
+    estiver tocando quando a vez chegar, a chamada não faz nada.
     
     Args:
         guild (discord.Guild): O servidor
@@ -555,88 +1497,140 @@ async def _play_next_track(guild: discord.Guild) -> None:
     voice_client = guild.voice_client
     if voice_client is None or not isinstance(voice_client, discord.VoiceClient):  # type: ignore[union-attr]
         return
-    
-    # Verifica se há loop de música individual
-    loop_track = bot.loop_control.get(guild.id, {}).get('loop_track', False)
-    loop_queue = bot.loop_control.get(guild.id, {}).get('loop_queue', False)
-    
-    # Se está em loop de música, reproduz a mesma música
-    if loop_track and guild.id in bot.current_track:
-        track = bot.current_track[guild.id]
-    else:
-        # Salva a música anterior no histórico antes de mudar
-        if guild.id in bot.current_track:
-            if guild.id not in bot.music_history:
-                bot.music_history[guild.id] = []
-            bot.music_history[guild.id].append(bot.current_track[guild.id])
-            # Limita histórico a 20 músicas para economizar memória
-            if len(bot.music_history[guild.id]) > 20:
-                bot.music_history[guild.id].pop(0)
-
-        # Se não há fila ou está vazia, retorna
-        if guild.id not in bot.music_queue or not bot.music_queue[guild.id]:
-            # Limpa track atual pois acabou a música
-            if guild.id in bot.current_track:
-                del bot.current_track[guild.id]
-            return
-        
-        # Pega a próxima faixa
-        track = bot.music_queue[guild.id].pop(0)
-        
-        # Se está em loop de fila, re-adiciona a faixa no final
-        if loop_queue:
-            bot.music_queue[guild.id].append(track)
-        
-        # Armazena a música atual
-        bot.current_track[guild.id] = track
-    
-    try:
-        source = discord.FFmpegPCMAudio(
-            track.url,
-            executable=str(FFMPEG_PATH),
-            before_options=FFMPEG_OPTIONS['before_options'],
-            options=FFMPEG_OPTIONS['options']
-        )
-        print(f"DEBUG _play_next_track: playing title={track.title} url_len={len(track.url) if track.url else 0} vc={voice_client} channel={getattr(voice_client.channel,'name',None)}")
-        
-        # Define callback para quando a música termina
-        def after_track(error):
-            if error:
-                print(f"Erro ao reproduzir: {error}")
-            # Reproduz a próxima faixa
-            asyncio.run_coroutine_threadsafe(_play_next_track(guild), bot.loop)
-        
-        voice_client.play(source, after=after_track)  # type: ignore[attr-defined]
-        
-        # --- ENVIA O PLAYER COM BOTÕES ---
-        try:
-            channel = bot.get_channel(track.channel_id)
-            if isinstance(channel, (discord.TextChannel, discord.Thread)):
-                # Tenta apagar a mensagem anterior se existir (Limpeza de chat)
-                last_msg = bot.last_player_message.get(guild.id)
-                if last_msg:
-                    try:
-                        await last_msg.delete()
-                    except Exception:
-                        pass # Mensagem pode ter sido deletada manualmente ou bot sem permissão
-                
-                embed = discord.Embed(
-                    title="🎵 Tocando Agora",
-                    description=f"**{track.title}**",
-                    color=discord.Color.green()
-                )
-                embed.add_field(name="Pedido por", value=track.requester, inline=True)
-                embed.set_thumbnail(url="https://media.giphy.com/media/v1.Y2lkPTc5MGI3NjExbmZpbXJ6YnI1b3g4b3g4b3g4b3g4b3g4b3g4b3g4b3g4/S99mGj4FhZ9tq/giphy.gif") # Gif de musica opcional
-                
-                view = MusicPlayerView(guild.id)
-                msg = await channel.send(embed=embed, view=view)
-                bot.last_player_message[guild.id] = msg
-        except Exception as e:
-            print(f"Erro ao enviar player UI: {e}")
 
-        print(f"🎵 Tocando: {track.title} (requisitado por {track.requester})")
+    lock = bot.play_locks.setdefault(guild.id, asyncio.Lock())
+    async with lock:
+        # Laço em vez de recursão: uma faixa que falha na extração passa a vez
+        # para a seguinte sem soltar o lock nem empilhar chamadas
+        while True:
+            if voice_client.is_playing() or voice_client.is_paused():
+                return
+
+            # Verifica se há loop de música individual
+            loop_track = bot.loop_control.get(guild.id, {}).get('loop_track', False)
+            loop_queue = bot.loop_control.get(guild.id, {}).get('loop_queue', False)
+
+            # Se está em loop de música (ou retomando uma sessão), reproduz a mesma música
+            current = bot.current_track.get(guild.id)
+            from_queue = not (current is not None and (loop_track or current.resume_at is not None))
+            if not from_queue:
+                track = current
+            else:
+                # Salva a música anterior no histórico antes de mudar
+                if guild.id in bot.current_track:
+                    if guild.id not in bot.music_history:
+                        bot.music_history[guild.id] = []
+                    bot.music_history[guild.id].append(bot.current_track[guild.id])
+                    # Limita histórico a 20 músicas para economizar memória
+                    if len(bot.music_history[guild.id]) > 20:
+                        bot.music_history[guild.id].pop(0)
+
+                # Se não há fila ou está vazia, retorna
+                if guild.id not in bot.music_queue or not bot.music_queue[guild.id]:
+                    # Limpa track atual pois acabou a música
+                    if guild.id in bot.current_track:
+                        del bot.current_track[guild.id]
+                    return
+
+                # Pega a próxima faixa
+                track = bot.music_queue[guild.id].pop(0)
+
+                # Se está em loop de fila, re-adiciona a faixa no final
+                if loop_queue:
+                    bot.music_queue[guild.id].append(track)
+
+                # Armazena a música atual
+                bot.current_track[guild.id] = track
+
+            def give_back() -> None:
+                """Desfaz a escolha da faixa: ela volta para o começo da fila."""
+                if not from_queue:
+                    return
+                queue = bot.music_queue.get(guild.id)
+                if loop_queue and queue and queue[-1] is track:
+                    queue.pop()
+                if bot.current_track.get(guild.id) is track:
+                    del bot.current_track[guild.id]
+                _guild_queue(guild.id).insert(0, track)
+
+            # Faixas enfileiradas sem stream (ex.: casadas do Spotify) ou com URL
+            # expirada são resolvidas só agora, na hora de tocar
+            if not await _ensure_stream_url(track):
+                player_log.warning("Não consegui extrair o áudio de %s, pulando.", track.title)
+                queue = bot.music_queue.get(guild.id)
+                if loop_queue and queue and queue[-1] is track:
+                    queue.pop()
+                if bot.current_track.get(guild.id) is track:
+                    del bot.current_track[guild.id]
+                # Em loop da música, tentar de novo só repetiria a falha
+                if loop_track:
+                    return
+                continue
+
+            # A extração pode levar segundos; se alguém começou a tocar algo
+            # nesse meio tempo, a faixa volta para a fila em vez de atropelar
+            if voice_client.is_playing() or voice_client.is_paused():
+                give_back()
+                return
+
+            source = None
+            try:
+                # Sessão restaurada: o FFmpeg já começa do ponto onde tinha parado
+                offset, track.resume_at = track.resume_at or 0.0, None
+                source = await _open_audio(guild.id, track, offset)
+                if voice_client.is_playing() or voice_client.is_paused():
+                    source.cleanup()
+                    track.resume_at = offset or None
+                    give_back()
+                    return
+                player_log.debug("Iniciando %s em %s (offset %.1fs)", track.title, guild.id, offset, extra=SAMPLED)
+
+                # Define callback para quando a música termina
+                def after_track(error):
+                    if error:
+                        player_log.error("Erro ao reproduzir: %s", error)
+                    # Reproduz a próxima faixa
+                    asyncio.run_coroutine_threadsafe(_play_next_track(guild), bot.loop)
+
+                voice_client.play(source, after=after_track)  # type: ignore[attr-defined]
+                bot.audio_sources[guild.id] = source
+                _remember_play(guild.id, track)
+                # A próxima já vai sendo resolvida enquanto esta toca
+                _prefetch_next(guild.id)
+            except Exception as e:
+                player_log.error("Erro ao reproduzir faixa: %s", e)
+                if source is not None and bot.audio_sources.get(guild.id) is not source:
+                    source.cleanup()
+                return
+            break
+
+    # --- ENVIA O PLAYER COM BOTÕES ---
+    try:
+        channel = bot.get_channel(track.channel_id)
+        if isinstance(channel, (discord.TextChannel, discord.Thread)):
+            # Tenta apagar a mensagem anterior se existir (Limpeza de chat)
+            last_msg = bot.last_player_message.get(guild.id)
+            if last_msg:
+                try:
+                    await last_msg.delete()
+                except Exception:
+                    pass # Mensagem pode ter sido deletada manualmente ou bot sem permissão
+            
+            embed = discord.Embed(
+                title="🎵 Tocando Agora",
+                description=f"**{track.title}**",
+                color=discord.Color.green()
+            )
+            embed.add_field(name="Pedido por", value=track.requester, inline=True)
+            embed.set_thumbnail(url="https://media.giphy.com/media/v1.Y2lkPTc5MGI3NjExbmZpbXJ6YnI1b3g4b3g4b3g4b3g4b3g4b3g4b3g4b3g4/S99mGj4FhZ9tq/giphy.gif") # Gif de musica opcional
+            
+            view = MusicPlayerView(guild.id)
+            msg = await channel.send(embed=embed, view=view)
+            bot.last_player_message[guild.id] = msg
     except Exception as e:
-        print(f"Erro ao reproduzir faixa: {e}")
+        player_log.error("Erro ao enviar player UI: %s", e)
+
+    player_log.info("🎵 Tocando: %s (requisitado por %s)", track.title, track.requester, extra=SAMPLED)
 
 
 async def _play_previous_track(guild: discord.Guild) -> bool:
@@ -651,9 +1645,7 @@ async def _play_previous_track(guild: discord.Guild) -> bool:
     previous_track = bot.music_history[guild.id].pop()
     
     # Coloca ela no início da fila
-    if guild.id not in bot.music_queue:
-        bot.music_queue[guild.id] = []
-    bot.music_queue[guild.id].insert(0, previous_track)
+    _guild_queue(guild.id).insert(0, previous_track)
     
     # Se tinha uma música tocando, ela vai pro histórico "naturalmente" pelo _play_next_track
     # Mas queremos evitar que a música que estava tocando (que foi interrompida pra voltar)
@@ -668,10 +1660,288 @@ async def _play_previous_track(guild: discord.Guild) -> bool:
         
     return True
 
+def _session_state(guild_id: int) -> Optional[Dict[str, Any]]:
+    """Estado de reprodução da guild para o snapshot (None se não há nada a guardar)."""
+    current = bot.current_track.get(guild_id)
+    queue = bot.music_queue.get(guild_id) or []
+    if current is None and not queue:
+        return None
+    guild = bot.get_guild(guild_id)
+    voice_client = guild.voice_client if guild else None
+    channel = getattr(voice_client, 'channel', None)
+    return {
+        'voice_channel_id': channel.id if channel else None,
+        'loop': dict(bot.loop_control.get(guild_id) or {}),
+        'current': current.to_dict() if current else None,
+        'queue': [t.to_dict() for t in queue],
+        'history': [t.to_dict() for t in bot.music_history.get(guild_id) or []],
+        'saved_at': time.time(),
+    }
+
+
+def _session_fingerprint(guild_id: int) -> Tuple[Any, ...]:
+    """Assinatura barata do estado da guild: muda quando algo precisa ser salvo."""
+    guild = bot.get_guild(guild_id)
+    channel = getattr(guild.voice_client, 'channel', None) if guild else None
+    loop = bot.loop_control.get(guild_id) or {}
+    queue = bot.music_queue.get(guild_id)
+    return (
+        id(bot.current_track.get(guild_id)),
+        (id(queue), queue.version) if queue is not None else None,
+        hash(tuple(map(id, bot.music_history.get(guild_id) or ()))),
+        bool(loop.get('loop_track')), bool(loop.get('loop_queue')),
+        getattr(channel, 'id', None),
+    )
+
+
+def _session_changes() -> Dict[int, Optional[Dict[str, Any]]]:
+    """Estados das guilds que mudaram desde o último snapshot (None = apagar)."""
+    guild_ids = set(bot.current_track) | set(bot.music_queue) | set(bot._session_fingerprints)
+    changes: Dict[int, Optional[Dict[str, Any]]] = {}
+    for guild_id in guild_ids:
+        fingerprint = _session_fingerprint(guild_id)
+        if bot._session_fingerprints.get(guild_id) == fingerprint:
+            continue
+        changes[guild_id] = _session_state(guild_id)
+        bot._session_fingerprints[guild_id] = fingerprint
+    return changes
+
+
+def _session_positions() -> Dict[int, Dict[str, Any]]:
+    """Posição atual da faixa tocando em cada guild."""
+    positions: Dict[int, Dict[str, Any]] = {}
+    for guild_id, track in bot.current_track.items():
+        source = bot.audio_sources.get(guild_id)
+        if isinstance(source, TrackedAudio) and source.track is track:
+            positions[guild_id] = {'key': track.session_key(), 'position': round(source.position, 2)}
+    return positions
+
+
+async def _session_snapshot_loop() -> None:
+    """Salva periodicamente só as guilds cujo estado mudou, mais as posições."""
+    last_positions: Dict[int, Dict[str, Any]] = {}
+    while True:
+        await asyncio.sleep(SESSION_SNAPSHOT_INTERVAL)
+        try:
+            for guild_id, state in _session_changes().items():
+                await bot.sessions.save(guild_id, state)
+            positions = _session_positions()
+            if positions != last_positions:
+                await bot.sessions.save_positions(positions)
+                last_positions = positions
+        except Exception as e:
+            session_log.error("Erro ao salvar snapshot das sessões: %s", e)
+
+
+def _snapshot_sessions_sync() -> None:
+    """Snapshot final, esperando a gravação terminar (usado no desligamento)."""
+    try:
+        bot.sessions.save_sync(_session_changes(), _session_positions())
+    except Exception as e:
+        session_log.error("Erro ao salvar snapshot final das sessões: %s", e)
+
+
+async def _load_sessions() -> Dict[int, Dict[str, Any]]:
+    """
+    Restaura fila, faixa atual, loop e histórico salvos (antes do login).
+
+    Só recria objetos em memória: nenhum stream é extraído aqui, então mesmo
+    filas com milhares de faixas voltam em instantes.
+
+    Returns:
+        dict: {guild_id: estado salvo} das guilds restauradas
+    """
+    start = time.perf_counter()
+    try:
+        data = await bot.sessions.load_async()
+    except Exception as e:
+        session_log.error("Erro ao carregar snapshots das sessões: %s", e)
+        return {}
+
+    restored: Dict[int, Dict[str, Any]] = {}
+    tracks = 0
+    for guild_id, state in data['guilds'].items():
+        # Guilds de outros grupos de shards são retomadas pelos outros processos
+        if not SHARDING.owns(guild_id):
+            continue
+        try:
+            queue = [MusicTrack.from_dict(t) for t in state.get('queue') or []]
+            history = [MusicTrack.from_dict(t) for t in state.get('history') or []]
+            current = MusicTrack.from_dict(state['current']) if state.get('current') else None
+        except (TypeError, KeyError, AttributeError) as e:
+            session_log.warning("⚠️ Snapshot da guild %s inválido, ignorando: %s", guild_id, e)
+            continue
+        if current is not None:
+            saved = data['positions'].get(guild_id) or {}
+            # Posição só vale se for da mesma faixa (o arquivo de posições é mais novo)
+            position = saved.get('position') if saved.get('key') == current.session_key() else None
+            current.resume_at = float(position) if position else 0.0
+            bot.current_track[guild_id] = current
+        bot.music_queue[guild_id] = TrackQueue(queue)
+        bot.music_history[guild_id] = history
+        bot.loop_control[guild_id] = {
+            'loop_track': bool((state.get('loop') or {}).get('loop_track')),
+            'loop_queue': bool((state.get('loop') or {}).get('loop_queue')),
+        }
+        restored[guild_id] = state
+        tracks += len(queue) + (current is not None)
+
+    if restored:
+        elapsed = (time.perf_counter() - start) * 1000
+        session_log.info("✅ Sessões restauradas: %d guild(s), %d faixa(s) em %.0f ms", len(restored), tracks, elapsed)
+    return restored
+
+
+async def _resume_sessions() -> set:
+    """
+    Reconecta às calls salvas nos snapshots e retoma a reprodução.
+
+    Só entra em canais que ainda têm alguém; nas outras guilds a fila fica
+    restaurada e volta a tocar no próximo `/musica`.
+
+    Returns:
+        set: IDs das guilds onde a reprodução foi retomada
+    """
+    async def _resume(guild_id: int, state: Dict[str, Any]) -> Optional[int]:
+        guild = bot.get_guild(guild_id)
+        channel = guild.get_channel(state.get('voice_channel_id') or 0) if guild else None
+        if not isinstance(channel, (discord.VoiceChannel, discord.StageChannel)):
+            return None
+        if not any(not m.bot for m in channel.members):
+            return None
+        voice_client = await _get_or_connect_voice_client(guild, channel)
+        if not isinstance(voice_client, discord.VoiceClient):
+            return None
+        await _play_next_track(guild)
+        current = bot.current_track.get(guild_id)
+        session_log.info("🔄 Sessão retomada em %s: %s", guild.name, current.title if current else 'fila')
+        return guild_id
+
+    sessions, bot._restored_sessions = bot._restored_sessions, {}
+    results = await asyncio.gather(
+        *(_resume(guild_id, state) for guild_id, state in sessions.items()),
+        return_exceptions=True,
+    )
+    resumed = set()
+    for result in results:
+        if isinstance(result, Exception):
+            session_log.error("Erro ao retomar sessão: %s", result)
+        elif result is not None:
+            resumed.add(result)
+    return resumed
+
+
+def _command_tree_hash() -> str:
+    """Hash do payload de todos os slash commands (muda quando algum comando muda)."""
+    payload = []
+    for command in bot.tree.get_commands():
+        try:
+            payload.append(command.to_dict(bot.tree))  # type: ignore[call-arg]
+        except TypeError:
+            payload.append(command.to_dict())  # discord.py < 2.4
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+async def _sync_commands_if_changed() -> None:
+    """
+    Sincroniza os slash commands só quando a árvore mudou desde o último sync.
+
+    O sync global é uma chamada REST lenta e com rate limit; o hash do último
+    sync bem-sucedido fica em disco junto com o ID da aplicação.
+    """
+    hash_file = DATA_DIR / "command_tree.sha256"
+    loop = asyncio.get_running_loop()
+    signature = f"{bot.application_id}:{_command_tree_hash()}"
+    try:
+        previous = await loop.run_in_executor(None, hash_file.read_text, "utf-8")
+    except OSError:
+        previous = ""
+
+    if previous.strip() == signature and not env_flag("FORCE_COMMAND_SYNC", False):
+        command_log.info("✅ Comandos inalterados, sync pulado")
+        return
+    try:
+        await bot.tree.sync()
+    except Exception as e:
+        command_log.error("Erro ao sincronizar comandos: %s", e)
+        return
+    command_log.info("✅ Comandos sincronizados com sucesso!")
+
+    def _save() -> None:
+        hash_file.parent.mkdir(parents=True, exist_ok=True)
+        hash_file.write_text(signature, encoding="utf-8")
+
+    try:
+        await loop.run_in_executor(None, _save)
+    except OSError as e:
+        command_log.error("Erro ao salvar hash dos comandos: %s", e)
+
+
+async def _start_dashboard() -> None:
+    """
+    Inicia o dashboard conforme `DASHBOARD_MODE`, sem atrasar o boot.
+
+    - `embedded`: servidor HTTP no próprio event loop do bot (padrão)
+    - `ipc`: só o canal IPC; o dashboard roda à parte (`python -m dashboard`)
+    - `process`: canal IPC + o bot sobe e vigia o processo do dashboard
+    - `off`: sem dashboard
+    """
+    mode = DASHBOARD_MODE
+    if mode == "off":
+        return
+    try:
+        api_module = await asyncio.get_running_loop().run_in_executor(
+            None, importlib.import_module, "dashboard.api"
+        )
+        api = api_module.DashboardAPI(bot)
+        if mode == "embedded":
+            server = await asyncio.get_running_loop().run_in_executor(
+                None, importlib.import_module, "dashboard.server"
+            )
+            bot.web_server = server.WebServer(api, trust_forwarded=DASHBOARD_TRUST_FORWARDED)  # type: ignore[attr-defined]
+            await bot.web_server.start()  # type: ignore[attr-defined]
+            return
+
+        bot.ipc = IpcServer(api.call, DASHBOARD_IPC_PATH, port=DASHBOARD_IPC_PORT)
+        await bot.ipc.start()
+        dashboard_log.info("🔌 Canal IPC do dashboard em %s", DASHBOARD_IPC_PATH if use_unix_socket() else DASHBOARD_IPC_PORT)
+        if mode == "process":
+            bot.dashboard_task = asyncio.create_task(_supervise_dashboard_process())
+    except Exception as e:
+        dashboard_log.error("Erro ao iniciar o dashboard: %s", e)
+
+
+async def _supervise_dashboard_process() -> None:
+    """Mantém o processo do dashboard no ar enquanto o bot roda."""
+    env = dict(os.environ)
+    env["DASHBOARD_IPC_PATH"] = str(DASHBOARD_IPC_PATH)
+    env["DASHBOARD_IPC_PORT"] = str(DASHBOARD_IPC_PORT)
+    env["DASHBOARD_TRUST_FORWARDED"] = "1" if DASHBOARD_TRUST_FORWARDED else "0"
+    while True:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "dashboard", cwd=str(SCRIPT_DIR), env=env
+        )
+        bot.dashboard_process = process
+        try:
+            code = await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.terminate()
+                try:
+                    await asyncio.wait_for(process.wait(), 5)
+                except asyncio.TimeoutError:
+                    process.kill()
+            raise
+        dashboard_log.warning("⚠️ Processo do dashboard saiu com código %s; reiniciando em 5s", code)
+        await asyncio.sleep(5)
+
+
 bot = CabaBot()
 # Anexa funções auxiliares ao bot para acesso no dashboard
 #bot.add_track_to_guild = add_track_to_guild # type: ignore
 bot.play_previous_track = _play_previous_track # type: ignore
+bot.extraction_cost = _extraction_cost # type: ignore
 
 async def add_track_to_guild(guild: discord.Guild, query: str, requester_id: int, requester_name: str, channel_id: int) -> str:
     """
@@ -681,14 +1951,28 @@ async def add_track_to_guild(guild: discord.Guild, query: str, requester_id: int
     # Lógica de Busca
     url = query
     allow_playlist = False
-    spotify_client_loc = spotify_client # Acessa variável global
 
     # 1. Tratamento Spotify
     if "open.spotify.com" in url:
-        if not spotify_client_loc:
+        if not SPOTIFY_CONFIGURED:
             return "⚠️ Suporte a Spotify não configurado."
+
+        # Playlists e álbuns são expandidos e enfileirados aos poucos
+        parsed = parse_spotify_url(url)
+        if parsed is not None and parsed[0] in ("playlist", "album"):
+            if not isinstance(guild.voice_client, discord.VoiceClient):
+                return "❌ Bot não conectado a um canal de voz."
+            try:
+                added, failed = await _enqueue_spotify_collection(
+                    guild, parsed[0], parsed[1], requester_id, requester_name, channel_id
+                )
+            except Exception as e:
+                spotify_log.error("Erro ao expandir %s do Spotify: %s", parsed[0], e)
+                return "❌ Não consegui ler essa playlist/álbum do Spotify."
+            missing = f" ({failed} não encontradas)" if failed else ""
+            return f"✅ Spotify: {added} música(s) adicionadas{missing}."
         
-        spotify_query = _get_spotify_track_info(url)
+        spotify_query = await _get_spotify_track_info(url)
         if spotify_query:
             query = f'ytsearch:{spotify_query}'
         else:
@@ -700,8 +1984,21 @@ async def add_track_to_guild(guild: discord.Guild, query: str, requester_id: int
     elif "list=" in url or "playlist" in url:
         allow_playlist = True
 
+    # Se for playlist: enfileira conforme as entradas chegam (a primeira já toca)
+    if allow_playlist:
+        if not isinstance(guild.voice_client, discord.VoiceClient):
+            return "❌ Bot não conectado a um canal de voz."
+        try:
+            added = await _enqueue_youtube_playlist(guild, query, requester_id, requester_name, channel_id)
+        except Exception as e:
+            extraction_log.error("Erro ao ler a playlist %s: %s", query, e)
+            return "❌ Não consegui ler essa playlist."
+        if not added:
+            return "❌ Não encontrei nada nessa playlist."
+        return f"✅ Playlist com {added} músicas adicionada."
+
     # Busca tracks
-    tracks = await fetch_tracks(query, allow_playlist=allow_playlist)
+    tracks = await fetch_tracks(query)
     if not tracks:
         return "❌ Não encontrei nada com esse nome."
 
@@ -709,25 +2006,6 @@ async def add_track_to_guild(guild: discord.Guild, query: str, requester_id: int
     if not isinstance(voice_client, discord.VoiceClient):
         return "❌ Bot não conectado a um canal de voz."
 
-    # Se for playlist
-    if len(tracks) > 1:
-        if guild.id not in bot.music_queue:
-            bot.music_queue[guild.id] = []
-        
-        for entry in tracks:
-            audio_url_e = _get_stream_url(entry)
-            if not audio_url_e or "youtube.com/watch" in audio_url_e:
-                continue
-            title_e = entry.get('title', 'Música')
-            mt = MusicTrack(audio_url_e, title_e, requester_id, channel_id, requester_name)
-            bot.music_queue[guild.id].append(mt)
-        
-        # Se não está tocando, inicia
-        if not voice_client.is_playing():
-            await _play_next_track(guild)
-            
-        return f"✅ Playlist com {len(tracks)} músicas adicionada."
-
     # Faixa única
     track_info = tracks[0]
     audio_url = _get_stream_url(track_info)
@@ -736,57 +2014,33 @@ async def add_track_to_guild(guild: discord.Guild, query: str, requester_id: int
     if not audio_url or "youtube.com/watch" in audio_url:
         return "❌ Erro ao extrair áudio."
 
-    track = MusicTrack(audio_url, title, requester_id, channel_id, requester_name)
-    
-    if guild.id not in bot.music_queue:
-        bot.music_queue[guild.id] = []
-        
-    if not voice_client.is_playing():
-        bot.current_track[guild.id] = track
-        # Setup loop control se necessário
-        if guild.id not in bot.loop_control:
-            bot.loop_control[guild.id] = {'loop_track': False, 'loop_queue': False}
-            
-        # Toca
-        try:
-             # Cria a fonte de áudio através do FFmpeg
-            source = discord.FFmpegPCMAudio(
-                audio_url,
-                executable=str(FFMPEG_PATH),
-                before_options=FFMPEG_OPTIONS['before_options'],
-                options=FFMPEG_OPTIONS['options']
-            )
-            
-            def after_track(error):
-                if error: print(f"Erro: {error}")
-                asyncio.run_coroutine_threadsafe(_play_next_track(guild), bot.loop)
-                
-            voice_client.play(source, after=after_track)
-            
-            # Envia player (copiando lógica do play_next)
-            # Como é primeira musica, fazemos manualmente ou chamamos play_next?
-            # A lógica original do comando /musica fazia manualmente.
-            # Vamos simplificar: se play_next_track for robusto, poderiamos usar ele.
-            # Mas ele assume que tira da fila. Aqui já setamos current_track.
-            
-            # Envia UI
-            try:
-                channel = bot.get_channel(channel_id)
-                if isinstance(channel, (discord.TextChannel, discord.Thread)):
-                    embed = discord.Embed(title="🎵 Tocando Agora", description=f"**{title}**", color=discord.Color.green())
-                    embed.add_field(name="Pedido por", value=requester_name, inline=True)
-                    view = MusicPlayerView(guild.id)
-                    msg = await channel.send(embed=embed, view=view)
-                    bot.last_player_message[guild.id] = msg
-            except Exception: pass
-            
-            return f"▶️ Tocando agora: {title}"
-        except Exception as e:
-            return f"❌ Erro ao tocar: {e}"
-    else:
-        bot.music_queue[guild.id].append(track)
+    track = MusicTrack(
+        audio_url, title, requester_id, channel_id, requester_name,
+        video_id=_youtube_id(track_info), duration=track_info.get('duration'),
+        resolved_at=track_info.get('resolved_at'),
+    )
+    if _is_duplicate(guild.id, track_key(track)):
+        return f"⚠️ {title} já está na fila."
+    queue = _guild_queue(guild.id)
+    queue.append(track)
+    if voice_client.is_playing() or voice_client.is_paused():
         return f"✅ Adicionado à fila: {title}"
 
+    # Nada tocando: o player tira a faixa da fila sob o lock da guild
+    # (e manda a UI com os botões), como em qualquer troca de música
+    if guild.id not in bot.loop_control:
+        bot.loop_control[guild.id] = {'loop_track': False, 'loop_queue': False}
+    try:
+        await _play_next_track(guild)
+    except Exception as e:
+        return f"❌ Erro ao tocar: {e}"
+    if bot.current_track.get(guild.id) is track:
+        return f"▶️ Tocando agora: {title}"
+    return f"✅ Adicionado à fila: {title}"
+
+# Disponibiliza para o dashboard (precisa vir depois da definição)
+bot.add_track_to_guild = add_track_to_guild  # type: ignore
+
 # --- COMANDOS DE CONFIGURAÇÃO ---
 
 @bot.tree.command(name="startup_audio", description="Ativa/desativa áudio de boas-vindas neste servidor")
@@ -813,10 +2067,34 @@ async def startup_audio(interaction: discord.Interaction, enabled: bool):
     await interaction.response.send_message(f"Áudio de startup {state} neste servidor.", ephemeral=True)
 
 
+@bot.tree.command(name="duplicatas", description="Permite ou recusa a mesma música mais de uma vez na fila")
+@app_commands.describe(permitir="true para aceitar repetidas, false para recusar")
+async def duplicatas(interaction: discord.Interaction, permitir: bool):
+    """
+    Comando para aceitar ou recusar músicas repetidas na fila deste servidor.
+
+    Exige permissão `Manage Guild` para alterar a configuração.
+    """
+    if interaction.guild is None:
+        await interaction.response.send_message("Oxente — esse comando só funciona dentro de um servidor, visse?", ephemeral=True)
+        return
+
+    if not isinstance(interaction.user, discord.Member) or not interaction.user.guild_permissions.manage_guild:
+        await interaction.response.send_message("Você precisa da permissão 'Gerenciar Servidor' pra isso.", ephemeral=True)
+        return
+
+    set_guild_duplicates(interaction.guild.id, permitir)
+    state = "aceita" if permitir else "não aceita mais"
+    await interaction.response.send_message(f"A fila {state} música repetida neste servidor.", ephemeral=True)
+
 
-def _get_spotify_track_info(url: str) -> Optional[str]:
+
+async def _get_spotify_track_info(url: str) -> Optional[str]:
     """
     Tenta extrair informações (Artista - Título) de uma URL do Spotify.
+
+    A chamada à API roda fora do event loop; o resultado fica em cache por id
+    e links que chegam juntos são resolvidos numa única chamada em lote.
     
     Args:
         url (str): URL da faixa no Spotify
@@ -824,24 +2102,197 @@ def _get_spotify_track_info(url: str) -> Optional[str]:
     Returns:
         Optional[str]: 'Artista - Título' ou None se falhar
     """
-    if not spotify_client:
+    if bot.spotify is None:
         return None
 
+    # Suporta apenas faixas individuais por enquanto
+    parsed = parse_spotify_url(url)
+    if parsed is None or parsed[0] != "track":
+        return None
+    with tracing.span("spotify", kind="track"):
+        track = await bot.spotify.get_track(parsed[1])
+    return track_query(track) if track else None
+
+
+async def _match_spotify_track(index: int, sp_track: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Casa uma faixa do Spotify com um vídeo do YouTube.
+
+    Casamentos anteriores vêm do cache persistente, sem nenhuma extração (o
+    stream é resolvido só na hora de tocar). A primeira faixa vai na lane
+    interativa; as demais, na lane de fundo.
+    """
+    cached = bot.spotify_matches.get(sp_track['id'])
+    if cached:
+        return {**cached, 'url': None}
+
+    lane = Lane.INTERACTIVE if index == 0 else Lane.BACKGROUND
     try:
-        # Suporta apenas faixas individuais por enquanto
-        if "track" in url:
-            track = spotify_client.track(url)
-            if track and 'artists' in track and track['artists']:
-                artist = track['artists'][0]['name']
-                name = track['name']
-                return f"{artist} - {name}"
+        entries = await fetch_tracks(f"ytsearch:{track_query(sp_track)}", lane=lane)
     except Exception as e:
-        print(f"Erro ao buscar no Spotify: {e}")
+        spotify_log.warning("Erro ao buscar '%s' no YouTube: %s", track_query(sp_track), e, extra=SAMPLED)
         return None
-    return None
+    if not entries:
+        return None
+
+    entry = entries[0]
+    match = {
+        'video_id': entry.get('id'),
+        'title': entry.get('title') or track_query(sp_track),
+        'duration': entry.get('duration'),
+    }
+    if match['video_id']:
+        bot.spotify_matches.put(sp_track['id'], match)
+    audio_url = _get_stream_url(entry)
+    if not audio_url or "youtube.com/watch" in audio_url:
+        audio_url = None
+        if not match['video_id']:
+            return None
+    return {**match, 'url': audio_url}
+
+
+async def _enqueue_spotify_collection(
+    guild: discord.Guild,
+    kind: str,
+    collection_id: str,
+    requester_id: int,
+    requester_name: str,
+    channel_id: int,
+) -> Tuple[int, int]:
+    """
+    Expande uma playlist/álbum do Spotify e enfileira as faixas na ordem.
+
+    As páginas são lidas da API sob demanda e o casamento com o YouTube roda
+    com concorrência limitada; cada faixa entra na fila assim que ela e todas
+    as anteriores estiverem prontas, então a primeira começa a tocar logo.
+
+    Returns:
+        Tuple[int, int]: (faixas adicionadas, faixas não encontradas)
+    """
+    added = failed = duplicates = 0
+    with tracing.span("spotify", kind=kind) as span_attrs:
+        sp_tracks = bot.spotify.iter_collection(kind, collection_id, limit=SPOTIFY_COLLECTION_LIMIT)
+        async for _, match in ordered_map(sp_tracks, _match_spotify_track, SPOTIFY_MATCH_CONCURRENCY):
+            if match is None:
+                failed += 1
+                continue
+            track = MusicTrack(
+                match['url'] or "",
+                match['title'],
+                requester_id,
+                channel_id,
+                requester_name,
+                video_id=match['video_id'],
+                duration=match['duration'],
+            )
+            if _is_duplicate(guild.id, track_key(track)):
+                duplicates += 1
+                continue
+            _guild_queue(guild.id).append(track)
+            added += 1
+            if added == 1:
+                tracing.event("spotify_first_track")
+
+            voice_client = guild.voice_client
+            if isinstance(voice_client, discord.VoiceClient) and not voice_client.is_playing() and not voice_client.is_paused():
+                await _play_next_track(guild)
+            else:
+                _prefetch_next(guild.id)
+        span_attrs.update(added=added, failed=failed, duplicates=duplicates)
+    return added, failed
+
+async def _enqueue_youtube_playlist(
+    guild: discord.Guild,
+    query: str,
+    requester_id: int,
+    requester_name: str,
+    channel_id: int,
+    on_progress: Optional[Callable[[int, bool], Awaitable[None]]] = None,
+) -> int:
+    """
+    Enfileira uma playlist/mix do YouTube conforme as entradas chegam.
+
+    Entradas que já estão na fila são puladas se a guild não aceita repetidas.
+
+    A primeira entrada começa a tocar assim que é listada; as outras entram
+    na fila só com o ID do vídeo e o stream é resolvido na hora de tocar. Em
+    links `watch?v=...&list=...` o vídeo do link é extraído em paralelo com a
+    listagem, então o primeiro áudio sai tão rápido quanto o de uma faixa só.
+
+    Args:
+        on_progress: Chamado com (faixas adicionadas, terminou) a cada entrada
+
+    Returns:
+        int: Quantidade de faixas adicionadas
+    """
+    added = duplicates = 0
+    first_id = video_id_from_url(query, in_playlist=True)
+    first = asyncio.ensure_future(fetch_tracks(f"https://www.youtube.com/watch?v={first_id}")) if first_id else None
+    try:
+        with tracing.span("ytdlp_playlist") as span_attrs:
+            async for entry in _iter_playlist_entries(query):
+                video_id = _youtube_id(entry)
+                if first is not None and video_id == first_id:
+                    resolved = await asyncio.gather(first, return_exceptions=True)
+                    first = None
+                    if isinstance(resolved[0], list) and resolved[0]:
+                        entry = resolved[0][0]
+                audio_url = _get_stream_url(entry)
+                if audio_url and "youtube.com/watch" in audio_url:
+                    audio_url = None
+                if not audio_url and not video_id:
+                    continue
+                track = MusicTrack(
+                    audio_url or "", entry.get('title') or 'Música', requester_id, channel_id, requester_name,
+                    video_id=video_id, duration=entry.get('duration'),
+                    resolved_at=entry.get('resolved_at'),
+                )
+                if _is_duplicate(guild.id, track_key(track)):
+                    duplicates += 1
+                    continue
+                _guild_queue(guild.id).append(track)
+                added += 1
+                if added == 1:
+                    tracing.event("playlist_first_track")
+
+                voice_client = guild.voice_client
+                if isinstance(voice_client, discord.VoiceClient) and not voice_client.is_playing() and not voice_client.is_paused():
+                    await _play_next_track(guild)
+                else:
+                    _prefetch_next(guild.id)
+                if on_progress is not None:
+                    await on_progress(added, False)
+            span_attrs.update(added=added, duplicates=duplicates)
+    finally:
+        if first is not None:
+            first.cancel()
+    if on_progress is not None:
+        await on_progress(added, True)
+    return added
+
+
+def _progress_editor(message: Any, label: str) -> Callable[[int, bool], Awaitable[None]]:
+    """Edita `message` com o progresso do enfileiramento (no máximo a cada PLAYLIST_PROGRESS_INTERVAL s)."""
+    last_edit = 0.0
+
+    async def report(added: int, done: bool) -> None:
+        nonlocal last_edit
+        now = time.monotonic()
+        if not done and now - last_edit < PLAYLIST_PROGRESS_INTERVAL:
+            return
+        last_edit = now
+        status = "pronto!" if done else "chegando mais..."
+        try:
+            await message.edit(content=f"📚 {label}: {added} música(s) na fila — {status}")
+        except discord.HTTPException as e:
+            command_log.debug("Não deu para editar o progresso da playlist: %s", e, extra=SAMPLED)
+
+    return report
+
 
 @bot.tree.command(name="musica", description="Toca uma música do YouTube ou Spotify")
 @app_commands.describe(url="URL (YouTube/Spotify) ou nome da música")
+@traced
 async def musica(interaction: discord.Interaction, url: str):
     """
     Comando para reproduzir uma música.
@@ -849,9 +2300,10 @@ async def musica(interaction: discord.Interaction, url: str):
     Suporta:
     - Busca por nome (YouTube)
     - URL do YouTube (Vídeo ou Playlist)
-    - URL do Spotify (Faixa única -> busca automática no YouTube)
+    - URL do Spotify (Faixa, playlist ou álbum -> busca automática no YouTube)
     """
-    await interaction.response.defer()
+    with tracing.span("defer"):
+        await interaction.response.defer()
 
     # Validações básicas de guild e membro
     member = await _validate_guild_and_member(interaction)
@@ -867,6 +2319,17 @@ async def musica(interaction: discord.Interaction, url: str):
     if voice_channel is None:
         await interaction.followup.send("Bota-se num canal de voz primeiro, visse? Só assim eu toco a música.")
         return
+
+    # Controle de admissão: evita que uma guild/usuário monopolize o yt-dlp
+    admission = bot.admission.check(interaction.guild.id, member.id, _extraction_cost(url))
+    if not admission.allowed:
+        await interaction.followup.send(_admission_message(admission))
+        return
+    if admission.wait > 0:
+        if admission.wait >= 1:
+            await interaction.followup.send(_admission_message(admission))
+        with tracing.span("admission_wait", scope=admission.scope):
+            await asyncio.sleep(admission.wait)
     
     # Conecta ao canal de voz
     voice_client = await _get_or_connect_voice_client(interaction.guild, voice_channel)
@@ -880,11 +2343,29 @@ async def musica(interaction: discord.Interaction, url: str):
 
     # 1. Tratamento Spotify
     if "open.spotify.com" in url:
-        if not spotify_client:
+        if not SPOTIFY_CONFIGURED:
             await interaction.followup.send("⚠️ Suporte a Spotify não configurado neste bot (falta credenciais). Tente usar link do YouTube.")
             return
+
+        # Playlists e álbuns: expande e vai enfileirando enquanto casa no YouTube
+        parsed = parse_spotify_url(url)
+        if parsed is not None and parsed[0] in ("playlist", "album"):
+            await interaction.followup.send("📚 Link de playlist/álbum do Spotify: buscando as músicas no YouTube, a primeira já já começa...")
+            cid = interaction.channel_id if interaction.channel_id else 0
+            try:
+                added, failed = await _enqueue_spotify_collection(
+                    interaction.guild, parsed[0], parsed[1],
+                    interaction.user.id, interaction.user.display_name, cid
+                )
+            except Exception as e:
+                spotify_log.error("Erro ao expandir %s do Spotify: %s", parsed[0], e)
+                await interaction.followup.send("❌ Não consegui ler essa playlist/álbum do Spotify. Ela é pública?")
+                return
+            missing = f" ({failed} não encontrada(s) no YouTube)" if failed else ""
+            await interaction.followup.send(f"📚 Spotify: {added} música(s) adicionadas à fila{missing}.")
+            return
         
-        spotify_query = _get_spotify_track_info(url)
+        spotify_query = await _get_spotify_track_info(url)
         if spotify_query:
             query = f'ytsearch:{spotify_query}'
             await interaction.followup.send(f"🔎 Link Spotify detectado: Buscando **'{spotify_query}'** no YouTube...")
@@ -898,41 +2379,33 @@ async def musica(interaction: discord.Interaction, url: str):
     elif "list=" in url or "playlist" in url:
         allow_playlist = True
 
-    # Busca tracks (pode retornar múltiplas entradas se for playlist)
-    tracks = await fetch_tracks(query, allow_playlist=allow_playlist)
-    if not tracks:
-        await interaction.followup.send("Não encontrei nada com esse nome, visse? Tenta outro termo ou URL.")
+    # Playlist/mix: enfileira conforme as entradas chegam, editando o progresso
+    if allow_playlist:
+        progress = await interaction.followup.send("📚 Lendo a playlist/mix — a primeira já já começa...", wait=True)
+        # Garante que channel_id seja int (fallback para 0 se None)
+        cid = interaction.channel_id if interaction.channel_id else 0
+        try:
+            added = await _enqueue_youtube_playlist(
+                interaction.guild, query, interaction.user.id, interaction.user.display_name, cid,
+                on_progress=_progress_editor(progress, "Playlist/mix"),
+            )
+        except Exception as e:
+            extraction_log.error("Erro ao ler a playlist %s: %s", url, e)
+            await progress.edit(content="❌ Não consegui ler essa playlist, visse? Ela é pública?")
+            return
+        if not added:
+            await progress.edit(content="Não encontrei nada nessa playlist, visse? Tenta outro link.")
         return
 
-    # Se for múltiplas faixas (playlist/mix), adiciona todas à fila
-    if len(tracks) > 1:
-        added = 0
-        # Inicializa a fila se necessário
-        if interaction.guild.id not in bot.music_queue:
-            bot.music_queue[interaction.guild.id] = []
-
-        for entry in tracks:
-            audio_url_e = _get_stream_url(entry)
-            if not audio_url_e or "youtube.com/watch" in audio_url_e:
-                continue
-            title_e = entry.get('title', 'Música')
-            # Garante que channel_id seja int (fallback para 0 se None)
-            cid = interaction.channel_id if interaction.channel_id else 0
-            mt = MusicTrack(audio_url_e, title_e, interaction.user.id, cid, interaction.user.display_name)
-            bot.music_queue[interaction.guild.id].append(mt)
-            added += 1
-
-        # Se nada estava tocando, toca a primeira da fila
-        voice_client = await _get_or_connect_voice_client(interaction.guild, voice_channel)
-        if voice_client is None:
-            await interaction.followup.send("Erro ao conectar ao canal de voz, tenta de novo aí.")
-            return
+    # Link de vídeo que já está na fila: recusa antes de gastar uma extração
+    if _is_duplicate(interaction.guild.id, video_id_from_url(url)):
+        await interaction.followup.send("⚠️ Essa já tá na fila, visse? Aqui não aceita repetida.")
+        return
 
-        if isinstance(voice_client, discord.VoiceClient) and not voice_client.is_playing() and bot.music_queue[interaction.guild.id]:
-            # Inicia o ciclo de reprodução (que vai enviar o UI)
-            await _play_next_track(interaction.guild)
-        
-        await interaction.followup.send(f"📚 Playlist/mix adicionada à fila — {added} música(s) adicionadas.")
+    # Busca tracks
+    tracks = await fetch_tracks(query)
+    if not tracks:
+        await interaction.followup.send("Não encontrei nada com esse nome, visse? Tenta outro termo ou URL.")
         return
 
     # Caso única faixa
@@ -949,75 +2422,81 @@ async def musica(interaction: discord.Interaction, url: str):
         return
 
     try:
-        # Cria a fonte de áudio através do FFmpeg
-        source = discord.FFmpegPCMAudio(
-            audio_url,
-            executable=str(FFMPEG_PATH),
-            before_options=FFMPEG_OPTIONS['before_options'],
-            options=FFMPEG_OPTIONS['options']
-        )
-
         # Cria a faixa de música
         # IMPORTANTE: Passamos o channel_id para saber onde enviar o player depois
         # Garante channel_id válido
         cid = interaction.channel_id if interaction.channel_id else 0
-        track = MusicTrack(audio_url, title, interaction.user.id, cid, interaction.user.display_name)  # type: ignore[assignment]
-        
+        track = MusicTrack(  # type: ignore[assignment]
+            audio_url, title, interaction.user.id, cid, interaction.user.display_name,
+            video_id=_youtube_id(track), duration=track.get('duration'),
+            resolved_at=track.get('resolved_at'),
+        )
+        if _is_duplicate(interaction.guild.id, track_key(track)):
+            await interaction.followup.send(f"⚠️ **{title}** já tá na fila, visse? Aqui não aceita repetida.")
+            return
+
         # Inicializa a fila para este servidor se não existir
-        if interaction.guild.id not in bot.music_queue:
-            bot.music_queue[interaction.guild.id] = []
+        queue = _guild_queue(interaction.guild.id)
         
-        # Se não há música tocando, toca direto e configura callback para próxima
-        if isinstance(voice_client, discord.VoiceClient) and not voice_client.is_playing():
-            guild = interaction.guild
-            def after_track(error):
-                if error:
-                    print(f"Erro ao reproduzir: {error}")
-                asyncio.run_coroutine_threadsafe(_play_next_track(guild), bot.loop)
-            
-            # Armazena a música atual
-            bot.current_track[interaction.guild.id] = track
+        # Entra na fila; se nada está tocando, o player tira ela de lá sob o
+        # lock da guild e manda a UI com os botões no canal
+        queue.append(track)
+        queue_pos = len(queue)
+        if isinstance(voice_client, discord.VoiceClient) and not (voice_client.is_playing() or voice_client.is_paused()):
             # Inicializa controle de loop se não existir
             if interaction.guild.id not in bot.loop_control:
                 bot.loop_control[interaction.guild.id] = {'loop_track': False, 'loop_queue': False}
-            
-            print(f"DEBUG musica: about to play title={title} url_len={len(audio_url) if audio_url else 0} vc={voice_client} channel={getattr(voice_client.channel,'name',None)}")
-            voice_client.play(source, after=after_track)
-            
-            # --- ENVIA O PLAYER COM BOTÕES (Primeira música) ---
-            embed = discord.Embed(
-                title="🎵 Tocando Agora",
-                description=f"**{title}**",
-                color=discord.Color.green()
-            )
-            embed.add_field(name="Pedido por", value=interaction.user.display_name, inline=True)
-            view = MusicPlayerView(interaction.guild.id)
-            await interaction.followup.send(embed=embed, view=view)
-            
-        else:
-            # Se há música tocando, adiciona à fila
-            bot.music_queue[interaction.guild.id].append(track)
-            queue_pos = len(bot.music_queue[interaction.guild.id])
-            await interaction.followup.send(
-                f"📋 **{title}** foi adicionada à fila na posição **#{queue_pos}**"
-            )
+            player_log.debug("Iniciando %s em %s (primeira do /musica)", title, interaction.guild.id, extra=SAMPLED)
+            await _play_next_track(interaction.guild)
+
+        with tracing.span("reply"):
+            if bot.current_track.get(interaction.guild.id) is track:
+                await interaction.followup.send(f"▶️ Tocando agora: **{title}**")
+            else:
+                await interaction.followup.send(
+                    f"📋 **{title}** foi adicionada à fila na posição **#{queue_pos}**"
+                )
     except Exception as e:
         # Captura e informa qualquer erro durante a reprodução
         await interaction.followup.send(f"Oxente, deu ruim ao iniciar o áudio: {str(e)[:100]}")
 
 
+@musica.autocomplete("url")
+async def musica_autocomplete(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+    """
+    Sugere títulos já tocados usando só o índice local (responde bem antes dos 3s do Discord).
+
+    O valor da sugestão é a URL direta do vídeo, então o `/musica` pula a busca.
+    """
+    if current.startswith("http"):
+        return []
+    choices = []
+    for entry in bot.title_index.search(current, limit=25):
+        suffix = ""
+        if entry.get('duration'):
+            minutes, seconds = divmod(int(entry['duration']), 60)
+            suffix = f" ({minutes}:{seconds:02d})"
+        choices.append(app_commands.Choice(
+            name=entry['title'][:100 - len(suffix)] + suffix,
+            value=f"https://www.youtube.com/watch?v={entry['video_id']}",
+        ))
+    return choices
+
+
 @bot.tree.command(name="timer", description="Define um timer em segundos e toca uma música ao fim")
 @app_commands.describe(
     segundos="Quantos segundos quer esperar? (máximo 1200)",
     url="URL do YouTube para tocar quando o timer acabar"
 )
+@traced
 async def timer(interaction: discord.Interaction, segundos: int, url: str):
     """
     Comando para criar um timer que reproduz uma música ao terminar.
     
-    Útil para pausas, exercícios ou lembretes musicais. O timer é
-    assíncrono - o bot continua respondendo a outros comandos enquanto
-    o timer está ativo.
+    Útil para pausas, exercícios ou lembretes musicais. O timer fica no
+    agendador central (persistido em disco), então sobrevive a reinícios e
+    pode ser listado (`/timers`) e cancelado (`/cancelar_timer`). O áudio
+    do alarme é extraído um pouco antes do disparo.
     
     Args:
         interaction (discord.Interaction): A interação do slash command
@@ -1027,6 +2506,7 @@ async def timer(interaction: discord.Interaction, segundos: int, url: str):
     Validações:
         - Usuário deve estar em um canal de voz
         - Valor de segundos deve ser razoável (evita timers muito longos)
+        - Limite de timers pendentes por usuário
     """
     
     async def safe_send(content: str, *, ephemeral: bool = True):
@@ -1052,82 +2532,199 @@ async def timer(interaction: discord.Interaction, segundos: int, url: str):
         await safe_send("Bota-se num canal de voz primeiro, visse? Só assim eu toco a música.", ephemeral=True)
         return
 
-    # Confirma a interação com defer para evitar timeout (comando pode levar tempo)
-    if not interaction.response.is_done():
-        await interaction.response.defer()
-    
+    if segundos <= 0 or segundos > TIMER_MAX_SECONDS:
+        await safe_send(f"Oxente — o timer vai de 1 a {TIMER_MAX_SECONDS} segundos, visse?", ephemeral=True)
+        return
+
+    if len(bot.timers.pending(user_id=member.id)) >= TIMER_MAX_PER_USER:
+        await safe_send(
+            f"Tu já tem {TIMER_MAX_PER_USER} timers rodando, visse? Cancela algum com `/cancelar_timer`.",
+            ephemeral=True,
+        )
+        return
+
+    # Controle de admissão: o alarme também dispara uma extração no yt-dlp
+    admission = bot.admission.check(interaction.guild.id, member.id, ADMISSION_TRACK_COST)
+    if not admission.allowed:
+        await safe_send(_admission_message(admission), ephemeral=True)
+        return
+
+    # O agendador central guarda o timer em disco; nada fica esperando aqui
+    entry = bot.timers.schedule(
+        interaction.guild.id,
+        interaction.channel_id or 0,
+        member.id,
+        member.display_name,
+        url,
+        segundos,
+    )
+
     # Informa o usuário que o timer foi iniciado
     await safe_send(
-        f"⏱️ Timer de {segundos}s iniciado — vou avisar quando acabar, visse? \n"
+        f"⏱️ Timer `{entry.timer_id}` de {segundos}s iniciado — toca <t:{int(entry.fire_at)}:R>, visse? \n"
         f"🎵 Música: `{url}` \n"
         f"👤 Pedido por {member.mention}",
+        ephemeral=False,
     )
 
-    # Aguarda o tempo especificado do timer
-    try:
-        await asyncio.sleep(segundos)
-    except asyncio.CancelledError:
-        await safe_send(f"{member.mention} ⏱️ Timer foi cancelado.")
-        return
 
-    # Quando o timer acabar, toca a música
-    voice_channel = member.voice.channel
-    voice_client = await _get_or_connect_voice_client(interaction.guild, voice_channel)
-    
-    if voice_client is None:
-        await safe_send(f"{member.mention} ⏱️ Timer acabou — erro ao conectar ao canal ❌", ephemeral=True)
+def _timer_query(entry: TimerEntry) -> str:
+    """Formata a query do timer para o yt-dlp."""
+    return entry.query if entry.query.startswith("http") else f"ytsearch:{entry.query}"
+
+
+async def _prepare_timer(entry: TimerEntry) -> None:
+    """Extrai o áudio do alarme um pouco antes do disparo (lane de prefetch)."""
+    entries = await fetch_tracks(_timer_query(entry), lane=Lane.PREFETCH)
+    if entries and _get_stream_url(entries[0]):
+        entry.resolved = entries[0]
+
+
+async def _timer_notify(entry: TimerEntry, content: str) -> None:
+    channel = bot.get_channel(entry.channel_id)
+    if isinstance(channel, (discord.TextChannel, discord.Thread, discord.VoiceChannel)):
+        try:
+            await channel.send(content)
+        except discord.HTTPException as e:
+            timer_log.error("Erro ao avisar o timer %s: %s", entry.timer_id, e)
+
+
+async def _fire_timer(entry: TimerEntry) -> None:
+    """Toca o alarme de um timer vencido no canal de voz onde o dono está agora."""
+    mention = f"<@{entry.user_id}>"
+    late = time.time() - entry.fire_at
+    if late > TIMER_MAX_LATE:
+        # Bot ficou fora do ar e o timer passou da hora: só avisa
+        await _timer_notify(entry, f"{mention} ⏱️ O timer `{entry.timer_id}` venceu enquanto eu tava fora, foi mal visse?")
         return
 
-    # Formata a query para busca
-    query = 'ytsearch:' + url if not url.startswith("http") else url
-    results = await search_ytdlp_async(query, YTDLP_OPTIONS)
+    guild = bot.get_guild(entry.guild_id)
+    member = guild.get_member(entry.user_id) if guild else None
+    if guild is None or member is None or not member.voice or not member.voice.channel:
+        await _timer_notify(entry, f"{mention} ⏱️ Timer acabou — mas tu não tá em nenhuma call, então não toquei nada.")
+        return
 
-    # Valida se encontrou resultado
-    if not results:
-        await safe_send(f"{member.mention} ⏱️ Timer acabou — não achei a música, visse? ❌", ephemeral=True)
+    voice_client = await _get_or_connect_voice_client(guild, member.voice.channel)
+    if voice_client is None:
+        await _timer_notify(entry, f"{mention} ⏱️ Timer acabou — erro ao conectar ao canal ❌")
         return
 
-    # Extrai informações da faixa
-    if 'entries' in results:
-        track = results['entries'][0]
-    else:
-        track = results
+    # Normalmente já foi resolvido pelo _prepare_timer; se não, extrai agora
+    track = entry.resolved
+    if track is None:
+        entries = await fetch_tracks(_timer_query(entry))
+        track = entries[0] if entries else None
+    if track is None:
+        await _timer_notify(entry, f"{mention} ⏱️ Timer acabou — não achei a música, visse? ❌")
+        return
 
-    try:
-        print(f"DEBUG timer track keys: {list(track.keys())}")
-    except Exception:
-        print("DEBUG timer: track is not a mapping")
     audio_url = _get_stream_url(track)
     title = track.get('title', 'Música')
-    
+
     # Valida extração de URL
     if not audio_url or "youtube.com/watch" in audio_url:
-        await safe_send(f"{member.mention} ⏱️ Timer acabou — o YouTube não deixou pegar o áudio ❌", ephemeral=True)
+        await _timer_notify(entry, f"{mention} ⏱️ Timer acabou — o YouTube não deixou pegar o áudio ❌")
+        return
+
+    if not isinstance(voice_client, discord.VoiceClient):
+        await _timer_notify(entry, f"{mention} ⏱️ Timer acabou — não consegui tocar nessa call ❌")
         return
 
-    # Configurações FFmpeg
     try:
-        # Cria e reproduz a fonte de áudio
-        source = discord.FFmpegPCMAudio(
-            audio_url,
-            executable=str(FFMPEG_PATH),
-            before_options=FFMPEG_OPTIONS['before_options'],
-            options=FFMPEG_OPTIONS['options']
+        alarm = MusicTrack(
+            audio_url, title, entry.user_id, entry.channel_id, entry.user_name,
+            video_id=_youtube_id(track), duration=track.get('duration'),
+            resolved_at=track.get('resolved_at'),
         )
+        # Cria a fonte de áudio (o alarme também ocupa uma vaga de FFmpeg)
+        source = await _open_audio(guild.id, alarm)
+
+        # Quando o alarme acaba, a fila segue de onde estava (o alarme sai do
+        # lugar de música atual para o loop da música não repetir ele)
+        async def resume_queue():
+            if bot.current_track.get(guild.id) is alarm:
+                del bot.current_track[guild.id]
+            await _play_next_track(guild)
 
-        if isinstance(voice_client, discord.VoiceClient):
-            # Se já estiver tocando algo, para a música para tocar o alarme
-            if voice_client.is_playing():
+        def after_alarm(error):
+            if error:
+                player_log.error("Erro ao reproduzir o alarme: %s", error)
+            asyncio.run_coroutine_threadsafe(resume_queue(), bot.loop)
+
+        lock = bot.play_locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            # Se já estiver tocando (ou pausado), para a música para tocar o alarme
+            if voice_client.is_playing() or voice_client.is_paused():
                 voice_client.stop()
-            
+
             # Armazena música atual para controle de permissões
-            # Channel ID é o canal da interação, fallback 0
-            cid = interaction.channel_id if interaction.channel_id else 0
-            bot.current_track[interaction.guild.id] = MusicTrack(audio_url, title, member.id, cid, member.display_name)
-            voice_client.play(source)
-            await safe_send(f"{member.mention} ⏱️ Timer acabou — tocando agora: **{title}**, aproveita aí!")
+            bot.current_track[guild.id] = alarm
+            try:
+                voice_client.play(source, after=after_alarm)
+            except Exception:
+                source.cleanup()
+                if bot.current_track.get(guild.id) is alarm:
+                    del bot.current_track[guild.id]
+                raise
+            bot.audio_sources[guild.id] = source
+        await _timer_notify(entry, f"{mention} ⏱️ Timer acabou — tocando agora: **{title}**, aproveita aí!")
     except Exception as e:
-        await safe_send(f"{member.mention} ⏱️ Acabou o timer mas deu ruim ao reproduzir: {str(e)[:50]}")
+        await _timer_notify(entry, f"{mention} ⏱️ Acabou o timer mas deu ruim ao reproduzir: {str(e)[:50]}")
+
+
+@bot.tree.command(name="timers", description="Lista os timers pendentes neste servidor")
+async def timers(interaction: discord.Interaction):
+    """Lista os timers pendentes da guild, do mais próximo ao mais distante."""
+    if interaction.guild is None:
+        await interaction.response.send_message("Oxente — esse comando só funciona dentro de um servidor, visse?", ephemeral=True)
+        return
+
+    pending = bot.timers.pending(guild_id=interaction.guild.id)
+    if not pending:
+        await interaction.response.send_message("Nenhum timer rodando agora, visse?", ephemeral=True)
+        return
+
+    lines = [
+        f"`{e.timer_id}` — <t:{int(e.fire_at)}:R> — `{e.query[:40]}` ({e.user_name})"
+        for e in pending[:20]
+    ]
+    if len(pending) > 20:
+        lines.append(f"... e mais {len(pending) - 20} timer(s)")
+    embed = discord.Embed(title="⏱️ Timers pendentes", description="\n".join(lines), color=discord.Color.orange())
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@bot.tree.command(name="cancelar_timer", description="Cancela um timer pendente")
+@app_commands.describe(timer_id="ID do timer (veja em /timers)")
+async def cancelar_timer(interaction: discord.Interaction, timer_id: str):
+    """Cancela um timer do próprio usuário (ou qualquer um, para quem gerencia o servidor)."""
+    if interaction.guild is None or not isinstance(interaction.user, discord.Member):
+        await interaction.response.send_message("Oxente — esse comando só funciona dentro de um servidor, visse?", ephemeral=True)
+        return
+
+    entry = bot.timers.get(timer_id.strip())
+    if entry is None or entry.guild_id != interaction.guild.id:
+        await interaction.response.send_message("Não achei esse timer, visse? Confere em `/timers`.", ephemeral=True)
+        return
+    if entry.user_id != interaction.user.id and not interaction.user.guild_permissions.manage_guild:
+        await interaction.response.send_message("Esse timer não é teu, visse?", ephemeral=True)
+        return
+
+    bot.timers.cancel(entry.timer_id)
+    await interaction.response.send_message(f"⏱️ Timer `{entry.timer_id}` cancelado.", ephemeral=True)
+
+
+@cancelar_timer.autocomplete("timer_id")
+async def cancelar_timer_autocomplete(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+    """Sugere os timers pendentes do usuário nesta guild."""
+    if interaction.guild is None:
+        return []
+    pending = bot.timers.pending(guild_id=interaction.guild.id, user_id=interaction.user.id)
+    return [
+        app_commands.Choice(name=f"{e.timer_id} — {e.query[:60]}", value=e.timer_id)
+        for e in pending
+        if current.lower() in e.timer_id or current.lower() in e.query.lower()
+    ][:25]
 
 
 # ============================================================================
@@ -1135,6 +2732,7 @@ async def timer(interaction: discord.Interaction, segundos: int, url: str):
 # ============================================================================
 
 @bot.tree.command(name="parar", description="Para a música que está tocando")
+@traced
 async def parar(interaction: discord.Interaction):
     """
     Comando para parar a reprodução de música e limpar a fila.
@@ -1168,7 +2766,7 @@ async def parar(interaction: discord.Interaction):
         voice_client.stop()  # type: ignore[attr-defined]
     
     # Limpa a fila para este servidor
-    bot.music_queue[guild.id] = []
+    _guild_queue(guild.id).clear()
     
     # Desativa loops
     if guild.id in bot.loop_control:
@@ -1178,6 +2776,7 @@ async def parar(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="pausar", description="Pausa a música que está tocando")
+@traced
 async def pausar(interaction: discord.Interaction):
     """
     Comando para pausar a reprodução de música.
@@ -1211,6 +2810,7 @@ async def pausar(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="retomar", description="Retoma a música pausada")
+@traced
 async def retomar(interaction: discord.Interaction):
     """
     Comando para retomar a reprodução de uma música pausada.
@@ -1244,6 +2844,7 @@ async def retomar(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="pular", description="Pula para a próxima música da fila")
+@traced
 async def pular(interaction: discord.Interaction):
     """
     Comando para pular a música atual.
@@ -1283,6 +2884,7 @@ async def pular(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="limpar_fila", description="Limpa a fila de músicas")
+@traced
 async def limpar_fila(interaction: discord.Interaction):
     """
     Comando para limpar a fila de reprodução de música.
@@ -1303,7 +2905,7 @@ async def limpar_fila(interaction: discord.Interaction):
         return
     
     # Limpa a fila para este servidor
-    bot.music_queue[guild.id] = []
+    _guild_queue(guild.id).clear()
     
     await interaction.response.send_message("🗑️ Limpei a fila, tá zerado.", ephemeral=True)
 
@@ -1390,6 +2992,45 @@ async def agora(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
+@bot.tree.command(name="historico", description="Mostra as músicas mais tocadas ou as últimas tocadas no servidor")
+@app_commands.describe(tipo="O que mostrar")
+@app_commands.choices(tipo=[
+    app_commands.Choice(name="Mais tocadas", value="top"),
+    app_commands.Choice(name="Tocadas recentemente", value="recent"),
+])
+async def historico(interaction: discord.Interaction, tipo: str = "top"):
+    """
+    Comando para exibir o histórico persistente de reproduções do servidor.
+
+    Args:
+        interaction (discord.Interaction): A interação do slash command
+        tipo (str): 'top' (mais tocadas) ou 'recent' (tocadas recentemente)
+    """
+    guild = interaction.guild
+    if not guild:
+        await interaction.response.send_message(
+            "Oxente — esse comando só funciona dentro de um servidor, visse?",
+            ephemeral=True
+        )
+        return
+
+    if tipo == "recent":
+        entries = await bot.history.recently_played(guild.id, limit=10)
+        title = "🕘 Tocadas Recentemente"
+        lines = [f"{i}. {e['title']} — <t:{int(e['played_at'])}:R>" for i, e in enumerate(entries, 1)]
+    else:
+        entries = await bot.history.most_played(guild.id, limit=10)
+        title = "🏆 Mais Tocadas"
+        lines = [f"{i}. {e['title']} — **{e['plays']}x**" for i, e in enumerate(entries, 1)]
+
+    if not lines:
+        await interaction.response.send_message("📋 Ainda não toquei nada por aqui, visse?", ephemeral=True)
+        return
+
+    embed = discord.Embed(title=title, description="\n".join(lines), color=discord.Color.blue())
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
 @bot.tree.command(name="comandos", description="Lista os comandos disponíveis do bot")
 async def comandos(interaction: discord.Interaction):
     """
@@ -1414,8 +3055,10 @@ async def comandos(interaction: discord.Interaction):
             "`/retomar` — Retoma a reprodução.\n"
             "`/pular` — Pula para a próxima música.\n"
             "`/limpar_fila` — Limpa a fila.\n"
-            "`/fila` — Mostra a fila atual.\n"
-            "`/agora` — Mostra a música que está tocando now."
+            "`/fila [busca] [pagina]` — Mostra a fila em páginas (ou procura nela).\n"
+            "`/remover <música>` — Tira uma música da fila.\n"
+            "`/agora` — Mostra a música que está tocando now.\n"
+            "`/historico [tipo]` — Mais tocadas ou tocadas recentemente."
         ),
         inline=False,
     )
@@ -1424,7 +3067,10 @@ async def comandos(interaction: discord.Interaction):
         name="⏱️ Timers / Startup",
         value=(
             "`/timer <segundos> <url|nome>` — Define um timer que toca uma música.\n"
-            "`/startup_audio <true|false>` — Ativa/Desativa áudio de boas-vindas."
+            "`/timers` — Lista os timers pendentes.\n"
+            "`/cancelar_timer <id>` — Cancela um timer.\n"
+            "`/startup_audio <true|false>` — Ativa/Desativa áudio de boas-vindas.\n"
+            "`/duplicatas <true|false>` — Aceita/recusa música repetida na fila."
         ),
         inline=False,
     )
@@ -1444,12 +3090,18 @@ async def comandos(interaction: discord.Interaction):
 
 
 @bot.tree.command(name="fila", description="Mostra a fila de músicas")
-async def fila(interaction: discord.Interaction):
+@app_commands.describe(
+    busca="Mostra só as músicas da fila com esse trecho no título",
+    pagina="Página para abrir (10 músicas por página)",
+)
+async def fila(interaction: discord.Interaction, busca: Optional[str] = None, pagina: int = 1):
     """
     Comando para exibir a fila de reprodução.
     
     Args:
         interaction (discord.Interaction): A interação do slash command
+        busca (str | None): Filtra a fila pelo título (ignora maiúsculas e acentos)
+        pagina (int): Página inicial (a navegação segue pelos botões)
     """
     guild = interaction.guild
     if not guild:
@@ -1464,30 +3116,89 @@ async def fila(interaction: discord.Interaction):
     if not queue:
         await interaction.response.send_message("📋 A fila tá vazia, não tem música enfileirada.", ephemeral=True)
         return
+
+    if busca:
+        matches = queue.search(busca, limit=10)
+        if not matches:
+            await interaction.response.send_message(f"🔎 Nada na fila com **{busca}**, visse?", ephemeral=True)
+            return
+        lines = [f"#{pos + 1} — **{track.title}** ({track.requester})" for pos, track in matches]
+        embed = discord.Embed(title=f"🔎 Na fila: {busca}", description="\n".join(lines), color=discord.Color.blue())
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
     
-    # Cria o embed com a fila
-    embed = discord.Embed(
-        title="📋 Fila de Músicas",
-        description=f"Total: **{len(queue)}** música(s) enfileirada(s)",
-        color=discord.Color.blue()
-    )
-    
-    # Mostra até 10 próximas músicas
-    for idx, track in enumerate(queue[:10], 1):
-        embed.add_field(
-            name=f"#{idx}",
-            value=f"**{track.title}**\nRequisitado por: {track.requester}",
-            inline=False
-        )
-    
-    if len(queue) > 10:
-        embed.add_field(
-            name="...",
-            value=f"+ {len(queue) - 10} música(s)",
-            inline=False
+    # Primeira página (as outras são montadas conforme os botões são usados)
+    embed, page, pages = _queue_page(guild.id, pagina - 1)
+    if embed is None:
+        await interaction.response.send_message("📋 A fila tá vazia, não tem música enfileirada.", ephemeral=True)
+        return
+    if pages > 1:
+        await interaction.response.send_message(embed=embed, view=QueueView(guild.id, page, pages), ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@bot.tree.command(name="remover", description="Tira uma música da fila")
+@app_commands.describe(musica="Música da fila (comece a digitar o título)")
+@traced
+async def remover(interaction: discord.Interaction, musica: str):
+    """
+    Comando para remover uma música da fila (todas as cópias dela).
+
+    Args:
+        interaction (discord.Interaction): A interação do slash command
+        musica (str): Chave da música (vinda do autocomplete) ou trecho do título
+    """
+    guild = interaction.guild
+    if not guild:
+        await interaction.response.send_message(
+            "Oxente — esse comando só funciona dentro de um servidor, visse?",
+            ephemeral=True
         )
-    
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    queue = bot.music_queue.get(guild.id)
+    if not queue:
+        await interaction.response.send_message("📋 A fila tá vazia, não tem o que tirar.", ephemeral=True)
+        return
+
+    # O autocomplete manda a chave; texto digitado à mão vira busca pelo título
+    key = musica
+    if not queue.has(key):
+        matches = queue.search(musica, limit=1)
+        key = track_key(matches[0][1]) if matches else None
+    if key is None or not queue.has(key):
+        await interaction.response.send_message(f"🔎 Não achei **{musica}** na fila, visse?", ephemeral=True)
+        return
+
+    title = queue.entries(key)[0].title
+    removed = queue.remove_key(key)
+    _prefetch_next(guild.id)
+    copies = f" ({removed} cópias)" if removed > 1 else ""
+    await interaction.response.send_message(f"🗑️ Tirei **{title}** da fila{copies}.")
+
+
+@remover.autocomplete("musica")
+async def remover_autocomplete(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+    """Sugere músicas da fila pelo título; o valor é a chave da faixa no índice."""
+    if interaction.guild is None:
+        return []
+    queue = bot.music_queue.get(interaction.guild.id)
+    if not queue:
+        return []
+    matches = queue.search(current, limit=50) if current.strip() else list(enumerate(queue[:25]))
+    choices: List[app_commands.Choice[str]] = []
+    seen = set()
+    for pos, track in matches:
+        key = track_key(track)
+        # Chaves longas (URLs diretas) não cabem no valor de uma opção
+        if key is None or key in seen or len(key) > 100:
+            continue
+        seen.add(key)
+        choices.append(app_commands.Choice(name=f"#{pos + 1} — {track.title}"[:100], value=key))
+        if len(choices) >= 25:
+            break
+    return choices
 
 
 @bot.tree.command(name="loop", description="Ativa/desativa loop da música atual")
@@ -1653,5 +3364,6 @@ if __name__ == "__main__":
     
     Inicia a conexão com o Discord usando o token carregado do .env.
     O bot permanecerá rodando indefinidamente até ser interrompido.
+    Os logs do discord.py passam pelo mesmo `LogPipeline` do bot.
     """
-    bot.run(TOKEN)
+    bot.run(TOKEN, log_handler=None)
@@ -0,0 +1,13 @@
+"""
+Micro-benchmarks dos caminhos quentes em Python puro do CabaBot.
+
+Roda offline: as extrações do yt-dlp vêm de dicionários gravados em
+`bench/fixtures/` (veja `python -m bench.record`). Os resultados são
+comparados com `bench/baseline.json`, versionado junto com o código, para que
+regressões de desempenho apareçam na revisão.
+
+Uso:
+    python -m bench                  # roda e compara com o baseline
+    python -m bench --save           # regrava o baseline
+    python -m bench -k stream_url    # só os casos que contêm o texto
+"""
@@ -0,0 +1,71 @@
+"""
+`python -m bench`: roda os micro-benchmarks e compara com o baseline.
+
+Sai com código 1 quando algum caso fica mais lento que o baseline além da
+tolerância, para poder rodar antes de abrir um PR.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from bench.cases import all_cases
+from bench.harness import BenchResult, compare, load_baseline, measure, same_environment, save_baseline
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos caminhos quentes do CabaBot.")
+    parser.add_argument("-k", dest="filter", default="", help="Só os casos cujo nome contém este texto")
+    parser.add_argument("--save", action="store_true", help="Regrava o baseline com os resultados")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Quanto mais lento que o baseline ainda passa (padrão: 0.25 = 25%%)")
+    parser.add_argument("--samples", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Duração mínima (s) de cada amostra")
+    args = parser.parse_args()
+
+    cases = [(name, func) for name, func in all_cases() if args.filter in name]
+    if not cases:
+        print(f"Nenhum caso com '{args.filter}'")
+        return 2
+
+    results = []
+    for name, func in cases:
+        func()  # aquece caches e importações antes de medir
+        results.append(measure(name, func, samples=args.samples, min_time=args.min_time))
+        print(f"  {name}: {results[-1].median_us:.2f}µs", file=sys.stderr)
+
+    baseline = load_baseline(args.baseline)
+    lines, regressions = compare(results, baseline, args.tolerance)
+    print()
+    print("\n".join(lines))
+
+    if args.save:
+        if args.filter and baseline:
+            # Com filtro, preserva os outros casos do baseline
+            kept = {r.name for r in results}
+            results += [
+                BenchResult(name=name, **data) for name, data in baseline['results'].items() if name not in kept
+            ]
+        save_baseline(args.baseline, results)
+        print(f"\n💾 Baseline gravado em {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nSem baseline em {args.baseline}; grave um com --save.")
+        return 0
+    if not same_environment(baseline):
+        env = baseline.get('environment', {})
+        print(f"\n⚠️ Baseline medido em outro ambiente ({env.get('python')} / {env.get('machine')}); "
+              "compare com cautela.")
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} caso(s) mais lento(s) que o baseline além de {args.tolerance:.0%}: "
+              + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Casos de benchmark.
+
+O `CabaBot.py` é importado de verdade (com um TOKEN de mentira e dados num
+diretório temporário), então os casos medem o código de produção. A única
+troca é `search_ytdlp_async`, que devolve as extrações gravadas em
+`fixtures/` em vez de chamar o yt-dlp.
+"""
+
+import importlib
+import json
+import os
+import random
+import tempfile
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from typing import Any, Callable, Dict, List, Tuple
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# Tamanhos "de servidor cheio" para os casos de fila e de status
+QUEUE_SIZE = 500
+STATUS_GUILDS = 100
+STATUS_QUEUE = 200
+
+GUILD_ID = 111111111111111111
+USER_ID = 222222222222222222
+CHANNEL_ID = 333333333333333333
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def load_fixture(name: str) -> Dict[str, Any]:
+    with open(FIXTURES / f"{name}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_bot() -> ModuleType:
+    """Importa o `CabaBot.py` sem tocar nos dados reais nem no Discord."""
+    os.environ.setdefault("TOKEN", "bench")
+    os.environ["CABABOT_DATA_DIR"] = tempfile.mkdtemp(prefix="cababot-bench-")
+    os.environ["DASHBOARD_MODE"] = "off"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    return importlib.import_module("CabaBot")
+
+
+def drive(coro: Any) -> Any:
+    """Roda até o fim uma coroutine que nunca suspende (sem event loop)."""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("coroutine de benchmark suspendeu")
+
+
+def _replay(result: Dict[str, Any]) -> Callable[..., Any]:
+    async def search_ytdlp_async(query: str, ydl_opts: dict, lane: Any = None) -> dict:
+        return result
+    return search_ytdlp_async
+
+
+def _track(cb: ModuleType, entry: Dict[str, Any]) -> Any:
+    """Monta a `MusicTrack` como o `/musica` monta a partir de uma entrada."""
+    return cb.MusicTrack(
+        cb._get_stream_url(entry) or '',
+        entry.get('title', 'Música'),
+        USER_ID,
+        CHANNEL_ID,
+        "bench",
+        video_id=cb._youtube_id(entry),
+        duration=entry.get('duration'),
+    )
+
+
+def stream_url_cases(cb: ModuleType) -> List[Case]:
+    video = load_fixture("video")
+    # Sem a URL escolhida pelo yt-dlp, `_get_stream_url` varre os `formats`
+    scan = {k: v for k, v in video.items() if k != 'url'}
+    playlist = [{k: v for k, v in e.items() if k != 'url'} for e in load_fixture("playlist")['entries']]
+    return [
+        ("stream_url.direct", lambda: cb._get_stream_url(video)),
+        ("stream_url.formats_scan", lambda: cb._get_stream_url(scan)),
+        ("stream_url.formats_scan_x20", lambda: [cb._get_stream_url(e) for e in playlist]),
+    ]
+
+
+def fetch_tracks_cases(cb: ModuleType) -> List[Case]:
+    search = load_fixture("search")
+    playlist = load_fixture("playlist")
+
+    def run(result: Dict[str, Any], query: str, allow_playlist: bool) -> Callable[[], Any]:
+        replay = _replay(result)
+
+        def case() -> Any:
+            cb.search_ytdlp_async = replay
+            return drive(cb.fetch_tracks(query, allow_playlist=allow_playlist))
+        return case
+
+    return [
+        ("fetch_tracks.search", run(search, "ytsearch:forró pé de serra", False)),
+        ("fetch_tracks.playlist_x20", run(playlist, "https://www.youtube.com/playlist?list=PLbench", True)),
+    ]
+
+
+def music_track_cases(cb: ModuleType) -> List[Case]:
+    entries = load_fixture("playlist")['entries']
+    snapshots = [_track(cb, e).to_dict() for e in entries]
+    return [
+        ("music_track.from_entry_x20", lambda: [_track(cb, e) for e in entries]),
+        ("music_track.from_dict_x20", lambda: [cb.MusicTrack.from_dict(d) for d in snapshots]),
+        ("music_track.to_dict_x20", lambda: [t.to_dict() for t in [_track(cb, e) for e in entries]]),
+    ]
+
+
+def queue_cases(cb: ModuleType) -> List[Case]:
+    """Mutações na `bot.music_queue` com as mesmas operações do bot."""
+    entries = load_fixture("playlist")['entries']
+    tracks = [_track(cb, entries[i % len(entries)]) for i in range(QUEUE_SIZE)]
+    queues = cb.bot.music_queue
+
+    def enqueue_drain() -> None:
+        # /musica enfileira; _play_next_track consome do início
+        queues[GUILD_ID] = cb.TrackQueue()
+        for t in tracks:
+            queues[GUILD_ID].append(t)
+        while queues[GUILD_ID]:
+            queues[GUILD_ID].pop(0)
+
+    def loop_queue_cycle() -> None:
+        # Loop de fila: a faixa tocada volta para o fim
+        queues[GUILD_ID] = cb.TrackQueue(tracks)
+        for _ in range(QUEUE_SIZE):
+            queues[GUILD_ID].append(queues[GUILD_ID].pop(0))
+
+    def previous_and_remove() -> None:
+        # /anterior volta a faixa para o início; o dashboard remove por índice
+        queues[GUILD_ID] = cb.TrackQueue(tracks)
+        for t in tracks[:50]:
+            queues[GUILD_ID].insert(0, t)
+        for _ in range(50):
+            queues[GUILD_ID].pop(len(queues[GUILD_ID]) // 2)
+
+    rng = random.Random(39)
+
+    def shuffle() -> None:
+        queues[GUILD_ID] = cb.TrackQueue(tracks)
+        rng.shuffle(queues[GUILD_ID])
+
+    def lookup() -> None:
+        # Recusa de repetidas e /remover: consultas pela chave no índice
+        queue = cb.TrackQueue(tracks)
+        for t in tracks[:100]:
+            queue.has_track(t)
+        queue.remove_key(cb.track_key(tracks[0]))
+
+    def page_flip() -> None:
+        # /fila: páginas novas e já montadas (a fila não muda entre elas)
+        queues[GUILD_ID] = cb.TrackQueue(tracks)
+        for page in (0, 1, 0, 1, 2, QUEUE_SIZE // cb.QUEUE_PAGE_SIZE - 1):
+            cb._queue_page(GUILD_ID, page)
+
+    return [
+        (f"queue.enqueue_drain_{QUEUE_SIZE}", enqueue_drain),
+        (f"queue.loop_cycle_{QUEUE_SIZE}", loop_queue_cycle),
+        (f"queue.previous_remove_{QUEUE_SIZE}", previous_and_remove),
+        (f"queue.shuffle_{QUEUE_SIZE}", shuffle),
+        (f"queue.lookup_{QUEUE_SIZE}", lookup),
+        (f"queue.page_flip_{QUEUE_SIZE}", page_flip),
+    ]
+
+
+class _Voice:
+    def __init__(self, playing: bool):
+        self._playing = playing
+
+    def is_playing(self) -> bool:
+        return self._playing
+
+    def is_paused(self) -> bool:
+        return not self._playing
+
+
+def status_cases(cb: ModuleType) -> List[Case]:
+    """`/api/status` com muitas guilds e filas longas (operação + JSON)."""
+    from dashboard.api import DashboardAPI
+
+    entries = load_fixture("playlist")['entries']
+    tracks = [_track(cb, entries[i % len(entries)]) for i in range(STATUS_QUEUE)]
+    guilds = [
+        SimpleNamespace(id=GUILD_ID + i, name=f"Servidor {i}", voice_client=_Voice(i % 3 != 0))
+        for i in range(STATUS_GUILDS)
+    ]
+    state = SimpleNamespace(
+        guilds=guilds,
+        current_track={g.id: tracks[0] for g in guilds},
+        music_queue={g.id: cb.TrackQueue(tracks) for g in guilds},
+        music_history={g.id: tracks[:20] for g in guilds},
+    )
+    api = DashboardAPI(state)
+
+    return [
+        ("status.build", lambda: drive(api.status())),
+        ("status.handle_json", lambda: json.dumps(drive(api.status()))),
+    ]
+
+
+def all_cases() -> List[Case]:
+    cb = load_bot()
+    cases: List[Case] = []
+    for group in (stream_url_cases, fetch_tracks_cases, music_track_cases, queue_cases, status_cases):
+        cases.extend(group(cb))
+    return cases
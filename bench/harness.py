@@ -0,0 +1,108 @@
+"""
+Medição e comparação com o baseline.
+
+Cada caso é uma função sem argumentos. O número de chamadas por amostra é
+calibrado (`timeit.Timer.autorange`) e a mediana das amostras vira o
+resultado, em microssegundos por chamada.
+"""
+
+import json
+import platform
+import statistics
+import time
+import timeit
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class BenchResult:
+    """Tempo por chamada (µs) de um caso."""
+
+    name: str
+    median_us: float
+    min_us: float
+    stdev_us: float
+    loops: int
+    samples: int
+
+
+def measure(name: str, func: Callable[[], Any], samples: int = 7, min_time: float = 0.2) -> BenchResult:
+    """Mede `func` em `samples` amostras de pelo menos `min_time` segundos cada."""
+    timer = timeit.Timer(func)
+    # autorange para em ~0.2s; amostras mais longas reduzem o ruído
+    loops, elapsed = timer.autorange()
+    if elapsed < min_time:
+        loops = max(1, int(loops * min_time / max(elapsed, 1e-9)))
+    times = [t / loops * 1e6 for t in timer.repeat(repeat=samples, number=loops)]
+    return BenchResult(
+        name=name,
+        median_us=round(statistics.median(times), 3),
+        min_us=round(min(times), 3),
+        stdev_us=round(statistics.stdev(times), 3) if len(times) > 1 else 0.0,
+        loops=loops,
+        samples=samples,
+    )
+
+
+def environment() -> Dict[str, Any]:
+    """Onde o baseline foi medido (números de máquinas diferentes não se comparam)."""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def save_baseline(path: Path, results: List[BenchResult]) -> None:
+    data = {
+        'environment': environment(),
+        'results': {r.name: {k: v for k, v in asdict(r).items() if k != 'name'} for r in results},
+    }
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def compare(results: List[BenchResult], baseline: Optional[Dict[str, Any]],
+            tolerance: float) -> Tuple[List[str], List[str]]:
+    """Formata a tabela de resultados e lista os casos que regrediram.
+
+    Um caso regride quando a mediana passa do baseline em mais de `tolerance`
+    (0.25 = 25% mais lento).
+
+    Returns:
+        Tuple[List[str], List[str]]: Linhas da tabela e nomes que regrediram
+    """
+    base = (baseline or {}).get('results', {})
+    width = max((len(r.name) for r in results), default=10)
+    lines = [f"{'caso':<{width}}  {'mediana':>12}  {'baseline':>12}  {'Δ':>8}"]
+    regressions = []
+    for r in results:
+        ref = base.get(r.name)
+        if ref is None:
+            lines.append(f"{r.name:<{width}}  {r.median_us:>10.2f}µs  {'—':>12}  {'novo':>8}")
+            continue
+        ratio = r.median_us / ref['median_us'] if ref['median_us'] else 1.0
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(r.name)
+            flag = "  ⚠️"
+        lines.append(
+            f"{r.name:<{width}}  {r.median_us:>10.2f}µs  {ref['median_us']:>10.2f}µs  {ratio - 1:>+7.0%}{flag}"
+        )
+    return lines, regressions
+
+
+def same_environment(baseline: Dict[str, Any]) -> bool:
+    env = baseline.get('environment', {})
+    current = environment()
+    return all(env.get(k) == current[k] for k in ('python', 'implementation', 'machine'))
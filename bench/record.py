@@ -0,0 +1,66 @@
+"""
+Grava uma extração do yt-dlp como fixture de benchmark.
+
+    python -m bench.record video "https://www.youtube.com/watch?v=..."
+    python -m bench.record search "ytsearch:forró pé de serra"
+    python -m bench.record playlist "https://www.youtube.com/playlist?list=..." --playlist
+
+Usa as mesmas opções do bot (`YTDLP_OPTIONS` e `fetch_tracks`). Campos que os
+caminhos medidos não leem e que só incham o arquivo (legendas, miniaturas,
+fragmentos, cabeçalhos repetidos em cada formato) são removidos, e o IP
+embutido nas URLs de stream é apagado.
+"""
+
+import argparse
+import json
+import re
+from typing import Any, Dict
+
+from bench.cases import FIXTURES, load_bot
+
+_DROP_KEYS = ('automatic_captions', 'subtitles', 'thumbnails', 'heatmap', 'chapters', 'requested_formats')
+_DROP_FORMAT_KEYS = ('http_headers', 'downloader_options', 'fragments', 'fragment_base_url', 'manifest_url')
+_IP_RE = re.compile(r"([?&/]ip[=/])[^&/]+")
+
+
+def _clean_url(url: Any) -> Any:
+    return _IP_RE.sub(r"\g<1>0.0.0.0", url) if isinstance(url, str) else url
+
+
+def sanitize(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove o que não é usado pelos benchmarks e dados da máquina que gravou."""
+    info = {k: v for k, v in info.items() if k not in _DROP_KEYS}
+    if 'url' in info:
+        info['url'] = _clean_url(info['url'])
+    if isinstance(info.get('formats'), list):
+        info['formats'] = [
+            {**{k: v for k, v in f.items() if k not in _DROP_FORMAT_KEYS}, 'url': _clean_url(f.get('url'))}
+            for f in info['formats']
+        ]
+    if isinstance(info.get('entries'), list):
+        info['entries'] = [sanitize(e) for e in info['entries'] if e]
+    return info
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Grava uma extração do yt-dlp em bench/fixtures/.")
+    parser.add_argument("name", help="Nome da fixture (ex.: video, search, playlist)")
+    parser.add_argument("query", help="URL ou busca (ytsearch:...)")
+    parser.add_argument("--playlist", action="store_true", help="Extrai a playlist como o bot (até 20 faixas)")
+    args = parser.parse_args()
+
+    cb = load_bot()
+    opts = dict(cb.YTDLP_OPTIONS)
+    opts['noplaylist'] = not args.playlist
+    if args.playlist:
+        opts['playlistend'] = 20
+    info = sanitize(cb._extract(args.query, opts))
+
+    path = FIXTURES / f"{args.name}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"💾 {path} ({path.stat().st_size // 1024} KiB)")
+
+
+if __name__ == "__main__":
+    main()
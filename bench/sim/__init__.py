@@ -0,0 +1 @@
+"""Simulador de carga ponta a ponta do CabaBot (veja `__main__.py`)."""
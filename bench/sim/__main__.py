@@ -0,0 +1,453 @@
+"""
+`python -m bench.sim`: simulador de carga ponta a ponta, sem Discord nem YouTube.
+
+Importa o `CabaBot.py` de verdade e troca só as bordas: guilds e membros
+entram pelo gateway de mentira (`fakes.py`), o `_extract` devolve URLs de um
+servidor de mídia local (`media.py`) e as calls consomem o áudio do FFmpeg em
+tempo real com `FakeVoiceClient`. Cada guild segue um roteiro de `/musica`,
+playlists, `/pular` e `/fila`, enquanto clientes do dashboard consultam a API.
+
+Mede tempo até o primeiro áudio, intervalo entre faixas, quadros atrasados
+(underruns), latência de comandos e do dashboard, lag do loop, CPU e RSS.
+Com `--ramp`, adiciona guilds em degraus até o áudio degradar e informa a
+capacidade estimada por núcleo.
+
+Uso:
+    python -m bench.sim --guilds 20 --duration 60
+    python -m bench.sim --guilds 200 --ramp 20 --step-seconds 30 --json sim.json
+
+Precisa do FFmpeg e das dependências do bot; CPU/RSS vêm do `resource` e do
+`/proc` (Linux/macOS).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from bench.cases import load_bot, load_fixture
+from bench.sim.fakes import FakeGuild, FakeInteraction, Recorder, join_gateway
+from bench.sim.media import MediaServer, StubExtractor
+from core.stats import percentile
+from dashboard.api import DashboardAPI
+from dashboard.server import WebServer
+
+FRAME_SECONDS = 0.02
+
+# Ações do roteiro de cada guild e o peso de cada uma
+ACTIONS = {'musica': 50, 'playlist': 8, 'pular': 20, 'fila': 22}
+
+
+def _cpu_seconds(who: int) -> float:
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        # ru_maxrss: KiB no Linux, bytes no macOS (aqui é o pico, não o atual)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _ms(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {'count': 0, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 1),
+        'p95_ms': round(percentile(values, 95) * 1000, 1),
+        'p99_ms': round(percentile(values, 99) * 1000, 1),
+        'max_ms': round(max(values) * 1000, 1),
+    }
+
+
+@dataclass
+class Step:
+    """Um degrau da simulação (ou a simulação inteira, sem `--ramp`)."""
+
+    guilds: int
+    playing: int
+    seconds: float
+    frames: int
+    underruns: int
+    underrun_ratio: float
+    cpu_pct: float
+    rss_mb: float
+    lag_p99_ms: float
+    lag_max_ms: float
+    healthy: bool
+
+
+class Simulation:
+    """Guilds de mentira rodando roteiros contra o bot de verdade."""
+
+    def __init__(self, cb: Any, args: argparse.Namespace, recorder: Recorder):
+        self.cb = cb
+        self.bot = cb.bot
+        self.args = args
+        self.recorder = recorder
+        self.guilds: List[Any] = []
+        self.command_errors = 0
+        self._rng = random.Random(args.seed)
+        self._tasks: List[asyncio.Task] = []
+        self._stop = asyncio.Event()
+        # (instante, valor): lag do loop em s e CPU do processo em %
+        self._lags: List[Tuple[float, float]] = []
+        self._cpu: List[Tuple[float, float]] = []
+
+    # ------------------------------------------------------------------
+    # Bot
+    # ------------------------------------------------------------------
+
+    async def setup(self) -> None:
+        """O pedaço do `setup_hook` que não fala com o Discord."""
+        # O `after` das faixas agenda a próxima no loop do bot
+        self.bot.loop = asyncio.get_running_loop()
+        self.bot.loop_monitor.start()
+        self.bot.ffmpeg.start()
+        self.bot.audio.start()
+        await self.bot.history.open()
+        self._tasks.append(asyncio.create_task(self._sample()))
+
+    async def teardown(self) -> None:
+        self._stop.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for guild in self.guilds:
+            self.bot.music_queue.pop(guild.id, None)
+            if guild.voice_client is not None:
+                await guild.voice_client.disconnect(force=True)
+        for thread in threading.enumerate():
+            if thread.name.startswith("fake-voice-"):
+                thread.join(5)
+        self.bot.loop_monitor.stop()
+        self.bot.ffmpeg.shutdown()
+        self.bot.audio.stop()
+        self.bot.extraction.shutdown()
+        self.bot.history.close()
+
+    # ------------------------------------------------------------------
+    # Roteiros
+    # ------------------------------------------------------------------
+
+    def add_guilds(self, count: int) -> None:
+        for _ in range(count):
+            guild = FakeGuild(self.bot, len(self.guilds), self.recorder, self.args.connect_ms / 1000)
+            join_gateway(self.bot, guild)
+            member = guild.add_member(0)
+            self.guilds.append(guild)
+            self._tasks.append(asyncio.create_task(self._script(guild, member)))
+
+    def _busy(self, guild: Any) -> bool:
+        voice = guild.voice_client
+        return voice is not None and (voice.is_playing() or voice.is_paused())
+
+    async def command(self, name: str, guild: Any, member: Any, **kwargs: Any) -> None:
+        """Executa o callback do slash command com uma interação de mentira."""
+        interaction = FakeInteraction(self.bot, guild, member, self.args.rest_ms / 1000)
+        started = time.perf_counter()
+        if name == 'musica' and not self._busy(guild):
+            self.recorder.request(guild.id, started)
+        try:
+            await getattr(self.cb, name).callback(interaction, **kwargs)
+        except Exception as e:
+            self.command_errors += 1
+            print(f"Erro no /{name} simulado: {e}")
+        self.recorder.command_latency[name].append(time.perf_counter() - started)
+
+    async def _script(self, guild: Any, member: Any) -> None:
+        rng = random.Random(self._rng.random())
+        actions, weights = list(ACTIONS), list(ACTIONS.values())
+        await asyncio.sleep(rng.uniform(0, self.args.stagger))
+        await self.command('musica', guild, member, url=self._song(rng))
+        while not self._stop.is_set():
+            await asyncio.sleep(rng.expovariate(1 / self.args.think))
+            action = rng.choices(actions, weights)[0]
+            if action == 'musica':
+                await self.command('musica', guild, member, url=self._song(rng))
+            elif action == 'playlist':
+                playlist = f"https://www.youtube.com/playlist?list=PLsim{rng.randrange(self.args.catalog // 10 or 1)}"
+                await self.command('musica', guild, member, url=playlist)
+            else:
+                await self.command(action, guild, member)
+
+    def _song(self, rng: random.Random) -> str:
+        # Catálogo finito: buscas repetidas exercitam o cache como no uso real
+        return f"forró simulado {rng.randrange(self.args.catalog)}"
+
+    async def dashboard(self, base_url: str) -> None:
+        """Clientes do dashboard consultando status/métricas e enfileirando."""
+        async def client(index: int) -> None:
+            rng = random.Random(index)
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+                while not self._stop.is_set():
+                    await asyncio.sleep(rng.expovariate(1 / self.args.dashboard_interval))
+                    started = time.perf_counter()
+                    try:
+                        if self.guilds and rng.random() < 0.05:
+                            guild = rng.choice(self.guilds)
+                            request = session.post(base_url + '/api/queue/add', json={
+                                'guild_id': str(guild.id), 'query': self._song(rng),
+                            })
+                        else:
+                            path = '/api/metrics' if rng.random() < 0.2 else '/api/status'
+                            request = session.get(base_url + path)
+                        async with request as response:
+                            await response.read()
+                            if response.status >= 500:
+                                self.recorder.dashboard_errors += 1
+                    except (aiohttp.ClientError, asyncio.TimeoutError):
+                        self.recorder.dashboard_errors += 1
+                    self.recorder.dashboard_latency.append(time.perf_counter() - started)
+
+        for i in range(self.args.dashboard_clients):
+            self._tasks.append(asyncio.create_task(client(i)))
+
+    # ------------------------------------------------------------------
+    # Medição
+    # ------------------------------------------------------------------
+
+    async def _sample(self) -> None:
+        """Lag do loop (10 Hz) e CPU do processo (1 Hz)."""
+        last_cpu, last_wall = _cpu_seconds(resource.RUSAGE_SELF), time.perf_counter()
+        while True:
+            for _ in range(10):
+                start = time.perf_counter()
+                await asyncio.sleep(0.1)
+                self._lags.append((time.perf_counter(), time.perf_counter() - start - 0.1))
+            cpu, wall = _cpu_seconds(resource.RUSAGE_SELF), time.perf_counter()
+            self._cpu.append((wall, (cpu - last_cpu) / (wall - last_wall) * 100))
+            last_cpu, last_wall = cpu, wall
+
+    async def step(self, seconds: float) -> Step:
+        before = self.recorder.counters()
+        started = time.perf_counter()
+        await asyncio.sleep(seconds)
+        after = self.recorder.counters()
+        frames = int(after['frames'] - before['frames'])
+        underruns = int(after['underruns'] - before['underruns'])
+        lags = [lag for at, lag in self._lags if at >= started]
+        cpu = [pct for at, pct in self._cpu if at >= started]
+        ratio = underruns / frames if frames else 0.0
+        lag_p99 = percentile(lags, 99) * 1000
+        return Step(
+            guilds=len(self.guilds),
+            playing=sum(1 for g in self.guilds if self._busy(g)),
+            seconds=round(time.perf_counter() - started, 1),
+            frames=frames,
+            underruns=underruns,
+            underrun_ratio=round(ratio, 5),
+            cpu_pct=round(sum(cpu) / len(cpu), 1) if cpu else 0.0,
+            rss_mb=round(_rss_mb(), 1),
+            lag_p99_ms=round(lag_p99, 1),
+            lag_max_ms=round(max(lags, default=0.0) * 1000, 1),
+            healthy=ratio <= self.args.max_underrun and lag_p99 <= self.args.max_lag_ms,
+        )
+
+
+def _parse_range(text: str) -> Tuple[float, float]:
+    low, _, high = text.partition(",")
+    return float(low) / 1000, float(high or low) / 1000
+
+
+def _arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Simulador de carga do CabaBot (gateway, voz e mídia locais).")
+    parser.add_argument("--guilds", type=int, default=20, help="Guilds simuladas (máximo, com --ramp)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Duração (s) sem --ramp")
+    parser.add_argument("--ramp", type=int, default=0, help="Guilds adicionadas a cada degrau (0 = todas de uma vez)")
+    parser.add_argument("--step-seconds", type=float, default=30.0, help="Duração (s) de cada degrau")
+    parser.add_argument("--stagger", type=float, default=5.0, help="Janela (s) em que as guilds de um degrau começam")
+    parser.add_argument("--track-seconds", type=float, default=30.0, help="Duração das faixas servidas")
+    parser.add_argument("--think", type=float, default=8.0, help="Intervalo médio (s) entre ações de uma guild")
+    parser.add_argument("--catalog", type=int, default=200, help="Músicas distintas nas buscas")
+    parser.add_argument("--extract-ms", default="300,1500", help="Faixa do tempo de extração (ms, min,max)")
+    parser.add_argument("--connect-ms", type=float, default=150.0, help="Handshake de voz simulado (ms)")
+    parser.add_argument("--rest-ms", type=float, default=60.0, help="Round-trip de cada resposta à interação (ms)")
+    parser.add_argument("--media-latency-ms", type=float, default=50.0, help="Espera do servidor de mídia (ms)")
+    parser.add_argument("--dashboard-clients", type=int, default=2)
+    parser.add_argument("--dashboard-interval", type=float, default=2.0, help="Intervalo médio (s) por cliente")
+    parser.add_argument("--max-underrun", type=float, default=0.005, help="Fração de quadros atrasados aceitável")
+    parser.add_argument("--max-lag-ms", type=float, default=100.0, help="p99 de lag do loop aceitável")
+    parser.add_argument("--admission", action="store_true", help="Mantém os limites de admissão reais")
+    parser.add_argument("--seed", type=int, default=40)
+    parser.add_argument("--json", type=Path, help="Grava o relatório em JSON")
+    parser.add_argument("--log", type=Path, help="Arquivo para o log do bot (padrão: cababot-sim.log no diretório temporário)")
+    return parser.parse_args()
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    if not args.admission:
+        # A ideia é medir o bot, não o limitador de pedidos
+        for name in ("ADMISSION_GUILD_RATE", "ADMISSION_USER_RATE", "ADMISSION_GUILD_BURST", "ADMISSION_USER_BURST"):
+            os.environ.setdefault(name, "1000000")
+    os.environ.setdefault("HISTORY_PREWARM_TOP_N", "0")
+    os.environ.setdefault("SESSION_RESTORE_ENABLED", "false")
+    # O log do bot vai para o arquivo (--log), não para o terminal
+    os.environ.setdefault("LOG_LEVEL", "INFO")
+    os.environ["DASHBOARD_HOST"] = "127.0.0.1"
+    os.environ["DASHBOARD_PORT"] = str(_free_port())
+
+    media = MediaServer(args.track_seconds, args.media_latency_ms / 1000)
+    base_url = media.start()
+    children_before = _cpu_seconds(resource.RUSAGE_CHILDREN)
+
+    cb = load_bot()
+    template = {k: v for k, v in load_fixture("video").items() if k != 'url'}
+    extractor = StubExtractor(base_url, template, _parse_range(args.extract_ms), args.track_seconds, args.seed)
+    cb._extract = extractor
+
+    recorder = Recorder()
+    sim = Simulation(cb, args, recorder)
+    await sim.setup()
+    runner = await WebServer(DashboardAPI(cb.bot)).start()
+    await sim.dashboard(f"http://127.0.0.1:{os.environ['DASHBOARD_PORT']}")
+
+    cpu_start, wall_start = _cpu_seconds(resource.RUSAGE_SELF), time.perf_counter()
+    steps: List[Step] = []
+    targets = list(range(args.ramp, args.guilds + 1, args.ramp)) if args.ramp > 0 else [args.guilds]
+    for target in targets:
+        sim.add_guilds(target - len(sim.guilds))
+        step = await sim.step(args.step_seconds if args.ramp > 0 else args.duration)
+        steps.append(step)
+        print(f"{'✅' if step.healthy else '⚠️'} {step.guilds} guilds ({step.playing} tocando): "
+              f"CPU {step.cpu_pct}% · underruns {step.underrun_ratio:.2%} · lag p99 {step.lag_p99_ms}ms",
+              file=sys.__stdout__, flush=True)
+        if args.ramp > 0 and not step.healthy:
+            break
+
+    cpu_used, wall = _cpu_seconds(resource.RUSAGE_SELF) - cpu_start, time.perf_counter() - wall_start
+    await sim.teardown()
+    await runner.cleanup()
+    # Escreve o que falta antes de o arquivo do log ser fechado
+    cb.LOGS.stop()
+    media_stats = media.stop()
+    ffmpeg_cpu = _cpu_seconds(resource.RUSAGE_CHILDREN) - children_before - media_stats.get('cpu_s', 0.0)
+
+    audio_seconds = recorder.frames * FRAME_SECONDS
+    bot_per_stream = cpu_used / audio_seconds if audio_seconds else None
+    ffmpeg_per_stream = ffmpeg_cpu / audio_seconds if audio_seconds else None
+    healthy = [s for s in steps if s.healthy]
+    return {
+        'config': {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        'steps': [asdict(s) for s in steps],
+        'capacity': {
+            'healthy_guilds': healthy[-1].guilds if healthy else 0,
+            # CPU (em núcleos) que cada stream tocando consome: bot e FFmpeg
+            'bot_cpu_per_stream': round(bot_per_stream, 4) if bot_per_stream else None,
+            'ffmpeg_cpu_per_stream': round(ffmpeg_per_stream, 4) if ffmpeg_per_stream else None,
+            'streams_per_core_bot': round(1 / bot_per_stream, 1) if bot_per_stream else None,
+            'streams_per_core_total': (
+                round(1 / (bot_per_stream + ffmpeg_per_stream), 1) if bot_per_stream and ffmpeg_per_stream else None
+            ),
+        },
+        'time_to_first_audio': _ms(recorder.ttfa),
+        'inter_track_gap': _ms(recorder.gaps),
+        'skip_latency': _ms(recorder.skip_latency),
+        'commands': {name: _ms(values) for name, values in sorted(recorder.command_latency.items())},
+        'command_errors': sim.command_errors,
+        'dashboard': {**_ms(recorder.dashboard_latency), 'errors': recorder.dashboard_errors},
+        'audio': {
+            'frames': recorder.frames,
+            'underruns': recorder.underruns,
+            'max_late_ms': round(recorder.max_late * 1000, 1),
+            'tracks_started': recorder.tracks_started,
+            'tracks_finished': recorder.tracks_finished,
+            'playback_errors': recorder.playback_errors,
+            'opus_encoding': all(g.voice_client is None or g.voice_client.encoder is not None for g in sim.guilds),
+        },
+        'process': {
+            'cpu_s': round(cpu_used, 2),
+            'wall_s': round(wall, 2),
+            'ffmpeg_cpu_s': round(ffmpeg_cpu, 2),
+            'rss_mb': round(_rss_mb(), 1),
+        },
+        'media_server': media_stats,
+        'extractions': extractor.calls,
+        'bot': {
+            'loop': cb.bot.loop_monitor.snapshot(),
+            'extraction': cb.bot.extraction.snapshot(),
+            'extraction_chain': cb.bot.extraction_chain.snapshot(),
+            'voice': cb.bot.voice.snapshot(),
+            'stream_cache': cb.bot.stream_cache.snapshot(),
+            'tracer': cb.bot.tracer.snapshot(),
+            'ffmpeg': {k: v for k, v in cb.bot.ffmpeg.snapshot().items() if k != 'streams'},
+            'audio': cb.bot.audio.snapshot(),
+        },
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    def line(label: str, stats: Dict[str, Any]) -> str:
+        if not stats.get('count'):
+            return f"  {label}: —"
+        return (f"  {label}: p50 {stats['p50_ms']}ms · p95 {stats['p95_ms']}ms · "
+                f"p99 {stats['p99_ms']}ms · máx {stats['max_ms']}ms (n={stats['count']})")
+
+    capacity = report['capacity']
+    audio = report['audio']
+    print("\n📊 Resultado da simulação")
+    print(line("Tempo até o primeiro áudio", report['time_to_first_audio']))
+    print(line("Intervalo entre faixas", report['inter_track_gap']))
+    print(line("Latência do /pular", report['skip_latency']))
+    for name, stats in report['commands'].items():
+        print(line(f"/{name}", stats))
+    print(line("Dashboard", report['dashboard']))
+    print(f"  Quadros: {audio['frames']} · atrasados: {audio['underruns']} (pior {audio['max_late_ms']}ms)"
+          f" · faixas: {audio['tracks_started']} · erros: {audio['playback_errors']} + {report['command_errors']} comandos")
+    if not audio['opus_encoding']:
+        print("  ⚠️ libopus não carregou: o custo de codificação não entrou na conta")
+    process = report['process']
+    print(f"  CPU do bot: {process['cpu_s']}s em {process['wall_s']}s · FFmpeg: {process['ffmpeg_cpu_s']}s"
+          f" · RSS: {process['rss_mb']} MiB")
+    if capacity['streams_per_core_bot']:
+        print(f"  Capacidade estimada: {capacity['streams_per_core_bot']} streams por núcleo no processo do bot, "
+              f"{capacity['streams_per_core_total']} contando o FFmpeg")
+    if len(report['steps']) > 1:
+        print(f"  Maior degrau saudável: {capacity['healthy_guilds']} guilds")
+
+
+def main() -> int:
+    args = _arguments()
+    if args.ramp > 0 and args.ramp > args.guilds:
+        print("--ramp precisa ser menor ou igual a --guilds")
+        return 2
+
+    log_path = args.log or Path(tempfile.gettempdir()) / "cababot-sim.log"
+    print(f"🧪 Simulando até {args.guilds} guild(s); log do bot em {log_path}")
+    with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        report = asyncio.run(_run(args))
+
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\n💾 Relatório em {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
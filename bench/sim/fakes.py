@@ -0,0 +1,375 @@
+"""
+Gateway e voz de mentira para o simulador de carga.
+
+As guilds entram no cache do `ConnectionState` do cliente como se tivessem
+chegado pelo GUILD_CREATE, então `bot.guilds`, `bot.get_guild` e o dashboard
+as enxergam. `FakeVoiceClient` passa nos `isinstance(..., discord.VoiceClient)`
+do bot e consome a fonte de áudio no mesmo ritmo do `AudioPlayer` do
+discord.py (um quadro de 20 ms por vez, codificado em Opus), sem UDP.
+"""
+
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import discord
+
+FRAME_SECONDS = 0.02
+
+
+class Recorder:
+    """Coleta as métricas da simulação (escrita pelas threads de áudio e pelo loop)."""
+
+    def __init__(self) -> None:
+        self.ttfa: List[float] = []
+        self.gaps: List[float] = []
+        self.skip_latency: List[float] = []
+        self.command_latency: Dict[str, List[float]] = defaultdict(list)
+        self.dashboard_latency: List[float] = []
+        self.dashboard_errors = 0
+        self.frames = 0
+        self.underruns = 0
+        self.max_late = 0.0
+        self.tracks_started = 0
+        self.tracks_finished = 0
+        self.playback_errors = 0
+        self._pending: Dict[int, float] = {}
+        self._last_end: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def request(self, guild_id: int, started: float) -> None:
+        """Pedido numa guild parada: o próximo primeiro quadro conta como TTFA."""
+        with self._lock:
+            self._pending[guild_id] = started
+            self._last_end.pop(guild_id, None)
+
+    def first_frame(self, guild_id: int, now: float) -> None:
+        with self._lock:
+            self.tracks_started += 1
+            started = self._pending.pop(guild_id, None)
+            if started is not None:
+                self.ttfa.append(now - started)
+                return
+            ended = self._last_end.pop(guild_id, None)
+        if ended is not None:
+            at, reason = ended
+            (self.gaps if reason == "natural" else self.skip_latency).append(now - at)
+
+    def track_end(self, guild_id: int, now: float, reason: str) -> None:
+        with self._lock:
+            if reason == "natural":
+                self.tracks_finished += 1
+            self._last_end[guild_id] = (now, reason)
+
+    def frame(self, late: float) -> None:
+        # Atraso maior que um quadro esvazia o buffer de quem está ouvindo
+        with self._lock:
+            self.frames += 1
+            if late > FRAME_SECONDS:
+                self.underruns += 1
+                self.max_late = max(self.max_late, late)
+
+    def counters(self) -> Dict[str, float]:
+        return {'frames': self.frames, 'underruns': self.underruns, 'tracks_started': self.tracks_started}
+
+
+def _opus_encoder() -> Optional[Any]:
+    """Encoder Opus do discord.py (o mesmo custo de CPU da reprodução real)."""
+    try:
+        return discord.opus.Encoder()
+    except Exception:
+        return None
+
+
+class FramePlayer(threading.Thread):
+    """Lê um quadro a cada 20 ms, como o `discord.player.AudioPlayer`."""
+
+    def __init__(self, source: discord.AudioSource, voice: "FakeVoiceClient",
+                 after: Optional[Callable[[Optional[Exception]], Any]]):
+        super().__init__(daemon=True, name=f"fake-voice-{voice.guild.id}")
+        self.source = source
+        self.voice = voice
+        self.after = after
+        self._end = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    def run(self) -> None:
+        error: Optional[Exception] = None
+        try:
+            self._do_run()
+        except Exception as e:
+            error = e
+            self.voice.recorder.playback_errors += 1
+        finally:
+            self._end.set()
+            self.source.cleanup()
+        if self.after is not None:
+            try:
+                self.after(error)
+            except Exception as e:
+                print(f"Erro no callback de fim de faixa: {e}")
+
+    def _do_run(self) -> None:
+        recorder = self.voice.recorder
+        guild_id = self.voice.guild.id
+        encoder = self.voice.encoder
+        loops = 0
+        start = time.perf_counter()
+        first = True
+        while not self._end.is_set():
+            if not self._resumed.is_set():
+                self._resumed.wait()
+                loops = 0
+                start = time.perf_counter()
+                continue
+
+            data = self.source.read()
+            if not data:
+                recorder.track_end(guild_id, time.perf_counter(), "natural")
+                return
+            if first:
+                recorder.first_frame(guild_id, time.perf_counter())
+                first = False
+            if encoder is not None and not self.source.is_opus():
+                encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+
+            loops += 1
+            delay = start + FRAME_SECONDS * loops - time.perf_counter()
+            recorder.frame(-delay)
+            time.sleep(max(0.0, delay))
+
+    def stop(self) -> None:
+        self._end.set()
+        self._resumed.set()
+
+    def pause(self) -> None:
+        self._resumed.clear()
+
+    def resume(self) -> None:
+        self._resumed.set()
+
+    def is_playing(self) -> bool:
+        return self._resumed.is_set() and not self._end.is_set()
+
+    def is_paused(self) -> bool:
+        return not self._end.is_set() and not self._resumed.is_set()
+
+
+class FakeVoiceClient(discord.VoiceClient):
+    """Cliente de voz sem gateway de voz nem UDP (só o consumo do áudio)."""
+
+    def __init__(self, client: discord.Client, channel: "FakeVoiceChannel", recorder: Recorder):
+        # O __init__ do VoiceClient abriria a conexão de voz: não chama
+        self.client = client
+        self.channel = channel  # type: ignore[assignment]
+        self.recorder = recorder
+        self.encoder = _opus_encoder()
+        self._player: Optional[FramePlayer] = None
+        self._connected = True
+
+    @property
+    def guild(self) -> Any:  # type: ignore[override]
+        return self.channel.guild
+
+    @property
+    def source(self) -> Optional[discord.AudioSource]:  # type: ignore[override]
+        return self._player.source if self._player else None
+
+    @property
+    def latency(self) -> float:  # type: ignore[override]
+        return 0.0
+
+    @property
+    def average_latency(self) -> float:  # type: ignore[override]
+        return 0.0
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def is_playing(self) -> bool:
+        return self._player is not None and self._player.is_playing()
+
+    def is_paused(self) -> bool:
+        return self._player is not None and self._player.is_paused()
+
+    def play(self, source: discord.AudioSource, *, after: Any = None, **kwargs: Any) -> None:
+        if not self._connected:
+            raise discord.ClientException("Not connected to voice.")
+        if self.is_playing() or self.is_paused():
+            raise discord.ClientException("Already playing audio.")
+        self._player = FramePlayer(source, self, after)
+        self._player.start()
+
+    def stop(self) -> None:
+        player, self._player = self._player, None
+        if player is not None and player.is_alive():
+            self.recorder.track_end(self.guild.id, time.perf_counter(), "skip")
+            player.stop()
+
+    def pause(self) -> None:
+        if self._player is not None:
+            self._player.pause()
+
+    def resume(self) -> None:
+        if self._player is not None:
+            self._player.resume()
+
+    async def disconnect(self, *, force: bool = False) -> None:
+        self.stop()
+        self._connected = False
+        self.channel.guild.voice_client = None
+        self.client._connection._remove_voice_client(self.guild.id)
+
+    async def move_to(self, channel: Any, **kwargs: Any) -> None:
+        self.channel = channel
+
+
+class FakeVoiceChannel:
+    """Canal de voz: `connect()` devolve um `FakeVoiceClient` após o handshake simulado."""
+
+    def __init__(self, guild: "FakeGuild", channel_id: int, connect_delay: float):
+        self.guild = guild
+        self.id = channel_id
+        self.name = f"voz-{guild.index}"
+        self.connect_delay = connect_delay
+
+    async def connect(self, **kwargs: Any) -> FakeVoiceClient:
+        await asyncio.sleep(self.connect_delay)
+        voice = FakeVoiceClient(self.guild.client, self, self.guild.recorder)
+        self.guild.voice_client = voice
+        self.guild.client._connection._add_voice_client(self.guild.id, voice)
+        return voice
+
+
+class FakeGuild:
+    """O que o bot lê de uma `discord.Guild` (id, nome, voz, membros)."""
+
+    def __init__(self, client: discord.Client, index: int, recorder: Recorder, connect_delay: float):
+        self.client = client
+        self.index = index
+        self.recorder = recorder
+        self.id = 900_000_000_000_000_000 + index
+        self.name = f"Simulação {index}"
+        self.voice_client: Optional[FakeVoiceClient] = None
+        self.voice_channel = FakeVoiceChannel(self, self.id + 1, connect_delay)
+        self.text_channel_id = self.id + 2
+        self.members: Dict[int, "FakeMember"] = {}
+
+    def _resolve_channel(self, channel_id: int) -> None:
+        # Sem canais de texto: o player (embed + botões) não é enviado
+        return None
+
+    def get_member(self, user_id: int) -> Optional["FakeMember"]:
+        return self.members.get(user_id)
+
+    def add_member(self, index: int) -> "FakeMember":
+        member = FakeMember(self.id + 100 + index, f"ouvinte{index}", self)
+        self.members[member.id] = member
+        return member
+
+
+def join_gateway(client: discord.Client, guild: FakeGuild) -> None:
+    """Coloca a guild no cache do cliente (o que o GUILD_CREATE faria)."""
+    client._connection._guilds[guild.id] = guild  # type: ignore[assignment]
+
+
+class FakeMember(discord.Member):
+    """Membro numa call; passa nos `isinstance(..., discord.Member)` do bot."""
+
+    def __init__(self, user_id: int, name: str, guild: FakeGuild):
+        # O __init__ do Member espera o payload do gateway: não chama
+        self._sim_id = user_id
+        self._sim_name = name
+        self._sim_guild = guild
+
+    @property
+    def id(self) -> int:  # type: ignore[override]
+        return self._sim_id
+
+    @property
+    def name(self) -> str:  # type: ignore[override]
+        return self._sim_name
+
+    @property
+    def display_name(self) -> str:  # type: ignore[override]
+        return self._sim_name
+
+    @property
+    def mention(self) -> str:  # type: ignore[override]
+        return f"<@{self._sim_id}>"
+
+    @property
+    def guild(self) -> Any:  # type: ignore[override]
+        return self._sim_guild
+
+    @property
+    def voice(self) -> Any:  # type: ignore[override]
+        return SimpleNamespace(channel=self._sim_guild.voice_channel)
+
+    @property
+    def guild_permissions(self) -> discord.Permissions:  # type: ignore[override]
+        return discord.Permissions.none()
+
+
+class _FakeMessage:
+    def __init__(self, channel_id: int):
+        self.channel = SimpleNamespace(id=channel_id)
+
+    async def delete(self) -> None:
+        pass
+
+    async def edit(self, **kwargs: Any) -> "_FakeMessage":
+        return self
+
+
+class _FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **kwargs: Any) -> None:
+        await self._interaction.rest()
+        self._done = True
+
+    async def send_message(self, content: Any = None, **kwargs: Any) -> None:
+        await self._interaction.rest()
+        self._done = True
+        self._interaction.replies.append(content)
+
+
+class _FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+
+    async def send(self, content: Any = None, **kwargs: Any) -> _FakeMessage:
+        await self._interaction.rest()
+        self._interaction.replies.append(content)
+        return _FakeMessage(self._interaction.channel_id)
+
+
+class FakeInteraction:
+    """Interação de slash command; cada resposta custa um round-trip de REST."""
+
+    def __init__(self, client: discord.Client, guild: FakeGuild, member: FakeMember, rest_delay: float):
+        self.client = client
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = member
+        self.channel_id = guild.text_channel_id
+        self.rest_delay = rest_delay
+        self.command = None
+        self.extras: Dict[str, Any] = {}
+        self.replies: List[Any] = []
+        self.response = _FakeResponse(self)
+        self.followup = _FakeFollowup(self)
+
+    async def rest(self) -> None:
+        if self.rest_delay > 0:
+            await asyncio.sleep(self.rest_delay)
@@ -0,0 +1,169 @@
+"""
+Servidor de mídia local e extrator de mentira para o simulador de carga.
+
+O servidor roda em outro processo (para não disputar o loop nem a CPU medida
+do bot) e serve um WAV gerado na hora para qualquer `/media/<id>.wav`. O
+extrator substitui o `_extract` do bot: dorme o tempo de uma extração do
+yt-dlp e devolve um info dict no formato gravado em `bench/fixtures/`, com a
+URL de stream apontando para o servidor local.
+"""
+
+import asyncio
+import base64
+import hashlib
+import math
+import multiprocessing
+import random
+import resource
+import socket
+import struct
+import tempfile
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from core.stream_cache import video_id_from_url
+
+SAMPLE_RATE = 48000
+
+
+def write_wav(path: Path, seconds: float, freq: float = 480.0) -> None:
+    """Grava um tom estéreo 16-bit (um período repetido, rápido de gerar)."""
+    period = int(SAMPLE_RATE / freq)
+    cycle = array('h')
+    for i in range(period):
+        sample = int(8000 * math.sin(2 * math.pi * i / period))
+        cycle.extend((sample, sample))
+    frames = int(seconds * SAMPLE_RATE)
+    data = (cycle * (frames // period + 1))[: frames * 2].tobytes()
+    header = b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 2, SAMPLE_RATE, SAMPLE_RATE * 4, 4, 16)
+    header += b"data" + struct.pack("<I", len(data))
+    path.write_bytes(header + data)
+
+
+def _serve(conn: Any, seconds: float, latency: float) -> None:
+    """Processo do servidor: avisa a porta pelo pipe e serve até receber 'stop'."""
+    from aiohttp import web
+
+    async def main() -> None:
+        media = Path(tempfile.mkdtemp(prefix="cababot-sim-media-")) / "track.wav"
+        write_wav(media, seconds)
+        served = 0
+
+        async def handle_media(request: web.Request) -> web.StreamResponse:
+            nonlocal served
+            if latency > 0:
+                await asyncio.sleep(latency)
+            served += 1
+            return web.FileResponse(media, headers={'Content-Type': 'audio/wav'})
+
+        app = web.Application()
+        app.router.add_get('/media/{name}', handle_media)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        await web.SockSite(runner, sock).start()
+        conn.send(sock.getsockname()[1])
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, conn.recv)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        conn.send({'served': served, 'cpu_s': usage.ru_utime + usage.ru_stime})
+        await runner.cleanup()
+
+    asyncio.run(main())
+
+
+class MediaServer:
+    """Sobe e derruba o processo do servidor de mídia.
+
+    Args:
+        seconds (float): Duração de cada faixa servida
+        latency (float): Espera (s) antes de responder, como o primeiro byte de uma CDN
+    """
+
+    def __init__(self, seconds: float, latency: float = 0.0):
+        self.seconds = seconds
+        self.latency = latency
+        self.base_url = ""
+        self._conn: Optional[Any] = None
+        self._process: Optional[multiprocessing.Process] = None
+
+    def start(self) -> str:
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(child, self.seconds, self.latency), daemon=True
+        )
+        self._process.start()
+        self._conn = parent
+        port = parent.recv()
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    def stop(self) -> Dict[str, Any]:
+        """Encerra o servidor e devolve quantos pedidos serviu e a CPU que gastou."""
+        if self._conn is None or self._process is None:
+            return {}
+        self._conn.send("stop")
+        stats = self._conn.recv()
+        self._process.join(5)
+        self._conn = None
+        return stats
+
+
+def _video_id(text: str) -> str:
+    """ID de 11 caracteres estável para uma busca (como os do YouTube)."""
+    digest = hashlib.sha1(text.encode()).digest()
+    return base64.urlsafe_b64encode(digest).decode()[:11]
+
+
+class StubExtractor:
+    """Substituto do `_extract` do bot (roda nas threads do pool de extração).
+
+    Args:
+        base_url (str): Servidor de mídia local
+        template (dict): Info dict gravado (formats, metadados) usado como molde
+        latency (Tuple[float, float]): Faixa (s) do tempo de cada extração
+        seconds (float): Duração das faixas
+        seed (int): Semente das latências sorteadas
+    """
+
+    def __init__(self, base_url: str, template: Dict[str, Any], latency: Tuple[float, float],
+                 seconds: float, seed: int = 40):
+        self.base_url = base_url
+        self.template = template
+        self.latency = latency
+        self.seconds = seconds
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def info(self, video_id: str, title: str) -> Dict[str, Any]:
+        return {
+            **self.template,
+            'id': video_id,
+            'display_id': video_id,
+            'title': title,
+            'fulltitle': title,
+            'duration': self.seconds,
+            'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+            'original_url': f"https://www.youtube.com/watch?v={video_id}",
+            'url': f"{self.base_url}/media/{video_id}.wav",
+        }
+
+    def __call__(self, query: str, ydl_opts: dict, process: bool = True) -> Dict[str, Any]:
+        self.calls += 1
+        time.sleep(self._rng.uniform(*self.latency))
+        if query.startswith("ytsearch:"):
+            term = query[len("ytsearch:"):]
+            return {'_type': 'playlist', 'id': term, 'entries': [self.info(_video_id(term), term.title())]}
+        if "list=" in query:
+            count = int(ydl_opts.get('playlistend') or 20)
+            base = _video_id(query)
+            entries = (self.info(_video_id(f"{base}{i}"), f"Playlist {base} #{i + 1}") for i in range(count))
+            # Sem processar, o yt-dlp entrega as entradas sob demanda (uma página por vez)
+            return {'_type': 'playlist', 'id': base, 'entries': entries if not process else list(entries)}
+        video_id = video_id_from_url(query) or _video_id(query)
+        return self.info(video_id, f"Vídeo {video_id}")
@@ -0,0 +1,145 @@
+"""
+Log JSON Lines só de append, gravado em lote numa thread.
+
+Base dos caches persistentes pequenos (casamentos do Spotify, índice de
+títulos): cada alteração vira uma linha nova, então nunca é preciso reescrever
+o arquivo inteiro no caminho quente. Uma linha cortada por crash é ignorada na
+leitura, e o arquivo é compactado na carga quando acumula muitas linhas velhas.
+Várias alterações da mesma chave dentro da janela de gravação viram uma linha só.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+log = logging.getLogger("cababot.storage")
+
+# Marca de remoção: a carga descarta a chave (e a compactação some com ela)
+_DELETED = "_deleted"
+
+
+class AppendLog:
+    """Arquivo .jsonl com gravações agrupadas e compactação na carga.
+
+    Args:
+        path (Path): Arquivo onde as linhas são gravadas
+        key (str): Campo que identifica o registro (a última linha vence)
+        flush_delay (float): Janela (s) para agrupar gravações
+        durable (bool): Faz fsync a cada gravação (para dados que não podem se perder)
+    """
+
+    # Desligado quando vários processos (grupos de shards) gravam nos mesmos
+    # arquivos: reescrever o arquivo perderia linhas acrescentadas pelos outros.
+    # Nesse caso quem compacta é o coordenador, antes de subir os processos.
+    compact_on_load = True
+
+    def __init__(self, path: Path, key: str, flush_delay: float = 2.0, durable: bool = False):
+        self.path = path
+        self.key = key
+        self.flush_delay = flush_delay
+        self.durable = durable
+        # Uma linha pendente por chave: alterações repetidas se fundem
+        self._buffer: Dict[str, str] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Uma thread só por arquivo: os lotes são gravados na ordem em que
+        # foram agendados (no executor padrão um lote novo podia passar na
+        # frente de um anterior e a "última linha vence" ficava errada)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="appendlog-io")
+        # load() síncrono pode rodar fora dessa thread
+        self._io_lock = threading.Lock()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Lê o arquivo e retorna {chave: último registro} (síncrono; use via executor).
+
+        Se houver mais que o dobro de linhas em relação a registros vivos, o
+        arquivo é reescrito (temp + rename) só com o estado atual.
+        """
+        records: Dict[str, Dict[str, Any]] = {}
+        if not self.path.exists():
+            return records
+        lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                    key = record.pop(self.key)
+                    if record.get(_DELETED):
+                        records.pop(key, None)
+                    else:
+                        records[key] = record
+                except (ValueError, KeyError, AttributeError, TypeError):
+                    continue
+        if self.compact_on_load and lines > 2 * len(records) + 100:
+            self._rewrite(records)
+        return records
+
+    async def load_async(self) -> Dict[str, Dict[str, Any]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.load)
+
+    def _rewrite(self, records: Dict[str, Dict[str, Any]]) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            with self._io_lock:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for key, record in records.items():
+                        f.write(self._dump(key, record) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+        except OSError as e:
+            log.error("Erro ao compactar %s: %s", self.path.name, e)
+
+    def _dump(self, key: str, record: Dict[str, Any]) -> str:
+        return json.dumps({self.key: key, **record}, ensure_ascii=False, separators=(",", ":"))
+
+    def append(self, key: str, record: Dict[str, Any]) -> None:
+        """Agenda a gravação de um registro.
+
+        Sem loop rodando (ex.: durante a inicialização), grava na hora.
+        """
+        self._buffer[key] = self._dump(key, record)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.flush_delay, self._flush_async)
+
+    def remove(self, key: str) -> None:
+        """Agenda a remoção de um registro (uma linha marcando a chave como apagada)."""
+        self.append(key, {_DELETED: True})
+
+    def _flush_async(self) -> None:
+        self._flush_handle = None
+        lines, self._buffer = list(self._buffer.values()), {}
+        if lines:
+            asyncio.get_running_loop().run_in_executor(self._executor, self._write, lines)
+
+    def _write(self, lines: Iterable[str]) -> None:
+        try:
+            with self._io_lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                    if self.durable:
+                        f.flush()
+                        os.fsync(f.fileno())
+        except OSError as e:
+            log.error("Erro ao salvar %s: %s", self.path.name, e)
+
+    def flush(self) -> None:
+        """Grava o que estiver pendente de forma síncrona (usado no desligamento)."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        lines, self._buffer = list(self._buffer.values()), {}
+        if lines:
+            # Passa pela mesma thread para ficar depois de gravações já agendadas
+            self._executor.submit(self._write, lines).result()
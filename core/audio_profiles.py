@@ -0,0 +1,220 @@
+"""
+Perfis de áudio que ficam mais baratos quando a máquina aperta.
+
+Toda faixa abre um FFmpeg, e o perfil completo (loudnorm + PCM que o
+discord.py ainda codifica em Opus) é o mais caro. Com a CPU saturada todas as
+guilds engasgam juntas, então o `AudioGovernor` acompanha a CPU da máquina e
+os underruns (quadros entregues atrasados ao player) e, sob pressão, faz as
+streams *novas* abrirem com um perfil mais leve. As que já tocam não mudam.
+Quando a carga cai e fica baixa por `cooldown` segundos, volta um nível.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+log = logging.getLogger("cababot.player")
+
+_PROC_STAT = "/proc/stat"
+
+
+@dataclass(frozen=True)
+class AudioProfile:
+    """Um jeito de abrir o FFmpeg de uma faixa.
+
+    Attributes:
+        name (str): Nome mostrado no dashboard
+        filters (str): Cadeia de `-af` (vazia = nenhum filtro)
+        opus (bool): O FFmpeg já entrega Opus (o discord.py não codifica nada)
+    """
+
+    name: str
+    filters: str = ""
+    opus: bool = False
+
+
+class AudioGovernor:
+    """Escolhe o perfil das novas streams conforme a CPU e os underruns.
+
+    Args:
+        profiles (Sequence[AudioProfile]): Perfis do mais caro ao mais barato
+        streams (Callable[[], int]): Quantas streams estão abertas (normaliza os underruns)
+        interval (float): Intervalo (s) entre as avaliações
+        cpu_high (float): CPU (%) a partir da qual desce um nível
+        cpu_low (float): CPU (%) abaixo da qual a carga conta como baixa
+        underrun_high (float): Underruns por segundo por stream que contam como pressão
+        underrun_low (float): Underruns por segundo por stream que contam como calma
+        cooldown (float): Tempo (s) de calma antes de subir um nível
+        forced (str | None): Nome de um perfil fixo (desliga a adaptação)
+    """
+
+    def __init__(
+        self,
+        profiles: Sequence[AudioProfile],
+        streams: Optional[Callable[[], int]] = None,
+        interval: float = 5.0,
+        cpu_high: float = 85.0,
+        cpu_low: float = 60.0,
+        underrun_high: float = 0.5,
+        underrun_low: float = 0.05,
+        cooldown: float = 30.0,
+        forced: Optional[str] = None,
+    ):
+        self.profiles = tuple(profiles)
+        self.streams = streams
+        self.interval = interval
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.underrun_high = underrun_high
+        self.underrun_low = underrun_low
+        self.cooldown = cooldown
+        self.level = 0
+        self.forced: Optional[int] = None
+        if forced:
+            names = [profile.name for profile in self.profiles]
+            if forced in names:
+                self.forced = self.level = names.index(forced)
+            else:
+                log.warning("Perfil de áudio desconhecido: %s (usando adaptação automática)", forced)
+
+        self.cpu_pct: Optional[float] = None
+        self.underrun_rate = 0.0
+        self.downgrades = 0
+        self.upgrades = 0
+        self._underruns = 0
+        self._total_underruns = 0
+        self._window_start = time.monotonic()
+        self._calm_since: Optional[float] = None
+        self._cpu_prev: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Inicia as avaliações periódicas (precisa de um loop rodando)."""
+        if self._task is None and self.forced is None:
+            self._cpu_prev = self._read_cpu()
+            self._window_start = time.monotonic()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # ------------------------------------------------------------------
+    # Uso pelo player
+    # ------------------------------------------------------------------
+
+    @property
+    def profile(self) -> AudioProfile:
+        """Perfil que as streams abertas agora devem usar."""
+        return self.profiles[self.level]
+
+    def underrun(self) -> None:
+        """Um quadro saiu atrasado para o player. Chamado das threads de áudio."""
+        with self._lock:
+            self._underruns += 1
+
+    # ------------------------------------------------------------------
+    # Avaliação
+    # ------------------------------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.evaluate()
+            except Exception as e:
+                log.error("Erro ao avaliar a carga do áudio: %s", e)
+
+    def evaluate(self, now: Optional[float] = None) -> None:
+        """Fecha a janela de medição e sobe ou desce um nível se for o caso."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            underruns, self._underruns = self._underruns, 0
+        self._total_underruns += underruns
+        elapsed = max(now - self._window_start, 1e-6)
+        self._window_start = now
+        streams = max(1, self.streams() if self.streams is not None else 1)
+        self.underrun_rate = round(underruns / elapsed / streams, 3)
+        self.cpu_pct = self._cpu_percent()
+        if self.forced is not None:
+            return
+
+        cpu_high = self.cpu_pct is not None and self.cpu_pct >= self.cpu_high
+        cpu_low = self.cpu_pct is None or self.cpu_pct <= self.cpu_low
+        if cpu_high or self.underrun_rate >= self.underrun_high:
+            self._calm_since = None
+            if self.level < len(self.profiles) - 1:
+                self._set_level(self.level + 1)
+                self.downgrades += 1
+            return
+        if not (cpu_low and self.underrun_rate <= self.underrun_low):
+            self._calm_since = None
+            return
+        if self._calm_since is None:
+            self._calm_since = now
+        elif self.level > 0 and now - self._calm_since >= self.cooldown:
+            # Cada nível a mais exige outra janela inteira de calma
+            self._calm_since = now
+            self._set_level(self.level - 1)
+            self.upgrades += 1
+
+    def _set_level(self, level: int) -> None:
+        previous = self.profile.name
+        # Descer de perfil é aviso; voltar ao normal é só informação
+        report = log.warning if level > self.level else log.info
+        self.level = level
+        report(
+            "🎚️ Perfil de áudio: %s -> %s (CPU %s%%, %.2f underruns/s por stream)",
+            previous, self.profile.name,
+            self.cpu_pct if self.cpu_pct is not None else "?", self.underrun_rate,
+        )
+
+    def _read_cpu(self) -> Optional[Tuple[int, int]]:
+        """(ticks ocupados, ticks totais) de todas as CPUs, do /proc/stat."""
+        try:
+            with open(_PROC_STAT, "rb") as f:
+                fields = [int(value) for value in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        total = sum(fields[:8])  # user..steal (guest já está contado em user)
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+        return total - idle, total
+
+    def _cpu_percent(self) -> Optional[float]:
+        current = self._read_cpu()
+        if current is None:
+            # Sem /proc (fora do Linux): carga média do último minuto por núcleo
+            if not hasattr(os, "getloadavg"):
+                return None
+            return round(100.0 * os.getloadavg()[0] / (os.cpu_count() or 1), 1)
+        previous, self._cpu_prev = self._cpu_prev, current
+        if previous is None or current[1] <= previous[1]:
+            return None
+        return round(100.0 * (current[0] - previous[0]) / (current[1] - previous[1]), 1)
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        return {
+            'profile': self.profile.name,
+            'level': self.level,
+            'forced': self.forced is not None,
+            'cpu_pct': self.cpu_pct,
+            'underrun_rate': self.underrun_rate,
+            'underruns': self._total_underruns,
+            'downgrades': self.downgrades,
+            'upgrades': self.upgrades,
+        }
@@ -0,0 +1,174 @@
+"""
+Configuração persistente do bot (global e por guild).
+
+As alterações ficam em memória e vão para o disco depois de uma janela curta,
+então vários toggles seguidos viram uma gravação só. As gravações rodam numa
+única thread (nunca duas ao mesmo tempo) e são atômicas: arquivo temporário,
+fsync e rename, de modo que um crash no meio deixa o arquivo antigo inteiro.
+
+As configurações globais ficam no `config.json`. As de cada guild ficam num
+`AppendLog` à parte (uma linha por alteração), para que mudar uma guild não
+obrigue a reescrever as de todas as outras. O formato antigo, com o mapa
+"guilds" dentro do `config.json`, é migrado na primeira carga.
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.appendlog import AppendLog
+
+log = logging.getLogger("cababot.storage")
+
+
+def atomic_write_json(path: Path, data: Any) -> None:
+    """Grava JSON via temp + fsync + rename (o arquivo nunca fica pela metade)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    # Garante que o próprio rename chegou ao disco (não existe no Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class ConfigStore:
+    """Configuração em memória com gravação atrasada, agrupada e atômica.
+
+    Args:
+        path (Path): Arquivo JSON das configurações globais
+        guilds_path (Path): Arquivo .jsonl com os registros por guild
+        debounce (float): Janela (s) para juntar alterações antes de gravar
+    """
+
+    def __init__(self, path: Path, guilds_path: Path, debounce: float = 1.0):
+        self.path = path
+        self.debounce = debounce
+        self._data: Dict[str, Any] = {}
+        self._guilds: Dict[str, Dict[str, Any]] = {}
+        self._guild_log = AppendLog(guilds_path, key='guild_id', flush_delay=debounce, durable=True)
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="config-io")
+        self._dirty = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+
+    def load(self) -> None:
+        """Lê as configurações do disco (síncrono; chamado antes do loop existir)."""
+        self._data = self._read_json()
+        self._guilds = self._guild_log.load()
+
+        legacy = self._data.pop("guilds", None)
+        if isinstance(legacy, dict):
+            for guild_id, enabled in legacy.items():
+                if guild_id not in self._guilds:
+                    record = {'startup_audio': bool(enabled)}
+                    self._guilds[guild_id] = record
+                    self._guild_log.append(guild_id, record)
+            self._guild_log.flush()
+            # Só tira o mapa antigo do config.json depois que o log foi gravado
+            self._write(copy.deepcopy(self._data))
+            log.info("✅ Configuração de %d guild(s) migrada para %s", len(legacy), self._guild_log.path.name)
+
+    def _read_json(self) -> Dict[str, Any]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("o conteúdo não é um objeto JSON")
+            return data
+        except (OSError, ValueError) as e:
+            # Guarda o arquivo ruim para inspeção em vez de sobrescrevê-lo calado
+            broken = self.path.with_name(f"{self.path.name}.corrupt-{int(time.time())}")
+            try:
+                os.replace(self.path, broken)
+            except OSError:
+                broken = self.path
+            log.warning("⚠️ %s ilegível (%s); usando configuração padrão. Original em %s", self.path.name, e, broken.name)
+            return {}
+
+    # ------------------------------------------------------------------
+    # Leitura/escrita em memória
+    # ------------------------------------------------------------------
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        """Altera uma configuração global e agenda a gravação do config.json."""
+        if self._data.get(key) == value and key in self._data:
+            return
+        self._data[key] = value
+        self._schedule()
+
+    def guild(self, guild_id: int) -> Dict[str, Any]:
+        """Configurações de uma guild (cópia; vazio se nunca foi alterada)."""
+        return dict(self._guilds.get(str(guild_id), {}))
+
+    def set_guild(self, guild_id: int, field: str, value: Any) -> None:
+        """Altera uma configuração da guild e agenda a gravação do registro dela."""
+        key = str(guild_id)
+        record = self._guilds.setdefault(key, {})
+        if field in record and record[field] == value:
+            return
+        record[field] = value
+        self._guild_log.append(key, dict(record))
+
+    # ------------------------------------------------------------------
+    # Gravação
+    # ------------------------------------------------------------------
+
+    def _schedule(self) -> None:
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.debounce, self._flush_async)
+
+    def _flush_async(self) -> None:
+        self._flush_handle = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        # Cópia tirada no loop: a thread nunca lê o dicionário enquanto ele muda
+        snapshot = copy.deepcopy(self._data)
+        asyncio.get_running_loop().run_in_executor(self._executor, self._write, snapshot)
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        try:
+            atomic_write_json(self.path, data)
+        except OSError as e:
+            log.error("Erro ao salvar %s: %s", self.path.name, e)
+
+    def flush(self) -> None:
+        """Grava tudo o que estiver pendente de forma síncrona (usado no desligamento)."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._dirty:
+            self._dirty = False
+            snapshot = copy.deepcopy(self._data)
+            # Passa pela mesma thread para ficar depois de gravações já agendadas
+            self._executor.submit(self._write, snapshot).result()
+        self._guild_log.flush()
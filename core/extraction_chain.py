@@ -0,0 +1,423 @@
+"""
+Cadeia de perfis de extração com circuit breaker e orçamento de retentativas.
+
+Quando o YouTube começa a devolver 403 ou a estrangular um tipo de cliente,
+insistir no mesmo perfil só faz cada pedido falhar devagar, um de cada vez.
+Aqui cada perfil (cliente do player, formato, timeout) tem a própria saúde:
+
+- falhas seguidas (ou uma taxa alta de falhas nas últimas tentativas) abrem o
+  circuito e o perfil é pulado por `cooldown` segundos; depois disso uma
+  única tentativa de sondagem decide se ele volta;
+- um pedido que falha passa para o próximo perfil da lista, com uma espera
+  curta e aleatória (full jitter) entre as tentativas;
+- retentativas são limitadas por pedido (`max_attempts`) e no total: cada
+  pedido novo deposita `retry_ratio` fichas e cada retentativa gasta uma, para
+  que uma pane geral não multiplique a carga no YouTube;
+- opcionalmente (hedge), uma tentativa que roda há mais que o p95 recente
+  ganha uma segunda em paralelo, e fica valendo a que terminar primeiro.
+
+As latências são de execução: a tentativa avisa (`AttemptClock.start`)
+quando sai da fila do agendador e começa a rodar numa thread, então a espera
+na fila, que mede o congestionamento das lanes e não o perfil, fica de fora.
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Sequence
+
+from core import tracing
+from core.stats import percentile
+
+log = logging.getLogger("cababot.extraction")
+
+
+@dataclass(frozen=True)
+class ExtractionProfile:
+    """Um jeito de chamar o yt-dlp.
+
+    Attributes:
+        name (str): Nome mostrado no dashboard
+        options (dict): Opções que sobrescrevem as opções base do yt-dlp
+        timeout (float): Tempo máximo (s) de uma extração com este perfil
+    """
+
+    name: str
+    options: Dict[str, Any] = field(default_factory=dict)
+    timeout: float = 15.0
+
+
+class CircuitBreaker:
+    """Estado de saúde de um perfil: fechado, aberto ou em sondagem.
+
+    Args:
+        failures (int): Falhas seguidas que abrem o circuito
+        failure_ratio (float): Taxa de falhas na janela que também abre o circuito
+        window (int): Últimos resultados considerados na taxa
+        min_samples (int): Resultados mínimos na janela antes de usar a taxa
+        cooldown (float): Tempo (s) aberto antes de liberar uma sondagem
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failures: int = 3,
+        failure_ratio: float = 0.5,
+        window: int = 20,
+        min_samples: int = 6,
+        cooldown: float = 30.0,
+    ):
+        self.failures = failures
+        self.failure_ratio = failure_ratio
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.consecutive = 0
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self._probing = False
+
+    def allow(self, now: float) -> bool:
+        """Diz se o perfil pode ser tentado agora (reserva a sondagem, se for o caso)."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and now - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """Libera a sondagem reservada sem registrar resultado (pedido cancelado)."""
+        self._probing = False
+
+    def record(self, ok: bool, now: float) -> bool:
+        """Registra um resultado. Retorna True se o circuito acabou de abrir."""
+        self.outcomes.append(ok)
+        self._probing = False
+        if ok:
+            self.consecutive = 0
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                self.outcomes.clear()
+            return False
+        self.consecutive += 1
+        failed = self.outcomes.count(False)
+        tripped = (
+            self.state == self.HALF_OPEN
+            or self.consecutive >= self.failures
+            or (len(self.outcomes) >= self.min_samples and failed / len(self.outcomes) >= self.failure_ratio)
+        )
+        if tripped and self.state != self.OPEN:
+            self.state = self.OPEN
+            self.opened_at = now
+            return True
+        return False
+
+
+class AttemptClock:
+    """Marca o instante em que uma tentativa começou a rodar de fato."""
+
+    __slots__ = ("started_at", "running")
+
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.running = asyncio.Event()
+
+    def start(self) -> None:
+        """Chamado quando a extração sai da fila e vai para uma thread."""
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+            self.running.set()
+
+
+class _ProfileStats:
+    __slots__ = ("attempts", "successes", "failures", "timeouts", "skipped", "latencies", "last_error")
+
+    def __init__(self, history: int = 256):
+        self.attempts = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.latencies: Deque[float] = deque(maxlen=history)
+        self.last_error: Optional[str] = None
+
+
+class _AttemptFailed(Exception):
+    """Falha de uma tentativa que vale repetir em outro perfil (já contabilizada)."""
+
+    def __init__(self, error: BaseException):
+        super().__init__(str(error))
+        self.error = error
+
+
+class ExtractionChain:
+    """Tenta os perfis em ordem, pulando os de circuito aberto.
+
+    Args:
+        profiles (Sequence[ExtractionProfile]): Perfis na ordem de preferência
+        max_attempts (int): Tentativas por pedido, somando todos os perfis
+        retry_ratio (float): Fichas de retentativa ganhas por pedido novo
+        retry_burst (float): Máximo de fichas de retentativa acumuladas
+        backoff (float): Base (s) da espera entre tentativas (dobra a cada uma)
+        backoff_max (float): Teto (s) da espera entre tentativas
+        breaker (dict): Parâmetros do `CircuitBreaker` de cada perfil
+        hedge_percentile (float): Percentil da latência de execução recente
+            (só de pedidos com hedge, os interativos) que dispara o hedge
+        hedge_min_delay (float): Espera mínima (s) antes do hedge
+        hedge_min_samples (int): Latências necessárias antes de fazer hedge
+    """
+
+    def __init__(
+        self,
+        profiles: Sequence[ExtractionProfile],
+        max_attempts: int = 3,
+        retry_ratio: float = 0.2,
+        retry_burst: float = 10.0,
+        backoff: float = 0.25,
+        backoff_max: float = 2.0,
+        breaker: Optional[Dict[str, Any]] = None,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 0.5,
+        hedge_min_samples: int = 20,
+    ):
+        if not profiles:
+            raise ValueError("É preciso pelo menos um perfil de extração")
+        self.profiles = tuple(profiles)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_ratio = retry_ratio
+        self.retry_burst = retry_burst
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breakers = {profile.name: CircuitBreaker(**(breaker or {})) for profile in self.profiles}
+        self._stats = {profile.name: _ProfileStats() for profile in self.profiles}
+        self._retry_tokens = retry_burst
+        self.requests = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Latências de execução dos pedidos com hedge (base do atraso do hedge)
+        self._latencies: Deque[float] = deque(maxlen=256)
+        self._rng = random.Random()
+
+    def _candidates(self) -> Iterator[ExtractionProfile]:
+        # Preguiçoso: só consulta (e reserva a sondagem de) um perfil quando
+        # ele vai mesmo ser tentado
+        tried = False
+        for profile in self.profiles:
+            if self.breakers[profile.name].allow(time.monotonic()):
+                tried = True
+                yield profile
+            else:
+                self._stats[profile.name].skipped += 1
+        if not tried:
+            # Tudo aberto: melhor tentar o que abriu há mais tempo do que desistir sem tentar
+            yield min(self.profiles, key=lambda p: self.breakers[p.name].opened_at)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Espera antes de disparar a segunda tentativa (None = sem histórico suficiente)."""
+        if len(self._latencies) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, percentile(self._latencies, self.hedge_percentile))
+
+    async def run(
+        self,
+        attempt: Callable[[ExtractionProfile, AttemptClock], Awaitable[Any]],
+        retryable: Callable[[BaseException], bool] = lambda e: True,
+        hedge: bool = False,
+    ) -> Any:
+        """Chama `attempt(perfil, relógio)` até um dar certo.
+
+        `attempt` deve chamar `relógio.start()` quando a extração começar a
+        rodar (ex.: `on_start` do `ExtractionScheduler.run`); sem isso a
+        latência conta desde a chamada.
+
+        Erros para os quais `retryable` devolve False (ex.: vídeo privado) são
+        repassados na hora e contam como resposta saudável do perfil. Sem
+        sucesso, levanta o erro da última tentativa.
+
+        Com `hedge`, se a primeira tentativa estiver rodando há mais que o
+        percentil `hedge_percentile` das latências recentes (a espera na fila
+        não conta: enquanto não roda, não há hedge), uma segunda começa em
+        paralelo (no próximo perfil saudável); a primeira que der certo vale e
+        a outra é cancelada. A segunda tentativa gasta do mesmo orçamento das
+        retentativas.
+        """
+        self.requests += 1
+        self._retry_tokens = min(self.retry_burst, self._retry_tokens + self.retry_ratio)
+        last_error: Optional[BaseException] = None
+        # O hedge consome candidatos deste mesmo iterador (conta em max_attempts)
+        candidates = itertools.islice(self._candidates(), self.max_attempts)
+        for tries, profile in enumerate(candidates):
+            if tries:
+                if self._retry_tokens < 1:
+                    self.budget_exhausted += 1
+                    self.breakers[profile.name].release()
+                    log.warning("Orçamento de retentativas da extração esgotado; %s não foi tentado", profile.name)
+                    break
+                self._retry_tokens -= 1
+                self.retries += 1
+                delay = min(self.backoff_max, self.backoff * (2 ** (tries - 1)))
+                try:
+                    await asyncio.sleep(self._rng.uniform(0, delay))
+                except asyncio.CancelledError:
+                    self.breakers[profile.name].release()
+                    raise
+            try:
+                if hedge and not tries:
+                    return await self._hedged(profile, candidates, attempt, retryable)
+                return await self._try(profile, attempt, retryable, sample=hedge)
+            except _AttemptFailed as failed:
+                last_error = failed.error
+        assert last_error is not None
+        raise last_error
+
+    async def _try(
+        self,
+        profile: ExtractionProfile,
+        attempt: Callable[[ExtractionProfile, AttemptClock], Awaitable[Any]],
+        retryable: Callable[[BaseException], bool],
+        clock: Optional[AttemptClock] = None,
+        sample: bool = False,
+    ) -> Any:
+        """Uma tentativa com a contabilidade do perfil; falha repetível vira `_AttemptFailed`.
+
+        Com `sample`, a latência também alimenta o atraso do hedge.
+        """
+        stats = self._stats[profile.name]
+        stats.attempts += 1
+        clock = clock or AttemptClock()
+        called = time.monotonic()
+        try:
+            result = await attempt(profile, clock)
+        except asyncio.CancelledError:
+            # Quem pediu desistiu (ou o hedge perdeu): não diz nada sobre a saúde do perfil
+            self.breakers[profile.name].release()
+            raise
+        except Exception as e:
+            if not isinstance(e, asyncio.TimeoutError) and not retryable(e):
+                # O perfil respondeu (ex.: "vídeo privado"): está saudável
+                self.breakers[profile.name].record(True, time.monotonic())
+                raise
+            self._failed(profile, e)
+            raise _AttemptFailed(e) from e
+        elapsed = time.monotonic() - (clock.started_at or called)
+        stats.successes += 1
+        stats.latencies.append(elapsed)
+        if sample:
+            self._latencies.append(elapsed)
+        self.breakers[profile.name].record(True, time.monotonic())
+        return result
+
+    async def _hedged(
+        self,
+        profile: ExtractionProfile,
+        candidates: Iterator[ExtractionProfile],
+        attempt: Callable[[ExtractionProfile, AttemptClock], Awaitable[Any]],
+        retryable: Callable[[BaseException], bool],
+    ) -> Any:
+        clock = AttemptClock()
+        primary = asyncio.ensure_future(self._try(profile, attempt, retryable, clock, sample=True))
+        delay = self.hedge_delay()
+        try:
+            if delay is not None:
+                # O atraso conta do início da execução: parada na fila do
+                # agendador, outra tentativa só aumentaria o congestionamento
+                running = asyncio.ensure_future(clock.running.wait())
+                try:
+                    await asyncio.wait({primary, running}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    running.cancel()
+                if not primary.done():
+                    remaining = delay - (time.monotonic() - (clock.started_at or time.monotonic()))
+                    await asyncio.wait({primary}, timeout=max(0.0, remaining))
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if delay is None or primary.done() or self._retry_tokens < 1:
+            return await primary
+
+        # Só um perfil saudável: o hedge repete o mesmo
+        backup = next(candidates, profile)
+        self._retry_tokens -= 1
+        self.hedges += 1
+        tracing.event("extraction_hedge", profile=backup.name, after_ms=round(delay * 1000, 1))
+        secondary = asyncio.ensure_future(self._try(backup, attempt, retryable, sample=True))
+        pending = {primary, secondary}
+        failed: Optional[_AttemptFailed] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result = task.result()
+                    except _AttemptFailed as e:
+                        failed = e
+                        continue
+                    if task is secondary:
+                        self.hedge_wins += 1
+                    return result
+            assert failed is not None
+            raise failed
+        finally:
+            # O perdedor é cancelado (se já roda numa thread, o resultado é ignorado)
+            for task in pending:
+                task.cancel()
+
+    def _failed(self, profile: ExtractionProfile, error: BaseException) -> None:
+        stats = self._stats[profile.name]
+        stats.failures += 1
+        if isinstance(error, asyncio.TimeoutError):
+            stats.timeouts += 1
+            stats.last_error = f"timeout após {profile.timeout:.0f}s"
+        else:
+            stats.last_error = f"{type(error).__name__}: {error}"[:200]
+        if self.breakers[profile.name].record(False, time.monotonic()):
+            log.warning("⚡ Perfil de extração %s com falhas (%s); pulando por %.0fs",
+                        profile.name, stats.last_error, self.breakers[profile.name].cooldown)
+        else:
+            log.info("Extração com o perfil %s falhou: %s", profile.name, stats.last_error)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) por perfil para o dashboard."""
+        delay = self.hedge_delay()
+        profiles = {}
+        for profile in self.profiles:
+            stats = self._stats[profile.name]
+            finished = stats.successes + stats.failures
+            profiles[profile.name] = {
+                'state': self.breakers[profile.name].state,
+                'attempts': stats.attempts,
+                'successes': stats.successes,
+                'failures': stats.failures,
+                'timeouts': stats.timeouts,
+                'skipped': stats.skipped,
+                'success_rate': round(stats.successes / finished, 3) if finished else None,
+                'latency_p50_ms': round(percentile(stats.latencies, 50) * 1000, 1),
+                'latency_p99_ms': round(percentile(stats.latencies, 99) * 1000, 1),
+                'last_error': stats.last_error,
+            }
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'budget_exhausted': self.budget_exhausted,
+            'retry_tokens': round(self._retry_tokens, 2),
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'hedge_rate': round(self.hedges / self.requests, 3) if self.requests else 0.0,
+            'hedge_delay_ms': round(delay * 1000, 1) if delay is not None else None,
+            'profiles': profiles,
+        }
@@ -0,0 +1,298 @@
+"""
+Supervisor dos processos FFmpeg da reprodução.
+
+Cada faixa tocada abre um FFmpeg. O supervisor limita quantos existem ao
+mesmo tempo (novas reproduções esperam numa fila FIFO quando o limite é
+atingido), sabe de qual guild é cada processo e passa periodicamente por
+todos eles:
+
+- processos que já saíram mas nunca foram liberados (zumbis) são colhidos;
+- processos que não são mais a fonte tocando na guild há mais de `stale_after`
+  segundos (ex.: o `VoiceClient` caiu sem chamar o `cleanup`) são mortos;
+- CPU e memória (RSS) de cada processo são lidos do `/proc` (só no Linux),
+  para o dashboard mostrar quanto custa cada stream.
+"""
+
+import asyncio
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from core.stats import percentile
+
+log = logging.getLogger("cababot.ffmpeg")
+
+_PROC = "/proc"
+
+
+class FFmpegLease:
+    """Vaga de um processo FFmpeg; liberada pelo `cleanup` da fonte de áudio.
+
+    Args:
+        supervisor (FFmpegSupervisor): Quem concedeu a vaga
+        guild_id (int): Guild dona do processo
+        label (str): Descrição curta (título da faixa) para o dashboard
+    """
+
+    def __init__(self, supervisor: "FFmpegSupervisor", guild_id: int, label: str):
+        self.supervisor = supervisor
+        self.guild_id = guild_id
+        self.label = label
+        self.process: Optional[subprocess.Popen] = None
+        # Fonte de áudio que usa o processo (consultada pelo `in_use` do bot)
+        self.owner: Any = None
+        self.granted = time.monotonic()
+        self.stale_since: Optional[float] = None
+        self.released = False
+        # Amostra anterior de CPU (ticks, instante) e a última medição
+        self._cpu_ticks: Optional[int] = None
+        self._cpu_at = 0.0
+        self.cpu_pct: Optional[float] = None
+        self.rss_mb: Optional[float] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process is not None else None
+
+    def attach(self, process: Optional[subprocess.Popen], owner: Any) -> None:
+        """Associa o processo aberto (e a fonte que o usa) à vaga."""
+        self.process = process
+        self.owner = owner
+
+    def release(self) -> None:
+        """Devolve a vaga. Pode ser chamado de qualquer thread, mais de uma vez."""
+        self.supervisor._release_threadsafe(self)
+
+
+class FFmpegSupervisor:
+    """Limite global de processos FFmpeg, fila de espera e faxina periódica.
+
+    Args:
+        max_processes (int): Processos simultâneos (0 = sem limite, só contabiliza)
+        in_use (Callable[[FFmpegLease], bool]): Diz se a fonte da vaga ainda é a
+            que está tocando (ou pausada) na guild
+        interval (float): Intervalo (s) entre as passadas de faxina e medição
+        stale_after (float): Tempo (s) fora de uso até o processo ser morto
+    """
+
+    def __init__(
+        self,
+        max_processes: int = 0,
+        in_use: Optional[Callable[[FFmpegLease], bool]] = None,
+        interval: float = 10.0,
+        stale_after: float = 30.0,
+    ):
+        self.max_processes = max_processes
+        self.in_use = in_use
+        self.interval = interval
+        self.stale_after = stale_after
+        self._leases: Dict[int, FFmpegLease] = {}
+        self._waiters: Deque[Tuple[asyncio.Future, int, str]] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self._waits: Deque[float] = deque(maxlen=256)
+        self._clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+        self.spawned = 0
+        self.queued = 0
+        self.reaped = 0
+        self.killed = 0
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        """Inicia a task de faxina (precisa de um loop rodando)."""
+        self._loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._task = self._loop.create_task(self._run())
+
+    def shutdown(self) -> None:
+        """Para a faxina e mata o que ainda estiver aberto (desligamento)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for lease in list(self._leases.values()):
+            self._kill(lease)
+        self._leases.clear()
+        while self._waiters:
+            waiter = self._waiters.popleft()[0]
+            if not waiter.done():
+                waiter.cancel()
+
+    # ------------------------------------------------------------------
+    # Vagas
+    # ------------------------------------------------------------------
+
+    async def acquire(self, guild_id: int, label: str = "") -> FFmpegLease:
+        """Reserva uma vaga, esperando na fila se o limite foi atingido."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        # Quem já espera na fila tem a vez, mesmo que uma vaga tenha acabado de abrir
+        if self.max_processes <= 0 or (not self._waiters and len(self._leases) < self.max_processes):
+            lease = self._grant(guild_id, label)
+        else:
+            self.queued += 1
+            waiter = self._loop.create_future()
+            self._waiters.append((waiter, guild_id, label))
+            try:
+                lease = await waiter
+            except asyncio.CancelledError:
+                # Recebeu a vaga no mesmo instante em que foi cancelado: devolve
+                if waiter.done() and not waiter.cancelled():
+                    waiter.result().release()
+                raise
+        self._waits.append(time.monotonic() - started)
+        return lease
+
+    def _grant(self, guild_id: int, label: str) -> FFmpegLease:
+        lease = FFmpegLease(self, guild_id, label)
+        self._leases[id(lease)] = lease
+        self.spawned += 1
+        return lease
+
+    def _wake_next(self) -> None:
+        # A vaga é ocupada já aqui, antes de quem esperava retomar, para um
+        # `acquire` que chegue nesse meio-tempo não passar do limite
+        while self._waiters and (self.max_processes <= 0 or len(self._leases) < self.max_processes):
+            waiter, guild_id, label = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(self._grant(guild_id, label))
+
+    def _release_threadsafe(self, lease: FFmpegLease) -> None:
+        with self._lock:
+            if lease.released:
+                return
+            lease.released = True
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._leases.pop(id(lease), None)
+            return
+        try:
+            loop.call_soon_threadsafe(self._release, lease)
+        except RuntimeError:
+            self._leases.pop(id(lease), None)
+
+    def _release(self, lease: FFmpegLease) -> None:
+        if self._leases.pop(id(lease), None) is not None:
+            self._wake_next()
+
+    def _kill(self, lease: FFmpegLease) -> None:
+        process = lease.process
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Faxina e medição
+    # ------------------------------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                log.error("Erro na faxina dos processos FFmpeg: %s", e)
+
+    async def sweep(self) -> None:
+        """Uma passada: colhe os que saíram, mata os abandonados e mede o resto."""
+        now = time.monotonic()
+        for lease in list(self._leases.values()):
+            process = lease.process
+            if process is None:
+                # Vaga concedida cujo processo nunca foi aberto (erro no caminho)
+                if now - lease.granted >= self.stale_after:
+                    lease.release()
+                continue
+            if process.poll() is not None:
+                # Saiu e ninguém chamou o cleanup: o poll() já colheu o zumbi
+                if lease.stale_since is None:
+                    self.reaped += 1
+                    log.warning("🧹 FFmpeg %s da guild %s saiu sem cleanup; vaga liberada", lease.pid, lease.guild_id)
+                lease.release()
+                continue
+            if self.in_use is None or self.in_use(lease):
+                lease.stale_since = None
+                continue
+            if lease.stale_since is None:
+                lease.stale_since = now
+            elif now - lease.stale_since >= self.stale_after:
+                self.killed += 1
+                log.warning("🧹 FFmpeg %s da guild %s abandonado há %.0fs; encerrando",
+                            lease.pid, lease.guild_id, now - lease.stale_since)
+                self._kill(lease)
+        leases = [lease for lease in self._leases.values() if lease.process is not None]
+        if leases and os.path.isdir(_PROC):
+            await asyncio.get_running_loop().run_in_executor(None, self._sample, leases)
+
+    def _sample(self, leases: List[FFmpegLease]) -> None:
+        """Lê CPU e RSS de cada processo no /proc (roda numa thread)."""
+        for lease in leases:
+            pid = lease.pid
+            try:
+                with open(f"{_PROC}/{pid}/stat", "rb") as f:
+                    # O nome do processo (campo 2) pode ter espaços: corta após o ')'
+                    fields = f.read().rsplit(b")", 1)[1].split()
+                with open(f"{_PROC}/{pid}/statm", "rb") as f:
+                    rss_pages = int(f.read().split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            ticks = int(fields[11]) + int(fields[12])  # utime + stime
+            now = time.monotonic()
+            if lease._cpu_ticks is not None and now > lease._cpu_at:
+                used = (ticks - lease._cpu_ticks) / self._clock_ticks
+                lease.cpu_pct = round(100.0 * used / (now - lease._cpu_at), 1)
+            lease._cpu_ticks, lease._cpu_at = ticks, now
+            lease.rss_mb = round(rss_pages * self._page_size / (1024 * 1024), 1)
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
+    def streams(self) -> List[Dict[str, Any]]:
+        """Processos abertos com guild, idade e a última medição de recursos."""
+        now = time.monotonic()
+        return [
+            {
+                'guild_id': str(lease.guild_id),
+                'pid': lease.pid,
+                'label': lease.label,
+                'age_s': round(now - lease.granted, 1),
+                'cpu_pct': lease.cpu_pct,
+                'rss_mb': lease.rss_mb,
+                'stale': lease.stale_since is not None,
+            }
+            for lease in self._leases.values()
+        ]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        streams = self.streams()
+        return {
+            'running': len(streams),
+            'max_processes': self.max_processes,
+            'waiting': sum(1 for w, _, _ in self._waiters if not w.done()),
+            'spawned': self.spawned,
+            'queued': self.queued,
+            'reaped': self.reaped,
+            'killed': self.killed,
+            'wait_p95_ms': round(percentile(self._waits, 95) * 1000, 1),
+            'cpu_pct': round(sum(s['cpu_pct'] or 0.0 for s in streams), 1),
+            'rss_mb': round(sum(s['rss_mb'] or 0.0 for s in streams), 1),
+            'streams': streams,
+        }
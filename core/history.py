@@ -0,0 +1,169 @@
+"""
+Histórico persistente de reproduções em SQLite.
+
+As inserções são write-behind: `record()` só guarda a linha num buffer em
+memória, e o buffer vai para o banco em lote, numa thread dedicada (a conexão
+SQLite pertence a essa thread). As consultas de "mais tocadas" e "tocadas
+recentemente" também rodam nessa thread, fora do event loop.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger("cababot.storage")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plays (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    video_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    duration REAL,
+    requester_id INTEGER,
+    played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_plays_guild_video ON plays (guild_id, video_id);
+CREATE INDEX IF NOT EXISTS idx_plays_guild_time ON plays (guild_id, played_at);
+CREATE INDEX IF NOT EXISTS idx_plays_video ON plays (video_id);
+"""
+
+_Row = Tuple[int, str, str, Optional[float], Optional[int], float]
+
+
+class PlayHistoryStore:
+    """Registro de reproduções por guild com gravação em lote.
+
+    Args:
+        path (Path): Arquivo do banco SQLite
+        flush_interval (float): Intervalo máximo (s) entre gravações do buffer
+        batch_size (int): Tamanho do buffer que força uma gravação imediata
+    """
+
+    def __init__(self, path: Path, flush_interval: float = 5.0, batch_size: int = 200):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._buffer: List[_Row] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.recorded = 0
+
+    # ------------------------------------------------------------------
+    # Thread do banco
+    # ------------------------------------------------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path))
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _insert(self, rows: List[_Row]) -> None:
+        try:
+            conn = self._db()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO plays (guild_id, video_id, title, duration, requester_id, played_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            log.error("Erro ao gravar histórico: %s", e)
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    # ------------------------------------------------------------------
+    # Escrita (write-behind)
+    # ------------------------------------------------------------------
+
+    async def open(self) -> None:
+        """Abre/cria o banco na thread dedicada."""
+        await self._run(self._db)
+
+    def record(self, guild_id: int, video_id: str, title: str,
+               duration: Optional[float] = None, requester_id: Optional[int] = None) -> None:
+        """Enfileira uma reprodução para gravação em lote (não bloqueia)."""
+        self._buffer.append((guild_id, video_id, title, duration, requester_id, time.time()))
+        self.recorded += 1
+        if len(self._buffer) >= self.batch_size:
+            self._flush_async()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_interval, self._flush_async)
+
+    def _flush_async(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        rows, self._buffer = self._buffer, []
+        if rows:
+            asyncio.get_running_loop().run_in_executor(self._executor, self._insert, rows)
+
+    def close(self) -> None:
+        """Grava o buffer pendente e fecha o banco (usado no desligamento)."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        rows, self._buffer = self._buffer, []
+
+        def _finish() -> None:
+            if rows:
+                self._insert(rows)
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        # Roda na própria thread do banco, depois das gravações já agendadas
+        self._executor.submit(_finish).result()
+        self._executor.shutdown(wait=True)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def _most_played(self, guild_id: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        where, params = ("WHERE guild_id = ?", [guild_id]) if guild_id is not None else ("", [])
+        rows = self._db().execute(
+            f"SELECT video_id, MAX(title), MAX(duration), COUNT(*) AS plays, MAX(played_at) "
+            f"FROM plays {where} GROUP BY video_id ORDER BY plays DESC, MAX(played_at) DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        return [
+            {'video_id': v, 'title': t, 'duration': d, 'plays': n, 'last_played': ts}
+            for v, t, d, n, ts in rows
+        ]
+
+    def _recently_played(self, guild_id: int, limit: int) -> List[Dict[str, Any]]:
+        rows = self._db().execute(
+            "SELECT video_id, title, duration, requester_id, played_at FROM plays "
+            "WHERE guild_id = ? ORDER BY played_at DESC LIMIT ?",
+            (guild_id, limit),
+        ).fetchall()
+        return [
+            {'video_id': v, 'title': t, 'duration': d, 'requester_id': r, 'played_at': ts}
+            for v, t, d, r, ts in rows
+        ]
+
+    async def most_played(self, guild_id: Optional[int] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Faixas mais tocadas (na guild, ou em todas se `guild_id` for None)."""
+        # O buffer entra na fila da thread do banco antes da consulta
+        self._flush_async()
+        return await self._run(self._most_played, guild_id, limit)
+
+    async def recently_played(self, guild_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Últimas reproduções da guild, da mais nova para a mais antiga."""
+        self._flush_async()
+        return await self._run(self._recently_played, guild_id, limit)
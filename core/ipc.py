@@ -0,0 +1,230 @@
+"""
+Canal IPC local entre o bot e processos auxiliares (ex.: dashboard).
+
+Mensagens são JSON compacto com prefixo de 4 bytes de tamanho. O cliente pode
+mandar vários pedidos pela mesma conexão sem esperar as respostas; cada
+resposta volta com o `id` do pedido. Usa socket Unix quando o sistema tem, e
+TCP em 127.0.0.1 nos demais (Windows).
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from core.logs import SAMPLED
+
+log = logging.getLogger("cababot.ipc")
+
+_HEADER = struct.Struct(">I")
+MAX_MESSAGE = 16 * 1024 * 1024
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class IpcError(Exception):
+    """Erro devolvido pelo outro lado (ou falha do canal).
+
+    Attributes:
+        status (int): Código no estilo HTTP (400, 404, 429, 503...)
+        data (dict): Campos extras (ex.: `retry_after`)
+    """
+
+    def __init__(self, message: str, status: int = 500, data: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.status = status
+        self.data = data or {}
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    body = json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+async def _read(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if size > MAX_MESSAGE:
+        raise IpcError(f"mensagem grande demais ({size} bytes)", 413)
+    return json.loads(await reader.readexactly(size))
+
+
+def use_unix_socket() -> bool:
+    return hasattr(asyncio, "start_unix_server")
+
+
+class IpcServer:
+    """Atende pedidos `{"id", "op", "args"}` chamando `handler(op, **args)`.
+
+    Args:
+        handler: Coroutine que recebe a operação e os argumentos
+        path (Path): Socket Unix (ignorado sem suporte a Unix sockets)
+        port (int): Porta TCP local usada quando não há socket Unix
+    """
+
+    def __init__(self, handler: Handler, path: Path, port: int = 8790):
+        self.handler = handler
+        self.path = path
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self.requests = 0
+        self.errors = 0
+
+    async def start(self) -> None:
+        if use_unix_socket():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Socket velho de uma execução anterior impede o bind
+            if self.path.exists():
+                self.path.unlink()
+            self._server = await asyncio.start_unix_server(self._serve, path=str(self.path))
+            os.chmod(self.path, 0o600)
+        else:
+            self._server = await asyncio.start_server(self._serve, host="127.0.0.1", port=self.port)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        write_lock = asyncio.Lock()
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    message = await _read(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                task = asyncio.create_task(self._answer(message, writer, write_lock))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except (IpcError, ValueError) as e:
+            log.warning("⚠️ Conexão IPC encerrada por mensagem inválida: %s", e, extra=SAMPLED)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _answer(self, message: Dict[str, Any], writer: asyncio.StreamWriter, lock: asyncio.Lock) -> None:
+        self.requests += 1
+        reply: Dict[str, Any] = {"id": message.get("id")}
+        try:
+            reply["result"] = await self.handler(message.get("op", ""), **(message.get("args") or {}))
+        except IpcError as e:
+            reply["error"] = {"message": str(e), "status": e.status, **e.data}
+        except Exception as e:
+            self.errors += 1
+            reply["error"] = {"message": f"{type(e).__name__}: {e}", "status": 500}
+        try:
+            async with lock:
+                writer.write(_encode(reply))
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        return {
+            'connections': len(self._writers),
+            'requests': self.requests,
+            'errors': self.errors,
+            'in_flight': len(self._tasks),
+        }
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        # Fecha as conexões abertas; os handlers terminam ao ler o EOF
+        for writer in list(self._writers):
+            writer.close()
+        for task in list(self._tasks):
+            task.cancel()
+        if use_unix_socket() and self.path.exists():
+            self.path.unlink()
+
+
+class IpcClient:
+    """Cliente com reconexão automática e pedidos simultâneos numa conexão.
+
+    Args:
+        path (Path): Socket Unix do servidor
+        port (int): Porta TCP local (quando não há socket Unix)
+        timeout (float): Tempo máximo (s) de espera por resposta
+    """
+
+    def __init__(self, path: Path, port: int = 8790, timeout: float = 10.0):
+        self.path = path
+        self.port = port
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            try:
+                if use_unix_socket():
+                    self._reader, self._writer = await asyncio.open_unix_connection(str(self.path))
+                else:
+                    self._reader, self._writer = await asyncio.open_connection("127.0.0.1", self.port)
+            except OSError as e:
+                raise IpcError(f"bot indisponível ({e})", 503) from e
+            self._reader_task = asyncio.create_task(self._read_loop(self._reader))
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                message = await _read(reader)
+                future = self._pending.pop(message.get("id"), None)
+                if future is None or future.done():
+                    continue
+                error = message.get("error")
+                if error:
+                    status = error.pop("status", 500)
+                    future.set_exception(IpcError(error.pop("message", "erro"), status, error))
+                else:
+                    future.set_result(message.get("result"))
+        except (asyncio.IncompleteReadError, ConnectionError, IpcError, ValueError):
+            pass
+        finally:
+            # Conexão caiu: quem estava esperando recebe erro e a próxima chamada reconecta
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(IpcError("conexão com o bot perdida", 503))
+
+    async def call(self, op: str, **args: Any) -> Any:
+        """Envia um pedido e espera a resposta (levanta IpcError em caso de erro)."""
+        await self._connect()
+        writer = self._writer
+        if writer is None:
+            raise IpcError("conexão com o bot perdida", 503)
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            writer.write(_encode({"id": request_id, "op": op, "args": args}))
+            await writer.drain()
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError as e:
+            raise IpcError("o bot demorou demais para responder", 504) from e
+        except ConnectionError as e:
+            raise IpcError(f"conexão com o bot perdida ({e})", 503) from e
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,176 @@
+"""
+Log do bot com o módulo `logging`, escrito fora do event loop.
+
+Os loggers dos subsistemas (`cababot.player`, `cababot.voice`, ...) só põem o
+registro numa fila; uma thread (`QueueListener`) formata e escreve no stdout.
+Assim um stdout lento (ex.: o `docker logs` com back-pressure) não trava o
+loop nem as threads de áudio. Se a fila encher, os registros novos são
+descartados e contados em vez de bloquear quem loga.
+
+Níveis por subsistema vêm de uma spec como `"voice=DEBUG,player=WARNING"`.
+Mensagens frequentes podem ser amostradas com `extra=SAMPLED`: cada ponto do
+código que loga passa no máximo uma vez por janela, e a próxima linha que
+passar diz quantas foram suprimidas.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+ROOT = "cababot"
+# Loggers cujos registros passam pela fila (o do discord.py inclusive)
+_ROOTS = (ROOT, "discord")
+
+# `log.debug(..., extra=SAMPLED)`: sujeito à amostragem por ponto de chamada
+SAMPLED = {'sampled': True}
+
+_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Converte `"voice=DEBUG,discord=WARNING"` em {nome do logger: nível}.
+
+    Nomes sem ponto são subsistemas do bot (`cababot.<nome>`), exceto
+    `discord`, que também passa por aqui. Entradas inválidas são ignoradas.
+    """
+    levels: Dict[str, int] = {}
+    for part in spec.split(","):
+        name, _, level = part.partition("=")
+        name, level = name.strip(), level.strip().upper()
+        value = logging.getLevelName(level)
+        if not name or not isinstance(value, int):
+            continue
+        if "." not in name and name not in _ROOTS:
+            name = f"{ROOT}.{name}"
+        levels[name] = value
+    return levels
+
+
+class SamplingFilter(logging.Filter):
+    """Deixa passar um registro `SAMPLED` por ponto de chamada a cada `interval` s."""
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+        self.suppressed = 0
+        self._seen: Dict[Tuple[str, int], Tuple[float, int]] = {}
+        # Threads de áudio também logam
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False) or self.interval <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            last, skipped = self._seen.get(key, (0.0, 0))
+            if last and now - last < self.interval:
+                self._seen[key] = (last, skipped + 1)
+                self.suppressed += 1
+                return False
+            self._seen[key] = (now, 0)
+        if skipped:
+            record.msg = f"{record.msg} (+{skipped} suprimidas)"
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloqueia e deixa a formatação para a thread."""
+
+    def __init__(self, log_queue: "queue.Queue[Any]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A fila é da mesma memória: não precisa pré-formatar (nem serializar)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Configura os loggers do bot e a thread que escreve o log.
+
+    Args:
+        level (str): Nível padrão de todos os subsistemas (ex.: "INFO")
+        levels (str): Níveis por subsistema (ver `parse_levels`)
+        sample_interval (float): Janela (s) da amostragem de mensagens `SAMPLED`
+        queue_size (int): Registros que cabem na fila antes de descartar
+        stream (TextIO | None): Destino (padrão: o `sys.stdout` da hora do `start()`)
+    """
+
+    def __init__(
+        self,
+        level: str = "INFO",
+        levels: str = "",
+        sample_interval: float = 10.0,
+        queue_size: int = 10000,
+        stream: Optional[TextIO] = None,
+    ):
+        value = logging.getLevelName(level.strip().upper())
+        self.level = value if isinstance(value, int) else logging.INFO
+        self.levels = parse_levels(levels)
+        self.stream = stream
+        self.sampling = SamplingFilter(sample_interval)
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._handler = _DroppingQueueHandler(self._queue)
+        self._handler.addFilter(self.sampling)
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self) -> None:
+        """Liga o handler nos loggers do bot e do discord.py e sobe a thread."""
+        if self._listener is not None:
+            return
+        output = logging.StreamHandler(self.stream or sys.stdout)
+        output.setFormatter(logging.Formatter(_FORMAT))
+        self._listener = logging.handlers.QueueListener(self._queue, output)
+        self._listener.start()
+
+        for name in _ROOTS:
+            logger = logging.getLogger(name)
+            logger.setLevel(self.level)
+            logger.addHandler(self._handler)
+            logger.propagate = False
+        for name, level in self.levels.items():
+            logging.getLogger(name).setLevel(level)
+        # Garante que o que estiver na fila seja escrito na saída do processo
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Escreve o que estiver na fila e para a thread (idempotente)."""
+        listener, self._listener = self._listener, None
+        if listener is None:
+            return
+        for name in _ROOTS:
+            logging.getLogger(name).removeHandler(self._handler)
+        while True:
+            try:
+                listener.stop()
+                return
+            except queue.Full:
+                # O sentinela de parada entra com put_nowait: com a fila cheia
+                # (stdout travado) descarta o registro mais velho para abrir vaga
+                try:
+                    self._queue.get_nowait()
+                    self._handler.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        return {
+            'level': logging.getLevelName(self.level),
+            'levels': {name: logging.getLevelName(level) for name, level in self.levels.items()},
+            'queued': self._queue.qsize(),
+            'dropped': self._handler.dropped,
+            'sampled_out': self.sampling.suppressed,
+        }
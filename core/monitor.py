@@ -0,0 +1,181 @@
+"""
+Monitoramento do event loop.
+
+- LoopLagMonitor: mede periodicamente o atraso (lag) do event loop, ou seja,
+  quanto tempo um `asyncio.sleep` demora além do esperado.
+- Detector de bloqueio (opcional): uma thread watchdog percebe quando o loop
+  parou de responder e captura a coroutine em execução e a pilha da thread do
+  loop naquele instante, para achar quem está bloqueando o áudio.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from core.logs import SAMPLED
+from core.stats import percentile
+
+log = logging.getLogger("cababot.loop")
+
+
+class LoopLagMonitor:
+    """Amostrador de lag do event loop com detector de chamadas bloqueantes.
+
+    Args:
+        interval (float): Intervalo entre amostras, em segundos
+        warn_ms (float): Lag (ms) a partir do qual um aviso é impresso no log
+        detect_blocking (bool): Liga a thread watchdog que captura a pilha do loop
+        blocking_ms (float): Tempo (ms) sem heartbeat para considerar o loop bloqueado
+        history (int): Quantidade de amostras/eventos mantidos em memória
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        warn_ms: float = 100.0,
+        detect_blocking: bool = False,
+        blocking_ms: float = 250.0,
+        history: int = 240,
+    ):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self.detect_blocking = detect_blocking
+        self.blocking_ms = blocking_ms
+
+        self.samples: Deque[float] = deque(maxlen=history)
+        self.blocking_events: Deque[Dict[str, Any]] = deque(maxlen=50)
+        self.max_lag_ms = 0.0
+        self.warnings = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Último "batimento" do loop (time.monotonic), lido pela watchdog
+        self._last_beat = time.monotonic()
+        # Evento de bloqueio em andamento (preenchido pela watchdog)
+        self._pending_event: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Inicia o amostrador (e a watchdog, se habilitada) no loop atual."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = self._loop.create_task(self._sample_forever())
+
+        if self.detect_blocking:
+            self._stop.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    def stop(self) -> None:
+        """Para o amostrador e a watchdog."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample_forever(self) -> None:
+        """Dorme `interval` segundos e mede quanto o despertar atrasou."""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag_ms = max(0.0, (now - start - self.interval) * 1000.0)
+            self._last_beat = now
+            self._record(lag_ms)
+
+    def _record(self, lag_ms: float) -> None:
+        self.samples.append(lag_ms)
+        if lag_ms > self.max_lag_ms:
+            self.max_lag_ms = lag_ms
+
+        # Fecha o evento de bloqueio capturado pela watchdog com a duração real
+        with self._lock:
+            event = self._pending_event
+            self._pending_event = None
+        if event is not None:
+            event['duration_ms'] = round(lag_ms, 1)
+            self.blocking_events.append(event)
+            log.warning(
+                "⚠️ Event loop bloqueado por %.0fms em %s\n%s",
+                lag_ms, event['task'], "".join(event['stack'][-6:]),
+            )
+        elif lag_ms >= self.warn_ms:
+            self.warnings += 1
+            log.warning("⚠️ Lag do event loop: %.0fms (áudio pode engasgar)", lag_ms, extra=SAMPLED)
+
+    def _watch(self) -> None:
+        """Thread watchdog: captura a pilha do loop quando o heartbeat atrasa."""
+        threshold = self.interval + self.blocking_ms / 1000.0
+        check_every = max(0.01, self.blocking_ms / 2000.0)
+        while not self._stop.wait(check_every):
+            stalled_for = time.monotonic() - self._last_beat
+            if stalled_for < threshold:
+                continue
+            with self._lock:
+                if self._pending_event is not None:
+                    continue
+            event = self._capture(stalled_for)
+            if event is not None:
+                with self._lock:
+                    self._pending_event = event
+
+    def _capture(self, stalled_for: float) -> Optional[Dict[str, Any]]:
+        """Captura a coroutine atual e a pilha da thread do event loop."""
+        if self._loop is None or self._loop_thread_id is None:
+            return None
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.format_stack(frame)
+
+        task_desc = "<callback fora de task>"
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                coro = task.get_coro()
+                task_desc = getattr(coro, '__qualname__', None) or repr(coro)
+        except Exception:
+            pass
+
+        return {
+            'timestamp': time.time(),
+            'detected_after_ms': round(stalled_for * 1000.0, 1),
+            'duration_ms': None,
+            'task': task_desc,
+            'stack': stack,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        values = list(self.samples)
+        return {
+            'interval_ms': self.interval * 1000.0,
+            'current_ms': round(values[-1], 1) if values else 0.0,
+            'p50_ms': round(percentile(values, 50), 1),
+            'p99_ms': round(percentile(values, 99), 1),
+            'max_ms': round(self.max_lag_ms, 1),
+            'warnings': self.warnings,
+            'blocking_detector': self.detect_blocking,
+            'blocking_events': [
+                {
+                    'timestamp': e['timestamp'],
+                    'duration_ms': e['duration_ms'],
+                    'task': e['task'],
+                    'stack': "".join(e['stack'][-6:]),
+                }
+                for e in self.blocking_events
+            ],
+        }
@@ -0,0 +1,42 @@
+"""Utilitários de pipeline assíncrono (processamento em ordem com concorrência limitada)."""
+
+import asyncio
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Deque, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def ordered_map(
+    items: AsyncIterable[T],
+    fn: Callable[[int, T], Awaitable[R]],
+    concurrency: int,
+) -> AsyncIterator[Tuple[T, R]]:
+    """Aplica `fn(indice, item)` com até `concurrency` chamadas em paralelo.
+
+    Os resultados saem na mesma ordem dos itens, assim que o item da frente
+    termina; os seguintes continuam rodando em paralelo enquanto isso. Se o
+    consumidor parar no meio, as tarefas pendentes são canceladas.
+    """
+    pending: Deque[Tuple[T, "asyncio.Future[R]"]] = deque()
+    iterator = items.__aiter__()
+    exhausted = False
+    index = 0
+    try:
+        while True:
+            while not exhausted and len(pending) < max(1, concurrency):
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.append((item, asyncio.ensure_future(fn(index, item))))
+                index += 1
+            if not pending:
+                return
+            item, future = pending.popleft()
+            yield item, await future
+    finally:
+        for _, future in pending:
+            future.cancel()
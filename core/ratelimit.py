@@ -0,0 +1,162 @@
+"""
+Controle de admissão para operações caras (extração com yt-dlp).
+
+Cada guild e cada solicitante tem um token bucket próprio. Um pedido só é
+aceito se os dois buckets tiverem saldo; quando falta pouco, o pedido pode ser
+adiado (o chamador espera alguns segundos) em vez de rejeitado.
+"""
+
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+
+class TokenBucket:
+    """Token bucket clássico: `rate` fichas/segundo, até `capacity` acumuladas."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """Segundos até haver `cost` fichas (0 se já houver)."""
+        missing = cost - self.tokens
+        if missing <= 0:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return missing / self.rate
+
+
+@dataclass
+class AdmissionResult:
+    """Resultado de uma checagem de admissão.
+
+    Attributes:
+        allowed (bool): True se o pedido pode seguir (talvez após `wait`)
+        wait (float): Segundos que o chamador deve esperar antes de seguir
+        retry_after (float): Quando rejeitado, em quantos segundos tentar de novo
+        scope (str | None): Qual limite barrou o pedido ('guild' ou 'user')
+    """
+
+    allowed: bool
+    wait: float = 0.0
+    retry_after: float = 0.0
+    scope: Optional[str] = None
+
+
+class AdmissionController:
+    """Limita extrações por guild e por solicitante com token buckets.
+
+    Args:
+        guild_rate (float): Fichas/segundo repostas por guild
+        guild_burst (float): Capacidade máxima do bucket da guild
+        user_rate (float): Fichas/segundo repostas por solicitante
+        user_burst (float): Capacidade máxima do bucket do solicitante
+        max_defer (float): Espera máxima (s) aceita antes de rejeitar o pedido
+        max_buckets (int): Quantos buckets manter em memória (LRU)
+    """
+
+    def __init__(
+        self,
+        guild_rate: float = 0.5,
+        guild_burst: float = 10.0,
+        user_rate: float = 0.2,
+        user_burst: float = 5.0,
+        max_defer: float = 3.0,
+        max_buckets: int = 10000,
+    ):
+        self.guild_rate = guild_rate
+        self.guild_burst = guild_burst
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_defer = max_defer
+        self.max_buckets = max_buckets
+
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+        # Métricas
+        self.admitted = 0
+        self.deferred = 0
+        self.rejected = 0
+        self.throttled_by_scope: Counter = Counter()
+        self.throttled_by_guild: Counter = Counter()
+
+    def _bucket(self, key: Hashable, rate: float, capacity: float, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, capacity, now)
+            self._buckets[key] = bucket
+            # Descarta os buckets menos usados (um bucket novo começa cheio,
+            # então esquecer um bucket antigo nunca pune ninguém além do limite)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.refill(now)
+        return bucket
+
+    def check(self, guild_id: int, requester: Hashable, cost: float = 1.0) -> AdmissionResult:
+        """Tenta admitir um pedido de custo `cost` para a guild/solicitante.
+
+        Se os dois buckets tiverem saldo, consome e libera na hora. Se faltar
+        saldo mas a espera for até `max_defer`, reserva as fichas (saldo fica
+        negativo) e pede ao chamador para esperar. Caso contrário, rejeita sem
+        consumir nada.
+        """
+        now = time.monotonic()
+        guild_bucket = self._bucket(("guild", guild_id), self.guild_rate, self.guild_burst, now)
+        user_bucket = self._bucket(("user", guild_id, requester), self.user_rate, self.user_burst, now)
+
+        guild_wait = guild_bucket.wait_time(cost)
+        user_wait = user_bucket.wait_time(cost)
+        wait = max(guild_wait, user_wait)
+        scope = "guild" if guild_wait >= user_wait else "user"
+
+        if wait > self.max_defer:
+            self.rejected += 1
+            self.throttled_by_scope[scope] += 1
+            self.throttled_by_guild[guild_id] += 1
+            return AdmissionResult(False, retry_after=wait, scope=scope)
+
+        guild_bucket.tokens -= cost
+        user_bucket.tokens -= cost
+        if wait > 0:
+            self.deferred += 1
+            self.throttled_by_scope[scope] += 1
+            self.throttled_by_guild[guild_id] += 1
+            return AdmissionResult(True, wait=wait, scope=scope)
+
+        self.admitted += 1
+        return AdmissionResult(True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        return {
+            'admitted': self.admitted,
+            'deferred': self.deferred,
+            'rejected': self.rejected,
+            'throttled_by_scope': dict(self.throttled_by_scope),
+            'top_throttled_guilds': [
+                {'guild_id': str(gid), 'count': n}
+                for gid, n in self.throttled_by_guild.most_common(5)
+            ],
+            'limits': {
+                'guild_rate': self.guild_rate,
+                'guild_burst': self.guild_burst,
+                'user_rate': self.user_rate,
+                'user_burst': self.user_burst,
+                'max_defer': self.max_defer,
+            },
+        }
@@ -0,0 +1,195 @@
+"""
+Agendador de extrações (yt-dlp) com faixas de prioridade.
+
+Toda extração roda num pool de threads próprio, mas os trabalhos só são
+entregues ao pool quando há uma thread livre. Até lá ficam em filas por
+prioridade ("lanes"), então um `/musica` interativo nunca fica atrás de
+centenas de entradas de playlist já despachadas. Para a fila de fundo não
+morrer de fome, cada trabalho envelhece: quanto mais espera, mais prioridade.
+"""
+
+import asyncio
+import functools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, Optional
+
+from core.stats import percentile
+
+
+class Lane(IntEnum):
+    """Classes de prioridade (menor valor = mais urgente)."""
+
+    INTERACTIVE = 0   # /musica, /timer, dashboard: alguém está esperando
+    STARTUP = 1       # Áudio de boas-vindas
+    PREFETCH = 2      # Pré-resolução da próxima faixa
+    BACKGROUND = 3    # Expansão de playlists e afins
+
+
+@dataclass
+class _Job:
+    fn: Callable[[], Any]
+    future: asyncio.Future
+    lane: Lane
+    timeout: Optional[float] = None
+    on_start: Optional[Callable[[], None]] = None
+    enqueued: float = field(default_factory=time.monotonic)
+    deadline: Optional[asyncio.TimerHandle] = None
+
+
+class _LaneStats:
+    __slots__ = ("submitted", "completed", "failed", "timed_out", "waits", "max_wait")
+
+    def __init__(self, history: int = 256):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.waits: Deque[float] = deque(maxlen=history)
+        self.max_wait = 0.0
+
+
+class ExtractionScheduler:
+    """Despacha funções bloqueantes para threads respeitando prioridade.
+
+    Args:
+        workers (int): Número de threads de extração
+        reserved_interactive (int): Threads que só atendem a lane INTERACTIVE
+        aging (float): Segundos de espera que valem um nível de prioridade
+    """
+
+    def __init__(self, workers: int = 4, reserved_interactive: int = 1, aging: float = 10.0):
+        self.workers = max(1, workers)
+        self.reserved_interactive = min(max(0, reserved_interactive), self.workers - 1)
+        self.aging = aging
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+        self._lanes: Dict[Lane, Deque[_Job]] = {lane: deque() for lane in Lane}
+        self._stats: Dict[Lane, _LaneStats] = {lane: _LaneStats() for lane in Lane}
+        self._running = 0
+        self._running_shared = 0  # Trabalhos fora da lane interativa em execução
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        lane: Lane = Lane.INTERACTIVE,
+        timeout: Optional[float] = None,
+        on_start: Optional[Callable[[], None]] = None,
+    ) -> Any:
+        """Agenda `fn(*args)` numa thread e aguarda o resultado.
+
+        O `timeout` conta a partir do início da execução (não da espera na
+        fila) e levanta `asyncio.TimeoutError`; a thread não tem como ser
+        interrompida e só volta ao pool quando `fn` terminar. `on_start` é
+        chamado (no loop) quando o trabalho sai da fila e vai para uma thread,
+        para quem mede só o tempo de execução.
+        """
+        loop = asyncio.get_running_loop()
+        job = _Job(functools.partial(fn, *args), loop.create_future(), lane, timeout, on_start)
+        self._lanes[lane].append(job)
+        self._stats[lane].submitted += 1
+        self._dispatch()
+        # Se o chamador for cancelado, o future cancelado é descartado no _pick
+        return await job.future
+
+    def _pick(self, allow_shared: bool) -> Optional[_Job]:
+        """Escolhe o próximo trabalho: menor prioridade efetiva (com envelhecimento)."""
+        now = time.monotonic()
+        best: Optional[Deque[_Job]] = None
+        best_score = 0.0
+        for lane, queue in self._lanes.items():
+            # Descarta trabalhos cujo chamador desistiu
+            while queue and queue[0].future.done():
+                queue.popleft()
+            if not queue:
+                continue
+            if lane != Lane.INTERACTIVE and not allow_shared:
+                continue
+            score = lane - (now - queue[0].enqueued) / self.aging if self.aging > 0 else float(lane)
+            if best is None or score < best_score:
+                best, best_score = queue, score
+        return best.popleft() if best is not None else None
+
+    def _dispatch(self) -> None:
+        while self._running < self.workers:
+            allow_shared = self._running_shared < self.workers - self.reserved_interactive
+            job = self._pick(allow_shared)
+            if job is None:
+                return
+            self._start(job)
+
+    def _start(self, job: _Job) -> None:
+        wait = time.monotonic() - job.enqueued
+        stats = self._stats[job.lane]
+        stats.waits.append(wait)
+        if wait > stats.max_wait:
+            stats.max_wait = wait
+
+        self._running += 1
+        if job.lane != Lane.INTERACTIVE:
+            self._running_shared += 1
+
+        loop = job.future.get_loop()
+        task = loop.run_in_executor(self._executor, job.fn)
+        task.add_done_callback(functools.partial(self._finished, job))
+        if job.timeout is not None:
+            job.deadline = loop.call_later(job.timeout, self._expire, job)
+        if job.on_start is not None:
+            job.on_start()
+
+    def _expire(self, job: _Job) -> None:
+        if not job.future.done():
+            self._stats[job.lane].timed_out += 1
+            job.future.set_exception(asyncio.TimeoutError())
+
+    def _finished(self, job: _Job, task: asyncio.Future) -> None:
+        if job.deadline is not None:
+            job.deadline.cancel()
+        self._running -= 1
+        if job.lane != Lane.INTERACTIVE:
+            self._running_shared -= 1
+
+        stats = self._stats[job.lane]
+        if task.cancelled() or task.exception() is not None:
+            stats.failed += 1
+        else:
+            stats.completed += 1
+
+        if not job.future.done():
+            if task.cancelled():
+                job.future.cancel()
+            elif task.exception() is not None:
+                job.future.set_exception(task.exception())  # type: ignore[arg-type]
+            else:
+                job.future.set_result(task.result())
+        self._dispatch()
+
+    def shutdown(self) -> None:
+        """Libera as threads (trabalhos em andamento terminam sozinhos)."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) por lane para o dashboard."""
+        lanes = {}
+        for lane, stats in self._stats.items():
+            waits = list(stats.waits)
+            lanes[lane.name.lower()] = {
+                'queued': len(self._lanes[lane]),
+                'submitted': stats.submitted,
+                'completed': stats.completed,
+                'failed': stats.failed,
+                'timed_out': stats.timed_out,
+                'wait_p50_ms': round(percentile(waits, 50) * 1000, 1),
+                'wait_p99_ms': round(percentile(waits, 99) * 1000, 1),
+                'wait_max_ms': round(stats.max_wait * 1000, 1),
+            }
+        return {
+            'workers': self.workers,
+            'reserved_interactive': self.reserved_interactive,
+            'running': self._running,
+            'lanes': lanes,
+        }
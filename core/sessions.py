@@ -0,0 +1,113 @@
+"""
+Snapshots do estado de reprodução por guild (fila, faixa atual, histórico).
+
+Cada guild tem o próprio arquivo JSON, regravado só quando o estado dela muda;
+as posições de reprodução, que mudam o tempo todo, ficam num arquivo pequeno à
+parte. Todas as gravações são atômicas (temp + fsync + rename) e rodam numa
+única thread, na ordem em que foram pedidas.
+"""
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from core.config_store import atomic_write_json
+
+log = logging.getLogger("cababot.sessions")
+
+POSITIONS_FILE = "positions.json"
+
+
+class SessionStore:
+    """Diretório de snapshots: `<guild_id>.json` + `positions*.json`.
+
+    Args:
+        directory (Path): Pasta onde os snapshots ficam
+        positions_file (str): Arquivo de posições deste processo (cada grupo
+            de shards grava o seu; a carga lê todos)
+    """
+
+    def __init__(self, directory: Path, positions_file: str = POSITIONS_FILE):
+        self.directory = directory
+        self.positions_file = positions_file
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sessions-io")
+        self.writes = 0
+
+    # ------------------------------------------------------------------
+    # Thread de I/O
+    # ------------------------------------------------------------------
+
+    def _guild_path(self, guild_id: int) -> Path:
+        return self.directory / f"{guild_id}.json"
+
+    def load(self) -> Dict[str, Any]:
+        """Lê todos os snapshots (síncrono; use via executor).
+
+        Returns:
+            dict: {'guilds': {guild_id: estado}, 'positions': {guild_id: posição}}
+        """
+        guilds: Dict[int, Dict[str, Any]] = {}
+        positions: Dict[int, Dict[str, Any]] = {}
+        if not self.directory.is_dir():
+            return {'guilds': guilds, 'positions': positions}
+        for path in self.directory.glob("*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("⚠️ Snapshot ilegível ignorado (%s): %s", path.name, e)
+                continue
+            if path.name.startswith("positions"):
+                positions.update({int(k): v for k, v in data.items() if k.isdigit()})
+            elif path.stem.isdigit():
+                guilds[int(path.stem)] = data
+        return {'guilds': guilds, 'positions': positions}
+
+    def _save(self, guild_id: int, state: Optional[Dict[str, Any]]) -> None:
+        path = self._guild_path(guild_id)
+        try:
+            if state is None:
+                path.unlink(missing_ok=True)
+            else:
+                atomic_write_json(path, state)
+                self.writes += 1
+        except OSError as e:
+            log.error("Erro ao salvar snapshot da guild %s: %s", guild_id, e)
+
+    def _save_positions(self, positions: Dict[int, Dict[str, Any]]) -> None:
+        try:
+            atomic_write_json(self.directory / self.positions_file, {str(k): v for k, v in positions.items()})
+        except OSError as e:
+            log.error("Erro ao salvar posições de reprodução: %s", e)
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def load_async(self) -> Dict[str, Any]:
+        return await self._run(self.load)
+
+    async def save(self, guild_id: int, state: Optional[Dict[str, Any]]) -> None:
+        """Grava o estado da guild (ou apaga o snapshot se `state` for None)."""
+        await self._run(self._save, guild_id, state)
+
+    async def save_positions(self, positions: Dict[int, Dict[str, Any]]) -> None:
+        await self._run(self._save_positions, positions)
+
+    def save_sync(self, states: Dict[int, Optional[Dict[str, Any]]], positions: Dict[int, Dict[str, Any]]) -> None:
+        """Grava tudo de uma vez, esperando terminar (usado no desligamento)."""
+        def _all() -> None:
+            for guild_id, state in states.items():
+                self._save(guild_id, state)
+            self._save_positions(positions)
+
+        self._executor.submit(_all).result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
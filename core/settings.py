@@ -0,0 +1,27 @@
+"""Leitura de parâmetros de ajuste a partir das variáveis de ambiente (.env)."""
+
+import os
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Lê uma variável booleana ("1", "true", "yes", "on")."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_float(name: str, default: float) -> float:
+    """Lê uma variável numérica; valores inválidos caem no padrão."""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_int(name: str, default: int) -> int:
+    """Lê uma variável inteira; valores inválidos caem no padrão."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
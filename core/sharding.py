@@ -0,0 +1,94 @@
+"""
+Configuração de shards do gateway do Discord.
+
+Com `SHARD_COUNT` definido (ou "auto"), o bot usa o `AutoShardedClient`; com
+`SHARD_IDS` ele abre só uma parte dos shards, o que permite rodar grupos de
+shards em processos separados (ver `shards.py`). Cada processo só cuida das
+guilds dos próprios shards: fila, voz e snapshots delas.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+from core.settings import env_int
+
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    """Shard responsável pela guild (fórmula documentada pelo Discord)."""
+    return (guild_id >> 22) % max(1, shard_count)
+
+
+def parse_shard_ids(text: str) -> List[int]:
+    """Lê listas como "0,1,4-7" (intervalos inclusivos)."""
+    ids: List[int] = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            ids.extend(range(int(start), int(end) + 1))
+        else:
+            ids.append(int(part))
+    return sorted(set(ids))
+
+
+def format_shard_ids(ids: List[int]) -> str:
+    return ",".join(str(i) for i in ids)
+
+
+def split_groups(shard_count: int, processes: int) -> List[List[int]]:
+    """Divide os shards em `processes` grupos contíguos de tamanho parecido."""
+    processes = max(1, min(processes, shard_count))
+    base, extra = divmod(shard_count, processes)
+    groups: List[List[int]] = []
+    start = 0
+    for i in range(processes):
+        size = base + (1 if i < extra else 0)
+        groups.append(list(range(start, start + size)))
+        start += size
+    return groups
+
+
+@dataclass
+class ShardConfig:
+    """Shards deste processo.
+
+    Attributes:
+        enabled (bool): Usa o `AutoShardedClient`
+        count (int | None): Total de shards (None = o Discord recomenda)
+        ids (list[int] | None): Shards abertos por este processo (None = todos)
+        group (int): Índice do grupo de shards (0 quando há um processo só)
+    """
+
+    enabled: bool = False
+    count: Optional[int] = None
+    ids: Optional[List[int]] = None
+    group: int = 0
+
+    @classmethod
+    def from_env(cls) -> "ShardConfig":
+        raw_count = (os.getenv("SHARD_COUNT") or "").strip().lower()
+        raw_ids = (os.getenv("SHARD_IDS") or "").strip()
+        if not raw_count:
+            return cls()
+        count = None if raw_count == "auto" else int(raw_count)
+        ids = parse_shard_ids(raw_ids) if raw_ids and count else None
+        return cls(enabled=True, count=count, ids=ids, group=env_int("SHARD_GROUP", 0))
+
+    @property
+    def multiprocess(self) -> bool:
+        """True quando outros processos cuidam dos demais shards."""
+        return self.ids is not None and self.count is not None and len(self.ids) < self.count
+
+    @property
+    def is_primary(self) -> bool:
+        """O grupo 0 faz as tarefas globais (ex.: sync dos slash commands)."""
+        return self.group == 0
+
+    def owns(self, guild_id: int) -> bool:
+        """True se a guild pertence a um dos shards deste processo."""
+        if not self.multiprocess:
+            return True
+        return shard_for_guild(guild_id, self.count or 1) in (self.ids or ())
@@ -0,0 +1,287 @@
+"""
+Resolução de links do Spotify fora do event loop, com cache e lotes.
+
+O spotipy é síncrono (uma requisição HTTP por chamada), então toda chamada
+roda numa thread. Metadados de faixas ficam em cache por id com TTL, e pedidos
+que chegam juntos (ex.: vários `/musica` com links do Spotify ao mesmo tempo)
+são agrupados numa única chamada ao endpoint em lote (`tracks`, até 50 ids).
+"""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.appendlog import AppendLog
+
+log = logging.getLogger("cababot.spotify")
+
+# Limite do endpoint GET /tracks da API do Spotify
+BATCH_LIMIT = 50
+
+_URL_RE = re.compile(
+    r"(?:open\.spotify\.com/(?:intl-[a-z]{2}(?:-[a-z]{2})?/)?|spotify:)"
+    r"(?P<kind>track|album|playlist)[/:](?P<id>[A-Za-z0-9]{22})"
+)
+
+
+def parse_spotify_url(url: str) -> Optional[Tuple[str, str]]:
+    """Extrai (tipo, id) de uma URL/URI do Spotify, ou None se não reconhecer."""
+    match = _URL_RE.search(url)
+    if not match:
+        return None
+    return match.group('kind'), match.group('id')
+
+
+def track_query(track: Dict[str, Any]) -> str:
+    """Monta a busca 'Artista - Título' usada no YouTube para uma faixa."""
+    return f"{track['artist']} - {track['name']}" if track.get('artist') else track['name']
+
+
+def _simplify(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduz o objeto de faixa do Spotify aos campos que o bot usa."""
+    artists = raw.get('artists') or []
+    return {
+        'id': raw.get('id'),
+        'name': raw.get('name', ''),
+        'artist': artists[0]['name'] if artists else '',
+        'duration_ms': raw.get('duration_ms'),
+    }
+
+
+class SpotifyResolver:
+    """Resolve faixas do Spotify de forma assíncrona, em lote e com cache.
+
+    Args:
+        client_factory: Função que cria o `spotipy.Spotify`; só é chamada na
+            primeira consulta (numa thread), então o boot não paga pelo import
+        ttl (float): Tempo de vida (s) dos metadados em cache
+        max_entries (int): Tamanho máximo do cache (LRU)
+        batch_window (float): Janela (s) para juntar ids antes de chamar a API
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], ttl: float = 86400.0,
+                 max_entries: int = 20000, batch_window: float = 0.05):
+        self._client_factory = client_factory
+        self._client: Any = None
+        self._client_lock = threading.Lock()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.batch_window = batch_window
+
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self.errors = 0
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def _cache_get(self, track_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(track_id)
+        if entry is None:
+            return None
+        expires, track = entry
+        if expires < time.monotonic():
+            del self._cache[track_id]
+            return None
+        self._cache.move_to_end(track_id)
+        return track
+
+    def _cache_put(self, track: Dict[str, Any]) -> None:
+        if not track.get('id'):
+            return
+        self._cache[track['id']] = (time.monotonic() + self.ttl, track)
+        self._cache.move_to_end(track['id'])
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def remember(self, raw_tracks: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Guarda no cache faixas que vieram de outra chamada (ex.: playlist)."""
+        result = []
+        for raw in raw_tracks:
+            if not raw:
+                continue
+            track = _simplify(raw)
+            self._cache_put(track)
+            result.append(track)
+        return result
+
+    # ------------------------------------------------------------------
+    # Chamadas à API (sempre em thread)
+    # ------------------------------------------------------------------
+
+    @property
+    def client(self) -> Any:
+        """Cliente do spotipy, criado no primeiro uso (chamar só fora do loop)."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    async def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Executa um método do spotipy numa thread, fora do event loop."""
+        loop = asyncio.get_running_loop()
+        self.api_calls += 1
+        try:
+            return await loop.run_in_executor(None, lambda: getattr(self.client, method)(*args, **kwargs))
+        except Exception:
+            self.errors += 1
+            raise
+
+    def _schedule_flush(self) -> None:
+        if len(self._pending) >= BATCH_LIMIT:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            self._flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        ids = list(pending)
+        for start in range(0, len(ids), BATCH_LIMIT):
+            chunk = {i: pending[i] for i in ids[start:start + BATCH_LIMIT]}
+            asyncio.get_running_loop().create_task(self._fetch_batch(chunk))
+
+    async def _fetch_batch(self, chunk: Dict[str, asyncio.Future]) -> None:
+        try:
+            response = await self.call('tracks', list(chunk))
+            raws = (response or {}).get('tracks') or []
+        except Exception as e:
+            log.error("Erro ao buscar no Spotify: %s", e)
+            for future in chunk.values():
+                if not future.done():
+                    future.set_result(None)
+            return
+
+        found = {t['id']: t for t in self.remember(raws)}
+        for track_id, future in chunk.items():
+            if not future.done():
+                future.set_result(found.get(track_id))
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    async def get_tracks(self, track_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Resolve vários ids de faixa (cache primeiro, o resto em lote)."""
+        futures: List[Any] = []
+        loop = asyncio.get_running_loop()
+        for track_id in track_ids:
+            cached = self._cache_get(track_id)
+            if cached is not None:
+                self.hits += 1
+                futures.append(cached)
+                continue
+            self.misses += 1
+            future = self._pending.get(track_id)
+            if future is None:
+                future = loop.create_future()
+                self._pending[track_id] = future
+                self._schedule_flush()
+            futures.append(future)
+        # O futuro é compartilhado por todos que pediram o mesmo id: quem for
+        # cancelado só deixa de esperar, sem cancelar o resultado dos outros
+        return [await asyncio.shield(f) if isinstance(f, asyncio.Future) else f for f in futures]
+
+    async def get_track(self, track_id: str) -> Optional[Dict[str, Any]]:
+        """Resolve uma única faixa (entra no próximo lote se não estiver em cache)."""
+        return (await self.get_tracks([track_id]))[0]
+
+    async def _collection_page(self, kind: str, collection_id: str, offset: int, size: int) -> Dict[str, Any]:
+        if kind == 'playlist':
+            page = await self.call(
+                'playlist_items', collection_id, limit=size, offset=offset, additional_types=('track',)
+            )
+            raws = [item.get('track') for item in (page or {}).get('items', []) if item]
+        else:
+            page = await self.call('album_tracks', collection_id, limit=size, offset=offset)
+            raws = (page or {}).get('items', [])
+        # Faixas locais (is_local) não existem na API e não têm como ser buscadas
+        raws = [r for r in raws if r and r.get('id') and not r.get('is_local')]
+        return {'tracks': self.remember(raws), 'next': bool((page or {}).get('next'))}
+
+    async def iter_collection(self, kind: str, collection_id: str, limit: int = 100) -> AsyncIterator[Dict[str, Any]]:
+        """Percorre as faixas de uma playlist ou álbum, página a página.
+
+        A próxima página já é pedida enquanto as faixas da atual são consumidas.
+        """
+        size = 100 if kind == 'playlist' else 50
+        offset = 0
+        yielded = 0
+        page_task = asyncio.ensure_future(self._collection_page(kind, collection_id, offset, size))
+        try:
+            while page_task is not None:
+                page = await page_task
+                page_task = None
+                offset += size
+                if page['next'] and yielded + len(page['tracks']) < limit:
+                    page_task = asyncio.ensure_future(self._collection_page(kind, collection_id, offset, size))
+                for track in page['tracks']:
+                    if yielded >= limit:
+                        return
+                    yielded += 1
+                    yield track
+        finally:
+            if page_task is not None:
+                page_task.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        return {
+            'client_ready': self._client is not None,
+            'cache_size': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'api_calls': self.api_calls,
+            'errors': self.errors,
+        }
+
+
+class MatchStore:
+    """Cache persistente de casamentos Spotify -> YouTube.
+
+    Guardado num `AppendLog` (uma linha por casamento novo), então o arquivo
+    nunca é reescrito no caminho quente.
+
+    Args:
+        path (Path): Arquivo .jsonl onde os casamentos são gravados
+    """
+
+    def __init__(self, path: Path):
+        self._log = AppendLog(path, key='spotify_id')
+        self._data: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def load_async(self) -> None:
+        self._data = await self._log.load_async()
+
+    def get(self, spotify_id: str) -> Optional[Dict[str, Any]]:
+        return self._data.get(spotify_id)
+
+    def put(self, spotify_id: str, match: Dict[str, Any]) -> None:
+        if self._data.get(spotify_id) == match:
+            return
+        self._data[spotify_id] = match
+        self._log.append(spotify_id, match)
+
+    def flush(self) -> None:
+        """Grava o que estiver pendente (usado no desligamento)."""
+        self._log.flush()
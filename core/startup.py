@@ -0,0 +1,43 @@
+"""
+Cronômetro da inicialização do bot, fase a fase.
+
+Cada `mark()` fecha a fase corrente com o tempo desde a marca anterior, então
+o resumo mostra onde foi parar cada pedaço do boot (imports, login, sync dos
+comandos, gateway, retomada das calls).
+"""
+
+import time
+from typing import Any, Dict, List, Tuple
+
+
+class StartupTimer:
+    """Mede fases consecutivas a partir da criação do objeto."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> float:
+        """Encerra a fase `phase` e retorna sua duração (s)."""
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.phases.append((phase, elapsed))
+        return elapsed
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started
+
+    def summary(self) -> str:
+        """Resumo de uma linha para o log."""
+        parts = ", ".join(f"{name} {elapsed * 1000:.0f} ms" for name, elapsed in self.phases)
+        return f"{self.total:.2f} s ({parts})"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        return {
+            'total_ms': round(self.total * 1000, 1),
+            'phases': [{'name': name, 'ms': round(elapsed * 1000, 1)} for name, elapsed in self.phases],
+        }
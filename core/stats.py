@@ -0,0 +1,12 @@
+"""Pequenos utilitários estatísticos compartilhados pelas métricas do bot."""
+
+from typing import Iterable
+
+
+def percentile(values: Iterable[float], pct: float) -> float:
+    """Percentil simples (nearest-rank) de uma sequência de valores."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[idx]
@@ -0,0 +1,87 @@
+"""
+Cache de extrações do YouTube por ID de vídeo.
+
+Guarda o essencial de uma extração (URL do stream, título, duração) para que
+pedidos repetidos do mesmo vídeo não passem de novo pelo yt-dlp. URLs de
+stream do YouTube expiram, então cada entrada tem TTL, e quem lê do cache
+recebe em `resolved_at` o momento (monotônico) em que o stream foi extraído,
+não o da leitura.
+"""
+
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_VIDEO_ID_RE = re.compile(r"(?:youtube\.com/watch\?(?:.*&)?v=|youtu\.be/|youtube\.com/shorts/)([A-Za-z0-9_-]{11})")
+
+
+def video_id_from_url(url: str, in_playlist: bool = False) -> Optional[str]:
+    """Extrai o ID de um link de vídeo do YouTube.
+
+    Links com `list=` são ignorados, a não ser com `in_playlist=True` (aí vale
+    o vídeo do `watch?v=...&list=...`, de onde a playlist começa).
+    """
+    if "list=" in url and not in_playlist:
+        return None
+    match = _VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+class StreamCache:
+    """LRU de extrações por ID de vídeo com expiração.
+
+    Args:
+        ttl (float): Validade (s) de uma URL de stream
+        max_entries (int): Número máximo de vídeos em cache
+    """
+
+    def __init__(self, ttl: float = 4 * 3600.0, max_entries: int = 2000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna uma entrada no formato do yt-dlp (só os campos usados pelo bot).
+
+        `resolved_at` é o `time.monotonic()` de quando a entrada foi guardada.
+        """
+        item = self._entries.get(video_id)
+        if item is None or time.monotonic() - item[0] > self.ttl:
+            if item is not None:
+                del self._entries[video_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(video_id)
+        self.hits += 1
+        return {**item[1], 'resolved_at': item[0]}
+
+    def put(
+        self,
+        video_id: str,
+        stream_url: str,
+        title: str,
+        duration: Optional[float] = None,
+        resolved_at: Optional[float] = None,
+    ) -> None:
+        stamp = time.monotonic() if resolved_at is None else resolved_at
+        self._entries[video_id] = (stamp, {
+            'id': video_id,
+            'url': stream_url,
+            'title': title,
+            'duration': duration,
+            'extractor_key': 'Youtube',
+            'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+        })
+        self._entries.move_to_end(video_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,219 @@
+"""
+Agendador central de timers persistentes.
+
+Todos os timers ficam num heap ordenado pelo horário de disparo e uma única
+task dorme até o próximo evento, então milhares de timers pendentes custam só
+memória. Um segundo heap marca o momento de preparar cada timer (ex.: extrair
+o áudio do alarme) um pouco antes de ele disparar. Cada timer criado ou
+encerrado vira uma linha num `AppendLog`, e os pendentes voltam no boot.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import secrets
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from core.appendlog import AppendLog
+
+log = logging.getLogger("cababot.timers")
+
+TimerCallback = Callable[["TimerEntry"], Awaitable[None]]
+
+
+@dataclass
+class TimerEntry:
+    """Um timer agendado (horários em epoch, para sobreviver a reinícios)."""
+
+    timer_id: str
+    guild_id: int
+    channel_id: int
+    user_id: int
+    user_name: str
+    query: str
+    fire_at: float
+    created_at: float = field(default_factory=time.time)
+    # Preenchido pela preparação; não vai para o disco
+    resolved: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+    def to_record(self) -> Dict[str, Any]:
+        record = asdict(self)
+        record.pop('timer_id')
+        record.pop('resolved')
+        return record
+
+
+class TimerScheduler:
+    """Heap de timers com uma única task de disparo.
+
+    Args:
+        path (Path): Arquivo .jsonl onde os timers pendentes são gravados
+        on_fire: Coroutine chamada quando o timer vence
+        on_prepare: Coroutine chamada `prepare_lead` segundos antes do disparo
+        prepare_lead (float): Antecedência (s) da preparação
+        accept: Filtro dos timers restaurados (ex.: só as guilds deste shard)
+    """
+
+    def __init__(self, path: Path, on_fire: TimerCallback,
+                 on_prepare: Optional[TimerCallback] = None, prepare_lead: float = 30.0,
+                 accept: Optional[Callable[["TimerEntry"], bool]] = None):
+        self.on_fire = on_fire
+        self.on_prepare = on_prepare
+        self.prepare_lead = prepare_lead
+        self.accept = accept
+
+        self._log = AppendLog(path, key='timer_id', flush_delay=0.5, durable=True)
+        self._timers: Dict[str, TimerEntry] = {}
+        self._fire_heap: List[Tuple[float, int, str]] = []
+        self._prepare_heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+        self.fired = 0
+        self.cancelled = 0
+        self.prepared = 0
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    async def start(self) -> int:
+        """Carrega os timers salvos e inicia a task de disparo.
+
+        Returns:
+            int: Quantos timers pendentes foram restaurados
+        """
+        for timer_id, record in (await self._log.load_async()).items():
+            try:
+                entry = TimerEntry(timer_id=timer_id, **record)
+            except TypeError:
+                continue
+            if self.accept is None or self.accept(entry):
+                self._push(entry)
+        self._task = asyncio.create_task(self._run())
+        return len(self._timers)
+
+    def stop(self) -> None:
+        """Para a task de disparo e grava o que estiver pendente."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._log.flush()
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def schedule(self, guild_id: int, channel_id: int, user_id: int, user_name: str,
+                 query: str, delay: float) -> TimerEntry:
+        """Cria e persiste um timer que dispara daqui a `delay` segundos."""
+        timer_id = secrets.token_hex(3)
+        while timer_id in self._timers:
+            timer_id = secrets.token_hex(3)
+        entry = TimerEntry(timer_id, guild_id, channel_id, user_id, user_name, query, time.time() + delay)
+        self._push(entry)
+        self._log.append(timer_id, entry.to_record())
+        return entry
+
+    def cancel(self, timer_id: str) -> Optional[TimerEntry]:
+        """Cancela um timer pendente (a entrada no heap é descartada depois)."""
+        entry = self._timers.pop(timer_id, None)
+        if entry is not None:
+            self.cancelled += 1
+            self._log.remove(timer_id)
+        return entry
+
+    def get(self, timer_id: str) -> Optional[TimerEntry]:
+        return self._timers.get(timer_id)
+
+    def pending(self, guild_id: Optional[int] = None, user_id: Optional[int] = None) -> List[TimerEntry]:
+        """Timers pendentes (filtrados por guild/usuário), do mais próximo ao mais distante."""
+        entries = [
+            e for e in self._timers.values()
+            if (guild_id is None or e.guild_id == guild_id) and (user_id is None or e.user_id == user_id)
+        ]
+        return sorted(entries, key=lambda e: e.fire_at)
+
+    # ------------------------------------------------------------------
+    # Heap e disparo
+    # ------------------------------------------------------------------
+
+    def _push(self, entry: TimerEntry) -> None:
+        self._timers[entry.timer_id] = entry
+        seq = next(self._seq)
+        heapq.heappush(self._fire_heap, (entry.fire_at, seq, entry.timer_id))
+        if self.on_prepare is not None:
+            heapq.heappush(self._prepare_heap, (entry.fire_at - self.prepare_lead, seq, entry.timer_id))
+        # Acorda a task se este timer vem antes do que ela estava esperando
+        if self._fire_heap[0][2] == entry.timer_id or (
+            self._prepare_heap and self._prepare_heap[0][2] == entry.timer_id
+        ):
+            self._wakeup.set()
+
+    def _next_due(self) -> Optional[float]:
+        # Entradas de timers cancelados são descartadas ao chegar no topo
+        for heap in (self._fire_heap, self._prepare_heap):
+            while heap and heap[0][2] not in self._timers:
+                heapq.heappop(heap)
+        times = [heap[0][0] for heap in (self._fire_heap, self._prepare_heap) if heap]
+        return min(times) if times else None
+
+    def _spawn(self, callback: TimerCallback, entry: TimerEntry) -> None:
+        task = asyncio.create_task(self._guarded(callback, entry))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    @staticmethod
+    async def _guarded(callback: TimerCallback, entry: TimerEntry) -> None:
+        try:
+            await callback(entry)
+        except Exception as e:
+            log.error("Erro no timer %s: %s", entry.timer_id, e)
+
+    async def _run(self) -> None:
+        while True:
+            due = self._next_due()
+            self._wakeup.clear()
+            timeout = None if due is None else max(0.0, due - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue  # Chegou um timer mais próximo: recalcula
+            except asyncio.TimeoutError:
+                pass
+
+            now = time.time()
+            while self._prepare_heap and self._prepare_heap[0][0] <= now:
+                _, _, timer_id = heapq.heappop(self._prepare_heap)
+                entry = self._timers.get(timer_id)
+                # Se já venceu (ex.: restaurado atrasado), o disparo resolve sozinho
+                if entry is not None and self.on_prepare is not None and entry.fire_at > now:
+                    self.prepared += 1
+                    self._spawn(self.on_prepare, entry)
+            while self._fire_heap and self._fire_heap[0][0] <= now:
+                _, _, timer_id = heapq.heappop(self._fire_heap)
+                entry = self._timers.pop(timer_id, None)
+                if entry is None:
+                    continue
+                self.fired += 1
+                self._log.remove(timer_id)
+                self._spawn(self.on_fire, entry)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        due = self._next_due()
+        return {
+            'pending': len(self._timers),
+            'next_in_s': round(max(0.0, due - time.time()), 1) if due is not None else None,
+            'fired': self.fired,
+            'cancelled': self.cancelled,
+            'prepared': self.prepared,
+        }
@@ -0,0 +1,127 @@
+"""
+Índice local de títulos já tocados, usado pelo autocomplete do `/musica`.
+
+Cada título é quebrado em trigramas de palavras (com preenchimento no início,
+para que prefixos curtos também casem). A busca conta quantos trigramas da
+consulta aparecem em cada candidato, o que tolera erros de digitação, e
+desempata pela popularidade. Tudo roda em memória; o disco só recebe as
+alterações incrementais via `AppendLog`.
+"""
+
+import heapq
+import math
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from core.appendlog import AppendLog
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e só com letras/números separados por espaço."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    cleaned = "".join(c if c.isalnum() else " " for c in stripped.casefold())
+    return " ".join(cleaned.split())
+
+
+def _trigrams(text: str, complete_last: bool = True) -> Set[str]:
+    """Trigramas das palavras de um texto já normalizado.
+
+    Cada palavra recebe dois espaços no início (casa prefixos) e um no fim;
+    na consulta, a última palavra pode estar incompleta, então fica sem o
+    espaço final (`complete_last=False`).
+    """
+    grams: Set[str] = set()
+    words = text.split()
+    for i, word in enumerate(words):
+        tail = " " if complete_last or i < len(words) - 1 else ""
+        padded = f"  {word}{tail}"
+        for j in range(len(padded) - 2):
+            grams.add(padded[j:j + 3])
+    return grams
+
+
+class TitleIndex:
+    """Índice em memória de títulos -> id do vídeo, persistido incrementalmente.
+
+    Args:
+        path (Path): Arquivo .jsonl do índice
+        min_score (float): Fração mínima de trigramas da consulta que precisa casar
+    """
+
+    def __init__(self, path: Path, min_score: float = 0.5):
+        self.min_score = min_score
+        self._log = AppendLog(path, key='video_id')
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def load_async(self) -> None:
+        records = await self._log.load_async()
+        for video_id, record in records.items():
+            self._insert(video_id, record)
+
+    def flush(self) -> None:
+        """Grava o que estiver pendente (usado no desligamento)."""
+        self._log.flush()
+
+    def _insert(self, video_id: str, record: Dict[str, Any]) -> None:
+        old = self._entries.get(video_id)
+        if old is not None and old['title'] != record['title']:
+            for gram in _trigrams(normalize(old['title'])):
+                bucket = self._grams.get(gram)
+                if bucket is not None:
+                    bucket.discard(video_id)
+        self._entries[video_id] = record
+        if old is None or old['title'] != record['title']:
+            for gram in _trigrams(normalize(record['title'])):
+                self._grams.setdefault(gram, set()).add(video_id)
+
+    def record_play(self, video_id: str, title: str, duration: Any = None) -> None:
+        """Registra (ou atualiza) um título tocado e agenda a gravação incremental."""
+        if not video_id or not title:
+            return
+        old = self._entries.get(video_id)
+        record = {
+            'title': title,
+            'duration': duration if duration is not None else (old or {}).get('duration'),
+            'plays': (old or {}).get('plays', 0) + 1,
+            'last': int(time.time()),
+        }
+        self._insert(video_id, record)
+        self._log.append(video_id, record)
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(video_id)
+
+    def search(self, query: str, limit: int = 25) -> List[Dict[str, Any]]:
+        """Retorna até `limit` títulos que casam com a consulta (só dados locais).
+
+        Consulta vazia devolve os mais tocados.
+        """
+        q = normalize(query)
+        if not q:
+            top = heapq.nlargest(limit, self._entries.items(), key=lambda kv: (kv[1]['plays'], kv[1]['last']))
+            return [{'video_id': vid, **rec} for vid, rec in top]
+
+        grams = _trigrams(q, complete_last=False)
+        counts: Dict[str, int] = {}
+        for gram in grams:
+            for video_id in self._grams.get(gram, ()):
+                counts[video_id] = counts.get(video_id, 0) + 1
+
+        needed = self.min_score * len(grams)
+        scored = []
+        for video_id, hits in counts.items():
+            if hits < needed:
+                continue
+            record = self._entries[video_id]
+            # Casamento domina; popularidade só desempata
+            score = hits / len(grams) + 0.02 * math.log1p(record['plays'])
+            scored.append((score, video_id))
+        best = heapq.nlargest(limit, scored)
+        return [{'video_id': vid, **self._entries[vid]} for _, vid in best]
@@ -0,0 +1,269 @@
+"""
+Rastreamento leve de pedidos, da interação até o primeiro pacote de áudio.
+
+Cada slash command ou operação do dashboard abre um `Trace` com um id curto.
+O trace fica num `ContextVar`, então as funções do caminho (defer, admissão,
+conexão de voz, Spotify, yt-dlp, FFmpeg) só chamam `span()` sem precisar
+receber nada por parâmetro; fora de um trace, `span()` não faz nada.
+
+O tempo até o primeiro áudio (TTFA) é marcado pela fonte de áudio, na thread
+do player, quando o primeiro quadro sai do FFmpeg. Por isso um trace que
+iniciou uma reprodução só é encerrado quando esse quadro chega (ou quando o
+prazo estoura), mesmo que o comando já tenha respondido.
+"""
+
+import asyncio
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from core.appendlog import AppendLog
+from core.stats import percentile
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("cababot_trace", default=None)
+
+
+class Trace:
+    """Um pedido rastreado: spans com início relativo e duração, em ms.
+
+    Criado pelo `Tracer.trace()`; não instancie direto.
+    """
+
+    # Playlists do Spotify abrem um span por faixa: o resto só é contado
+    MAX_SPANS = 64
+
+    def __init__(self, tracer: "Tracer", kind: str, guild_id: Optional[int], attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = secrets.token_hex(4)
+        self.kind = kind
+        self.guild_id = guild_id
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.events: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.total_ms: Optional[float] = None
+        self.ttfa_ms: Optional[float] = None
+        self.closed = False
+        self.finished = False
+        self._t0 = time.perf_counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._audio_requested: Optional[float] = None
+        self._first_audio: Optional[float] = None
+
+    def _ms(self, at: float) -> float:
+        return round((at - self._t0) * 1000, 1)
+
+    def add_span(self, name: str, start: float, end: float, **attrs: Any) -> None:
+        """Registra um span já medido (instantes de `time.perf_counter()`)."""
+        if self.finished:
+            return
+        if len(self.spans) >= self.MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append({'name': name, 'start_ms': self._ms(start), 'ms': round((end - start) * 1000, 1), **attrs})
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """Mede o bloco; o dict devolvido aceita atributos definidos lá dentro."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs['error'] = type(e).__name__
+            raise
+        finally:
+            self.add_span(name, start, time.perf_counter(), **attrs)
+
+    def event(self, name: str, **attrs: Any) -> None:
+        """Marca um instante (ex.: acerto de cache) sem duração."""
+        if not self.finished:
+            self.events.append({'name': name, 'at_ms': self._ms(time.perf_counter()), **attrs})
+
+    def expect_audio(self) -> None:
+        """Avisa que este pedido vai iniciar uma reprodução (o trace espera o TTFA)."""
+        if self._audio_requested is None and not self.closed:
+            self._audio_requested = time.perf_counter()
+
+    def first_audio(self) -> None:
+        """Primeiro quadro de áudio entregue. Chamado da thread do player."""
+        if self._first_audio is not None or self._audio_requested is None or self._loop is None:
+            return
+        self._first_audio = time.perf_counter()
+        try:
+            self._loop.call_soon_threadsafe(self.tracer._audio_started, self)
+        except RuntimeError:
+            pass  # Loop já encerrado (desligamento)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma serializável (JSON) para o dashboard e para o arquivo exportado."""
+        data: Dict[str, Any] = {
+            'trace_id': self.trace_id,
+            'kind': self.kind,
+            'guild_id': str(self.guild_id) if self.guild_id is not None else None,
+            'started_at': round(self.started_at, 3),
+            'status': self.status,
+            'total_ms': self.total_ms,
+            'ttfa_ms': self.ttfa_ms,
+            'spans': self.spans,
+        }
+        if self.events:
+            data['events'] = self.events
+        if self.attrs:
+            data['attrs'] = self.attrs
+        if self.error:
+            data['error'] = self.error
+        if self.dropped:
+            data['dropped_spans'] = self.dropped
+        return data
+
+
+class Tracer:
+    """Abre traces, guarda os últimos de cada guild e exporta os encerrados.
+
+    Args:
+        export_path (Path | None): Arquivo .jsonl onde cada trace encerrado vira
+            uma linha (None desliga a exportação)
+        per_guild (int): Traces mantidos em memória por guild
+        audio_timeout (float): Espera máxima (s) pelo primeiro áudio depois que
+            o comando termina; estourou, o trace fecha com status "no_audio"
+    """
+
+    def __init__(self, export_path: Optional[Path] = None, per_guild: int = 50, audio_timeout: float = 30.0):
+        self.per_guild = per_guild
+        self.audio_timeout = audio_timeout
+        self._log = AppendLog(export_path, key="trace_id", flush_delay=1.0) if export_path else None
+        self._recent: Dict[Optional[int], Deque[Dict[str, Any]]] = {}
+        self._pending: Dict[str, Tuple[Trace, asyncio.TimerHandle]] = {}
+        self._ttfa: Deque[float] = deque(maxlen=256)
+        self.finished = 0
+        self.errors = 0
+        self.no_audio = 0
+
+    @contextmanager
+    def trace(self, kind: str, guild_id: Any = None, **attrs: Any) -> Iterator[Trace]:
+        """Abre um trace para o bloco e o torna o trace corrente do contexto."""
+        try:
+            guild_id = int(guild_id) if guild_id is not None else None
+        except (TypeError, ValueError):
+            guild_id = None
+        trace = Trace(self, kind, guild_id, attrs)
+        try:
+            trace._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        token = _current.set(trace)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.status = "error"
+            trace.error = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            _current.reset(token)
+            self._close(trace)
+
+    def _close(self, trace: Trace) -> None:
+        trace.closed = True
+        trace.total_ms = trace._ms(time.perf_counter())
+        if trace._audio_requested is None or trace._first_audio is not None or trace._loop is None:
+            # `_audio_started` já pode estar agendado; quem chegar primeiro encerra
+            self._finish(trace)
+            return
+        handle = trace._loop.call_later(self.audio_timeout, self._expire, trace)
+        self._pending[trace.trace_id] = (trace, handle)
+
+    def _audio_started(self, trace: Trace) -> None:
+        if trace.finished or trace._first_audio is None or trace._audio_requested is None:
+            return
+        # Do play() ao primeiro quadro: spawn do FFmpeg terminando, conexão com
+        # a CDN e o atraso de partida do filtro loudnorm
+        trace.add_span("ffmpeg_warmup", trace._audio_requested, trace._first_audio)
+        trace.ttfa_ms = trace._ms(trace._first_audio)
+        self._ttfa.append(trace.ttfa_ms)
+        if trace.closed:
+            pending = self._pending.pop(trace.trace_id, None)
+            if pending is not None:
+                pending[1].cancel()
+            self._finish(trace)
+
+    def _expire(self, trace: Trace) -> None:
+        self._pending.pop(trace.trace_id, None)
+        if trace.status == "ok":
+            trace.status = "no_audio"
+        self.no_audio += 1
+        self._finish(trace)
+
+    def _finish(self, trace: Trace) -> None:
+        if trace.finished:
+            return
+        if trace._first_audio is not None and trace.ttfa_ms is None:
+            self._audio_started(trace)
+            return
+        trace.finished = True
+        self.finished += 1
+        if trace.status == "error":
+            self.errors += 1
+        record = trace.to_dict()
+        recent = self._recent.get(trace.guild_id)
+        if recent is None:
+            recent = self._recent[trace.guild_id] = deque(maxlen=self.per_guild)
+        recent.append(record)
+        if self._log is not None:
+            self._log.append(trace.trace_id, {k: v for k, v in record.items() if k != 'trace_id'})
+
+    def recent(self, guild_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+        """Últimos traces encerrados de uma guild, do mais novo para o mais velho."""
+        records = self._recent.get(guild_id) or ()
+        return list(records)[::-1][:limit]
+
+    def close(self) -> None:
+        """Encerra os traces que ainda esperam áudio e grava o que estiver pendente."""
+        pending = list(self._pending.values())
+        self._pending.clear()
+        for trace, handle in pending:
+            handle.cancel()
+            self._finish(trace)
+        if self._log is not None:
+            self._log.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        return {
+            'finished': self.finished,
+            'errors': self.errors,
+            'no_audio': self.no_audio,
+            'awaiting_audio': len(self._pending),
+            'ttfa_p50_ms': round(percentile(self._ttfa, 50), 1),
+            'ttfa_p95_ms': round(percentile(self._ttfa, 95), 1),
+            'exporting': self._log is not None,
+        }
+
+
+def current() -> Optional[Trace]:
+    """Trace do pedido em andamento neste contexto (None fora de um trace)."""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """`Trace.span` no trace corrente; sem trace, só executa o bloco."""
+    trace = _current.get()
+    if trace is None:
+        yield attrs
+        return
+    with trace.span(name, **attrs) as span_attrs:
+        yield span_attrs
+
+
+def event(name: str, **attrs: Any) -> None:
+    """`Trace.event` no trace corrente; sem trace, não faz nada."""
+    trace = _current.get()
+    if trace is not None:
+        trace.event(name, **attrs)
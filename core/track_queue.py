@@ -0,0 +1,187 @@
+"""
+Fila de faixas de uma guild com índice pelo ID do vídeo.
+
+A fila continua sendo uma sequência (o player tira do começo, o loop da fila
+devolve no fim, o `/voltar` insere no começo, o dashboard remove por posição),
+mas cada inserção e remoção também atualiza um índice da chave canônica da
+faixa (o ID do vídeo, ou a URL quando não há ID) para as entradas com ela.
+Com isso "essa música já está na fila?" e "tira essa música" não precisam
+percorrer milhares de entradas.
+
+`version` muda a cada alteração, para quem guarda algo derivado da fila
+(snapshots, páginas do `/fila`) saber quando o que guardou ficou velho.
+"""
+
+from collections.abc import MutableSequence
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.title_index import normalize
+
+
+def track_key(track: Any) -> Optional[str]:
+    """Chave canônica de uma faixa: o ID do vídeo ou, sem ele, a URL."""
+    return getattr(track, 'video_id', None) or getattr(track, 'url', None) or None
+
+
+class TrackQueue(MutableSequence):
+    """Lista de faixas com índice chave -> entradas.
+
+    Args:
+        tracks (Iterable): Faixas iniciais, na ordem
+        key (Callable): Extrai a chave canônica de uma faixa (None = não indexa)
+    """
+
+    def __init__(self, tracks: Iterable[Any] = (), key: Callable[[Any], Optional[str]] = track_key):
+        self._key = key
+        self._items: List[Any] = []
+        # Chave -> entradas com ela (a mesma faixa pode aparecer mais de uma vez)
+        self._index: Dict[str, List[Any]] = {}
+        # Títulos normalizados para a busca (limpo quando cresce demais)
+        self._folded: Dict[str, str] = {}
+        self.version = 0
+        self.extend(tracks)
+
+    # ------------------------------------------------------------------
+    # Índice
+    # ------------------------------------------------------------------
+
+    def _add(self, track: Any) -> None:
+        key = self._key(track)
+        if key is not None:
+            self._index.setdefault(key, []).append(track)
+
+    def _discard(self, track: Any) -> None:
+        key = self._key(track)
+        entries = self._index.get(key) if key is not None else None
+        if not entries:
+            return
+        for i, entry in enumerate(entries):
+            if entry is track:
+                del entries[i]
+                break
+        if not entries:
+            del self._index[key]
+
+    # ------------------------------------------------------------------
+    # Sequência
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, index):
+        # Fatias devolvem lista comum (cópia), como antes
+        return self._items[index]
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            old = self._items[index]
+            value = list(value)
+            self._items[index] = value
+            for track in old:
+                self._discard(track)
+            for track in value:
+                self._add(track)
+        else:
+            self._discard(self._items[index])
+            self._items[index] = value
+            self._add(value)
+        self.version += 1
+
+    def __delitem__(self, index) -> None:
+        old = self._items[index]
+        del self._items[index]
+        for track in (old if isinstance(index, slice) else (old,)):
+            self._discard(track)
+        self.version += 1
+
+    def insert(self, index: int, value: Any) -> None:
+        self._items.insert(index, value)
+        self._add(value)
+        self.version += 1
+
+    def append(self, value: Any) -> None:
+        self._items.append(value)
+        self._add(value)
+        self.version += 1
+
+    def extend(self, values: Iterable[Any]) -> None:
+        for value in values:
+            self._items.append(value)
+            self._add(value)
+        self.version += 1
+
+    def pop(self, index: int = -1) -> Any:
+        track = self._items.pop(index)
+        self._discard(track)
+        self.version += 1
+        return track
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._index.clear()
+        self._folded.clear()
+        self.version += 1
+
+    def __repr__(self) -> str:
+        return f"TrackQueue({self._items!r})"
+
+    # ------------------------------------------------------------------
+    # Consultas pela chave
+    # ------------------------------------------------------------------
+
+    def has(self, key: Optional[str]) -> bool:
+        """True se alguma entrada da fila tem essa chave. O(1)."""
+        return key is not None and key in self._index
+
+    def has_track(self, track: Any) -> bool:
+        """True se a fila já tem uma entrada com a mesma chave de `track`."""
+        return self.has(self._key(track))
+
+    def count_key(self, key: Optional[str]) -> int:
+        """Quantas entradas têm essa chave. O(1)."""
+        return len(self._index.get(key, ())) if key is not None else 0
+
+    def entries(self, key: Optional[str]) -> List[Any]:
+        """Entradas com essa chave (ordem de inserção, não de posição)."""
+        return list(self._index.get(key, ())) if key is not None else []
+
+    def remove_key(self, key: Optional[str]) -> int:
+        """Remove todas as entradas com essa chave; devolve quantas saíram.
+
+        Sem a chave no índice não percorre nada; com ela, uma passada só.
+        """
+        entries = self._index.pop(key, None) if key is not None else None
+        if not entries:
+            return 0
+        doomed = {id(track) for track in entries}
+        self._items = [track for track in self._items if id(track) not in doomed]
+        self.version += 1
+        return len(entries)
+
+    def search(self, term: str, limit: int = 10) -> List[Tuple[int, Any]]:
+        """(posição, faixa) das primeiras entradas cujo título contém `term`.
+
+        A comparação ignora maiúsculas e acentos; títulos normalizados ficam
+        guardados, então buscas seguidas (autocomplete) só comparam strings.
+        """
+        needle = normalize(term)
+        if not needle:
+            return []
+        folded = self._folded
+        if len(folded) > 4 * len(self._items) + 64:
+            folded.clear()
+        matches: List[Tuple[int, Any]] = []
+        for position, track in enumerate(self._items):
+            title = track.title
+            text = folded.get(title)
+            if text is None:
+                text = folded[title] = normalize(title)
+            if needle in text:
+                matches.append((position, track))
+                if len(matches) >= limit:
+                    break
+        return matches
@@ -0,0 +1,69 @@
+"""
+Conexões de voz: um handshake por vez em cada guild e o tempo de cada um.
+
+O handshake de voz (gateway de voz + descoberta de IP + UDP) é a parte mais
+lenta de começar a tocar numa call nova. Dois `/musica` simultâneos na mesma
+guild não podem disparar dois handshakes, então quem chega depois espera o
+lock da guild e reaproveita a conexão que o primeiro abriu. Os tempos de
+conexão, troca de canal e reconexão ficam separados por tipo.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator
+
+from core.stats import percentile
+
+ACTIONS = ("connect", "move", "reconnect")
+
+
+class VoiceConnections:
+    """Locks de conexão por guild e latência dos handshakes de voz.
+
+    Args:
+        history (int): Medições mantidas por tipo de ação
+    """
+
+    def __init__(self, history: int = 256):
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._times: Dict[str, Deque[float]] = {action: deque(maxlen=history) for action in ACTIONS}
+        self._counts: Dict[str, int] = {action: 0 for action in ACTIONS}
+        self._failures: Dict[str, int] = {action: 0 for action in ACTIONS}
+        self.reused = 0
+        self.waited = 0
+
+    def lock(self, guild_id: int) -> asyncio.Lock:
+        """Lock que serializa conexões e trocas de canal na guild."""
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = self._locks[guild_id] = asyncio.Lock()
+        elif lock.locked():
+            # Outro comando está conectando agora: este vai reaproveitar a conexão
+            self.waited += 1
+        return lock
+
+    @contextmanager
+    def measure(self, action: str) -> Iterator[None]:
+        """Mede um handshake (`connect`, `move` ou `reconnect`); falhas só são contadas."""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self._failures[action] += 1
+            raise
+        self._counts[action] += 1
+        self._times[action].append(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo serializável (JSON) para o dashboard."""
+        actions = {}
+        for action, times in self._times.items():
+            actions[action] = {
+                'count': self._counts[action],
+                'failed': self._failures[action],
+                'p50_ms': round(percentile(times, 50) * 1000, 1),
+                'p95_ms': round(percentile(times, 95) * 1000, 1),
+            }
+        return {'reused': self.reused, 'waited': self.waited, **actions}
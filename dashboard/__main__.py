@@ -0,0 +1,46 @@
+"""
+Dashboard fora do processo do bot: `python -m dashboard`.
+
+Serve o HTTP e os templates aqui e conversa com o bot pelo canal IPC local,
+então navegadores e requisições pesadas não disputam o event loop que cuida
+do áudio. O bot precisa estar com `DASHBOARD_MODE=ipc` (ou `process`, em que
+ele mesmo sobe este processo).
+"""
+
+import asyncio
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv, find_dotenv
+
+from core.ipc import IpcClient
+from core.logs import LogPipeline
+from core.settings import env_flag
+from dashboard.server import WebServer
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+
+def ipc_path() -> Path:
+    """Socket do bot (mesma regra de `CabaBot.py`)."""
+    data_dir = Path(os.getenv("CABABOT_DATA_DIR") or (SCRIPT_DIR / "data"))
+    return Path(os.getenv("DASHBOARD_IPC_PATH") or (data_dir / "dashboard.sock"))
+
+
+async def main() -> None:
+    load_dotenv(find_dotenv())
+    LogPipeline(level=os.getenv("LOG_LEVEL", "INFO"), levels=os.getenv("LOG_LEVELS", "")).start()
+    client = IpcClient(ipc_path(), port=int(os.getenv("DASHBOARD_IPC_PORT", "8790")))
+    runner = await WebServer(client, trust_forwarded=env_flag("DASHBOARD_TRUST_FORWARDED")).start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,231 @@
+"""
+Operações do dashboard sobre o estado do bot.
+
+Roda sempre dentro do processo do bot. O `WebServer` chama estas operações
+direto (modo embutido) ou através do canal IPC (`python -m dashboard`), então
+o HTTP, os templates e o navegador podem ficar em outro processo.
+"""
+
+import asyncio
+import inspect
+import logging
+import math
+from typing import Any, Dict, List, Set
+
+import discord
+
+from core.ipc import IpcError
+from core.settings import env_float
+
+log = logging.getLogger("cababot.dashboard")
+
+# Operações que mexem na reprodução: cada chamada vira um trace da guild
+_TRACED_OPS = ('queue_add', 'queue_remove', 'control')
+
+# Quanto (s) o `queue_add` espera pelo resultado. Playlists e coleções do
+# Spotify podem levar mais que o timeout do IPC; passado esse tempo o pedido
+# segue em segundo plano e a resposta só diz que foi aceito.
+QUEUE_ADD_WAIT = env_float("DASHBOARD_QUEUE_ADD_WAIT", 8.0)
+
+
+class DashboardAPI:
+    """Expõe o estado do bot em respostas JSON compactas.
+
+    Args:
+        bot: Instância do `CabaBot`
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Adições que passaram do QUEUE_ADD_WAIT e continuam rodando
+        self._background: Set[asyncio.Task] = set()
+        self._ops = {
+            'info': self.info,
+            'status': self.status,
+            'metrics': self.metrics,
+            'shard': self.shard,
+            'history': self.history,
+            'queue_add': self.queue_add,
+            'queue_remove': self.queue_remove,
+            'control': self.control,
+            'traces': self.traces,
+        }
+
+    async def call(self, op: str, **args: Any) -> Any:
+        """Executa uma operação pelo nome (mesma interface do `IpcClient`)."""
+        handler = self._ops.get(op)
+        if handler is None:
+            raise IpcError(f"Unknown operation: {op}", 404)
+        try:
+            inspect.signature(handler).bind(**args)
+        except TypeError as e:
+            raise IpcError(f"Invalid arguments for {op}: {e}", 400) from e
+        tracer = getattr(self.bot, 'tracer', None)
+        if op not in _TRACED_OPS or tracer is None:
+            return await handler(**args)
+        with tracer.trace(f"dashboard:{op}", guild_id=args.get('guild_id'), **self._trace_attrs(args)) as trace:
+            result = await handler(**args)
+        return {**result, 'trace_id': trace.trace_id}
+
+    @staticmethod
+    def _trace_attrs(args: Dict[str, Any]) -> Dict[str, Any]:
+        attrs = {}
+        if args.get('action'):
+            attrs['action'] = args['action']
+        if args.get('client'):
+            attrs['client'] = args['client']
+        return attrs
+
+    def _guild(self, guild_id: Any) -> discord.Guild:
+        try:
+            guild = self.bot.get_guild(int(guild_id))
+        except (TypeError, ValueError):
+            raise IpcError("Invalid Guild ID", 400)
+        if guild is None:
+            raise IpcError("Guild not found", 404)
+        return guild
+
+    async def info(self) -> Dict[str, Any]:
+        return {'bot_name': self.bot.user.name if self.bot.user else "CabaBot"}
+
+    async def status(self) -> List[Dict[str, Any]]:
+        """Estado atual do bot (música tocando, fila, etc) por guild."""
+        status = []
+        for guild in self.bot.guilds:
+            voice_client = guild.voice_client
+            track = self.bot.current_track.get(guild.id)
+            queue = self.bot.music_queue.get(guild.id, [])
+
+            status.append({
+                'id': str(guild.id),
+                'name': guild.name,
+                'is_playing': voice_client.is_playing() if voice_client else False,
+                'is_paused': voice_client.is_paused() if voice_client else False,
+                'current_track': {
+                    'title': track.title,
+                    'requester': track.requester
+                } if track else None,
+                'audio_profile': getattr(self.bot.audio_sources.get(guild.id), 'profile', None),
+                'queue_count': len(queue),
+                'queue': [{'title': t.title, 'requester': t.requester} for t in queue],
+                'has_history': bool(self.bot.music_history.get(guild.id))
+            })
+        return status
+
+    async def metrics(self) -> Dict[str, Any]:
+        """Métricas internas do bot (lag do event loop, bloqueios, etc)."""
+        metrics = {}
+        for name in ('loop_monitor', 'admission', 'extraction', 'extraction_chain', 'stream_cache', 'spotify', 'startup', 'ipc', 'timers', 'tracer', 'logs', 'ffmpeg', 'audio', 'voice'):
+            component = getattr(self.bot, name, None)
+            if component is not None and hasattr(component, 'snapshot'):
+                metrics['loop' if name == 'loop_monitor' else name] = component.snapshot()
+        return metrics
+
+    async def shard(self) -> Dict[str, Any]:
+        """Resumo dos shards deste processo (lido pelo coordenador de shards)."""
+        sharding = getattr(self.bot, 'sharding', None)
+        shards = []
+        for shard_id, shard in (getattr(self.bot, 'shards', None) or {}).items():
+            shards.append({
+                'id': shard_id,
+                'latency_ms': round(shard.latency * 1000, 1) if math.isfinite(shard.latency) else None,
+                'closed': shard.is_closed(),
+            })
+        return {
+            'group': sharding.group if sharding else 0,
+            'shard_count': getattr(self.bot, 'shard_count', None),
+            'shards': shards,
+            'guilds': len(self.bot.guilds),
+            'voice_clients': len(self.bot.voice_clients),
+            'playing': sum(1 for vc in self.bot.voice_clients if getattr(vc, 'is_playing', lambda: False)()),
+        }
+
+    async def history(self, guild_id: int, limit: int = 10) -> Dict[str, Any]:
+        """Mais tocadas e tocadas recentemente de uma guild."""
+        limit = min(int(limit), 100)
+        top = await self.bot.history.most_played(int(guild_id), limit=limit)
+        recent = await self.bot.history.recently_played(int(guild_id), limit=limit)
+        return {'most_played': top, 'recently_played': recent}
+
+    async def traces(self, guild_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+        """Últimos traces de uma guild (do mais novo para o mais velho)."""
+        return self.bot.tracer.recent(int(guild_id), limit=min(int(limit), 100))
+
+    async def queue_add(self, guild_id: int, query: str, client: str = "") -> Dict[str, Any]:
+        if not query:
+            raise IpcError("Invalid Data", 400)
+        guild = self._guild(guild_id)
+
+        # Controle de admissão por guild e por cliente do dashboard (IP)
+        admission = self.bot.admission.check(
+            guild.id, f"dashboard:{client}", self.bot.extraction_cost(query)
+        )
+        if not admission.allowed:
+            if not math.isfinite(admission.retry_after):
+                # Taxa 0: limite atingido sem previsão de liberar (sem Retry-After)
+                raise IpcError("⏳ Limite de pedidos atingido.", 429)
+            retry = math.ceil(admission.retry_after)
+            raise IpcError(f"⏳ Muitos pedidos — tenta de novo em {retry}s.", 429, {'retry_after': retry})
+
+        # Usa channel_id 0 ou tenta pegar o último usado
+        channel_id = 0
+        if guild.id in self.bot.last_player_message:
+            try:
+                channel_id = self.bot.last_player_message[guild.id].channel.id
+            except Exception:
+                pass
+
+        task = asyncio.ensure_future(self._add(guild, query, channel_id, admission.wait))
+        try:
+            res = await asyncio.wait_for(asyncio.shield(task), QUEUE_ADD_WAIT)
+        except asyncio.TimeoutError:
+            self._background.add(task)
+            task.add_done_callback(self._background_done)
+            return {'message': "⏳ Pedido aceito — as músicas vão entrando na fila aos poucos."}
+        return {'message': res}
+
+    async def _add(self, guild: discord.Guild, query: str, channel_id: int, wait: float) -> str:
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return await self.bot.add_track_to_guild(guild, query, 0, "Dashboard User", channel_id)
+
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            log.error("Erro ao adicionar pelo dashboard: %s", error)
+        else:
+            log.info("Adição pelo dashboard concluída: %s", task.result())
+
+    async def queue_remove(self, guild_id: int, index: int) -> Dict[str, Any]:
+        guild_id = int(guild_id)
+        if guild_id in self.bot.music_queue:
+            try:
+                self.bot.music_queue[guild_id].pop(int(index))
+            except IndexError:
+                raise IpcError("Index out of bounds", 400)
+        return {'status': 'ok'}
+
+    async def control(self, action: str, guild_id: int) -> Dict[str, Any]:
+        """Comandos da interface web (pause, skip, stop, previous)."""
+        guild = self._guild(guild_id)
+        vc = guild.voice_client
+        if not vc or not isinstance(vc, discord.VoiceClient):
+            raise IpcError("Not connected to voice", 400)
+
+        if action == 'pause':
+            if vc.is_playing(): vc.pause()
+            elif vc.is_paused(): vc.resume()
+        elif action == 'skip':
+            vc.stop()
+        elif action == 'previous':
+            await self.bot.play_previous_track(guild)
+        elif action == 'stop':
+            # Limpa fila
+            if guild.id in self.bot.music_queue:
+                self.bot.music_queue[guild.id].clear()
+            vc.stop()
+
+        return {'status': 'ok'}
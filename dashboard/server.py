@@ -1,17 +1,30 @@
 from aiohttp import web
 import aiohttp_jinja2
 import jinja2
+import logging
 import os
-import asyncio
-import discord
+
+from core.ipc import IpcError
+
+log = logging.getLogger("cababot.dashboard")
+
 
 class WebServer:
-    def __init__(self, bot):
-        self.bot = bot
+    """Servidor HTTP do dashboard.
+
+    Só cuida de HTTP e templates; o estado do bot vem do `backend`, que é o
+    `DashboardAPI` (mesmo processo) ou um `IpcClient` (processo separado).
+    Com `trust_forwarded`, pedidos vindos do loopback usam o IP do
+    `X-Forwarded-For` (posto pelo coordenador de shards ou por um proxy).
+    """
+
+    def __init__(self, backend, trust_forwarded: bool = False):
+        self.backend = backend
+        self.trust_forwarded = trust_forwarded
         self.app = web.Application()
         self.routes = web.RouteTableDef()
         self._setup_routes()
-        
+
         # Configura templates
         template_path = os.path.join(os.path.dirname(__file__), 'templates')
         aiohttp_jinja2.setup(self.app, loader=jinja2.FileSystemLoader(template_path))
@@ -19,41 +32,62 @@ class WebServer:
     def _setup_routes(self):
         self.app.router.add_get('/', self.handle_index)
         self.app.router.add_get('/api/status', self.handle_status)
+        self.app.router.add_get('/api/metrics', self.handle_metrics)
+        self.app.router.add_get('/api/shard', self.handle_shard)
+        self.app.router.add_get('/api/history/{guild_id}', self.handle_history)
+        self.app.router.add_get('/api/traces/{guild_id}', self.handle_traces)
         self.app.router.add_post('/api/control/{action}', self.handle_control)
         self.app.router.add_post('/api/queue/add', self.handle_add_queue)
         self.app.router.add_post('/api/queue/remove', self.handle_remove_queue)
         self.app.router.add_static('/static/', path=os.path.join(os.path.dirname(__file__), 'static'), name='static')
 
-    @aiohttp_jinja2.template('index.html')
+    async def _call(self, op, **args):
+        """Chama o backend e converte erros em respostas HTTP."""
+        try:
+            return web.json_response(await self.backend.call(op, **args))
+        except IpcError as e:
+            if e.status == 429:
+                retry = e.data.get('retry_after')
+                headers = {'Retry-After': str(retry)} if retry is not None else None
+                return web.json_response({'message': str(e)}, status=429, headers=headers)
+            return web.Response(status=e.status, text=str(e))
+
     async def handle_index(self, request):
-        return {'bot_name': self.bot.user.name if self.bot.user else "CabaBot"}
+        try:
+            info = await self.backend.call('info')
+        except IpcError:
+            info = {'bot_name': "CabaBot"}
+        return aiohttp_jinja2.render_template('index.html', request, info)
 
     async def handle_status(self, request):
         """Retorna o estado atual do bot (música tocando, fila, etc)."""
-        status = []
-        for guild in self.bot.guilds:
-            voice_client = guild.voice_client
-            track = self.bot.current_track.get(guild.id)
-            queue = self.bot.music_queue.get(guild.id, [])
-            
-            queue_data = [{'title': t.title, 'requester': t.requester} for t in queue]
-            
-            guild_data = {
-                'id': str(guild.id),
-                'name': guild.name,
-                'is_playing': voice_client.is_playing() if voice_client else False,
-                'is_paused': voice_client.is_paused() if voice_client else False,
-                'current_track': {
-                    'title': track.title,
-                    'requester': track.requester
-                } if track else None,
-                'queue_count': len(queue),
-                'queue': queue_data,
-                'has_history': bool(self.bot.music_history.get(guild.id))
-            }
-            status.append(guild_data)
-        
-        return web.json_response(status)
+        return await self._call('status')
+
+    async def handle_metrics(self, request):
+        """Retorna métricas internas do bot (lag do event loop, bloqueios, etc)."""
+        return await self._call('metrics')
+
+    async def handle_shard(self, request):
+        """Resumo dos shards deste processo (lido pelo coordenador de shards)."""
+        return await self._call('shard')
+
+    async def handle_history(self, request):
+        """Retorna as mais tocadas e as tocadas recentemente de uma guild."""
+        try:
+            guild_id = int(request.match_info['guild_id'])
+            limit = min(int(request.query.get('limit', 10)), 100)
+        except (ValueError, TypeError):
+            return web.Response(status=400, text="Invalid Guild ID")
+        return await self._call('history', guild_id=guild_id, limit=limit)
+
+    async def handle_traces(self, request):
+        """Retorna os últimos traces (etapas e tempo até o primeiro áudio) de uma guild."""
+        try:
+            guild_id = int(request.match_info['guild_id'])
+            limit = min(int(request.query.get('limit', 20)), 100)
+        except (ValueError, TypeError):
+            return web.Response(status=400, text="Invalid Guild ID")
+        return await self._call('traces', guild_id=guild_id, limit=limit)
 
     async def handle_add_queue(self, request):
         try:
@@ -62,19 +96,15 @@ class WebServer:
             query = data.get('query')
         except (ValueError, TypeError):
             return web.Response(status=400, text="Invalid Data")
+        if not query:
+            return web.Response(status=400, text="Invalid Data")
 
-        guild = self.bot.get_guild(guild_id)
-        if not guild: return web.Response(status=404, text="Guild not found")
-
-        # Usa channel_id 0 ou tenta pegar o último usado
-        channel_id = 0
-        if guild.id in self.bot.last_player_message:
-            try:
-                channel_id = self.bot.last_player_message[guild.id].channel.id
-            except: pass
-
-        res = await self.bot.add_track_to_guild(guild, query, 0, "Dashboard User", channel_id)
-        return web.json_response({'message': res})
+        # Atrás do coordenador de shards, o IP real vem no X-Forwarded-For;
+        # sem ele o header é do próprio cliente e não pode furar a admissão
+        client = request.remote
+        if self.trust_forwarded and client in ('127.0.0.1', '::1'):
+            client = request.headers.get('X-Forwarded-For') or client
+        return await self._call('queue_add', guild_id=guild_id, query=query, client=client or "")
 
     async def handle_remove_queue(self, request):
         try:
@@ -83,13 +113,7 @@ class WebServer:
             index = int(data.get('index'))
         except (ValueError, TypeError):
              return web.Response(status=400, text="Invalid Data")
-
-        if guild_id in self.bot.music_queue:
-            try:
-                self.bot.music_queue[guild_id].pop(index)
-            except IndexError:
-                return web.Response(status=400, text="Index out of bounds")
-        return web.json_response({'status': 'ok'})
+        return await self._call('queue_remove', guild_id=guild_id, index=index)
 
     async def handle_control(self, request):
         """Recebe comandos da interface web (pause, skip, stop, previous)."""
@@ -99,34 +123,15 @@ class WebServer:
             guild_id = int(data.get('guild_id'))
         except (ValueError, TypeError):
             return web.Response(status=400, text="Invalid Guild ID")
-        
-        guild = self.bot.get_guild(guild_id)
-        if not guild:
-            return web.Response(status=404, text="Guild not found")
-            
-        vc = guild.voice_client
-        if not vc or not isinstance(vc, discord.VoiceClient):
-             return web.Response(status=400, text="Not connected to voice")
-
-        if action == 'pause':
-            if vc.is_playing(): vc.pause()
-            elif vc.is_paused(): vc.resume()
-        elif action == 'skip':
-            vc.stop()
-        elif action == 'previous':
-            await self.bot.play_previous_track(guild)
-        elif action == 'stop':
-            # Limpa fila
-            if guild.id in self.bot.music_queue:
-                self.bot.music_queue[guild.id] = []
-            vc.stop()
-            
-        return web.json_response({'status': 'ok'})
+        return await self._call('control', action=action, guild_id=guild_id)
 
     async def start(self):
-        """Inicia o servidor web na porta 8080."""
+        """Inicia o servidor web (padrão: porta 8080; DASHBOARD_HOST/DASHBOARD_PORT)."""
+        host = os.getenv("DASHBOARD_HOST", "0.0.0.0")
+        port = int(os.getenv("DASHBOARD_PORT", "8080"))
         runner = web.AppRunner(self.app)
         await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', 8080)
+        site = web.TCPSite(runner, host, port)
         await site.start()
-        print("🌐 Dashboard rodando em http://localhost:8080")
+        log.info("🌐 Dashboard rodando em http://localhost:%d", port)
+        return runner
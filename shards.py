@@ -0,0 +1,300 @@
+"""
+Coordenador de shards do CabaBot.
+
+Sobe um processo do bot por grupo de shards (`SHARD_IDS`), reinicia os que
+caírem e serve o dashboard na porta pública, juntando o estado de todos os
+processos. Pedidos que mexem numa guild (controles, fila, histórico) são
+repassados ao processo dono do shard dela.
+
+Uso:
+    python shards.py --processes 4            # shards recomendados pelo Discord
+    python shards.py --processes 2 --shards 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from dotenv import load_dotenv, find_dotenv
+
+from core.appendlog import AppendLog
+from core.logs import LogPipeline
+from core.sharding import format_shard_ids, shard_for_guild, split_groups
+
+SCRIPT_DIR = Path(__file__).parent
+BOT_SCRIPT = SCRIPT_DIR / "CabaBot.py"
+
+log = logging.getLogger("cababot.shards")
+
+# Logs compartilhados entre os processos: {arquivo: campo-chave}
+SHARED_LOGS = {
+    "spotify_matches.jsonl": "spotify_id",
+    "title_index.jsonl": "video_id",
+    "guilds.jsonl": "guild_id",
+    "timers.jsonl": "timer_id",
+}
+
+
+async def recommended_shards(token: str) -> int:
+    """Pergunta ao Discord quantos shards a aplicação deve usar."""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"},
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return int(data["shards"])
+
+
+def compact_shared_logs(data_dir: Path) -> None:
+    """Compacta os logs compartilhados antes de subir os processos.
+
+    Com os processos no ar, nenhum deles reescreve esses arquivos.
+    """
+    for name, key in SHARED_LOGS.items():
+        path = data_dir / name
+        if path.exists():
+            AppendLog(path, key=key).load()
+
+
+class Worker:
+    """Um processo do bot cuidando de um grupo de shards."""
+
+    def __init__(self, group: int, shard_ids: List[int], shard_count: int, port: int):
+        self.group = group
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.port = port
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+        self.started_at = 0.0
+        self._stopping = False
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env.update({
+            "SHARD_COUNT": str(self.shard_count),
+            "SHARD_IDS": format_shard_ids(self.shard_ids),
+            "SHARD_GROUP": str(self.group),
+            # O dashboard de cada processo só é acessado pelo coordenador
+            "DASHBOARD_HOST": "127.0.0.1",
+            "DASHBOARD_PORT": str(self.port),
+            "CABABOT_COMPACT_LOGS": "false",
+            "PYTHONUNBUFFERED": "1",
+        })
+        return env
+
+    async def supervise(self) -> None:
+        """Mantém o processo no ar, com espera crescente entre reinícios."""
+        failures = 0
+        while not self._stopping:
+            self.started_at = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, str(BOT_SCRIPT), env=self._env(), cwd=str(SCRIPT_DIR)
+            )
+            log.info("🚀 Grupo %d (shards %s) pid=%d", self.group, format_shard_ids(self.shard_ids), self.process.pid)
+            code = await self.process.wait()
+            if self._stopping:
+                return
+            # Processo que ficou de pé um bom tempo zera a contagem de falhas
+            failures = 0 if time.monotonic() - self.started_at > 60 else failures + 1
+            delay = min(60, 2 ** failures)
+            self.restarts += 1
+            log.warning("⚠️ Grupo %d saiu com código %s; reiniciando em %ds", self.group, code, delay)
+            await asyncio.sleep(delay)
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Pede para o processo encerrar (SIGTERM) e mata se demorar demais."""
+        self._stopping = True
+        process = self.process
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    def info(self) -> Dict[str, Any]:
+        alive = self.process is not None and self.process.returncode is None
+        return {
+            'group': self.group,
+            'shard_ids': self.shard_ids,
+            'pid': self.process.pid if self.process else None,
+            'alive': alive,
+            'restarts': self.restarts,
+            'uptime_s': round(time.monotonic() - self.started_at, 1) if alive else 0,
+        }
+
+
+class Coordinator:
+    """Dashboard agregado: consulta todos os processos e roteia por guild."""
+
+    def __init__(self, workers: List[Worker], shard_count: int):
+        self.workers = workers
+        self.shard_count = shard_count
+        self._by_shard = {shard: w for w in workers for shard in w.shard_ids}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        self.app = web.Application()
+        self.app.router.add_get('/api/status', self.handle_status)
+        self.app.router.add_get('/api/metrics', self.handle_metrics)
+        self.app.router.add_get('/api/shards', self.handle_shards)
+        self.app.router.add_get('/api/history/{guild_id}', self.handle_guild_path)
+        self.app.router.add_get('/api/traces/{guild_id}', self.handle_guild_path)
+        self.app.router.add_post('/api/control/{action}', self.handle_guild_body)
+        self.app.router.add_post('/api/queue/add', self.handle_guild_body)
+        self.app.router.add_post('/api/queue/remove', self.handle_guild_body)
+        # Página e arquivos estáticos são iguais em todos: vêm do grupo 0
+        self.app.router.add_route('GET', '/{tail:.*}', self.handle_passthrough)
+
+    def worker_for(self, guild_id: int) -> Worker:
+        return self._by_shard[shard_for_guild(guild_id, self.shard_count)]
+
+    async def _fetch(self, worker: Worker, path: str) -> Optional[Any]:
+        assert self._session is not None
+        try:
+            async with self._session.get(worker.base_url + path) as response:
+                if response.status != 200:
+                    return None
+                return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return None
+
+    async def _gather(self, path: str) -> List[Optional[Any]]:
+        return await asyncio.gather(*(self._fetch(w, path) for w in self.workers))
+
+    async def _proxy(self, worker: Worker, request: web.Request) -> web.StreamResponse:
+        assert self._session is not None
+        body = await request.read()
+        headers = {'Content-Type': request.headers.get('Content-Type', 'application/json')}
+        # O processo vê o IP real do cliente (usado no controle de admissão)
+        headers['X-Forwarded-For'] = request.remote or ''
+        try:
+            async with self._session.request(
+                request.method, worker.base_url + request.path_qs, data=body, headers=headers
+            ) as response:
+                payload = await response.read()
+                out_headers = {}
+                if 'Retry-After' in response.headers:
+                    out_headers['Retry-After'] = response.headers['Retry-After']
+                return web.Response(
+                    status=response.status, body=payload,
+                    content_type=response.content_type, headers=out_headers,
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return web.Response(status=503, text=f"Shard group {worker.group} unavailable")
+
+    async def handle_status(self, request: web.Request) -> web.Response:
+        status: List[Any] = []
+        for result in await self._gather('/api/status'):
+            status.extend(result or [])
+        return web.json_response(status)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """Métricas por grupo; no topo, as do grupo com pior lag (o gargalo)."""
+        groups = {
+            str(w.group): m for w, m in zip(self.workers, await self._gather('/api/metrics')) if m is not None
+        }
+        worst = max(groups.values(), key=lambda m: (m.get('loop') or {}).get('p99_ms', 0), default={})
+        return web.json_response({**worst, 'groups': groups})
+
+    async def handle_shards(self, request: web.Request) -> web.Response:
+        shards = await self._gather('/api/shard')
+        return web.json_response({
+            'shard_count': self.shard_count,
+            'groups': [{**w.info(), 'status': s} for w, s in zip(self.workers, shards)],
+        })
+
+    async def handle_guild_path(self, request: web.Request) -> web.StreamResponse:
+        try:
+            guild_id = int(request.match_info['guild_id'])
+        except ValueError:
+            return web.Response(status=400, text="Invalid Guild ID")
+        return await self._proxy(self.worker_for(guild_id), request)
+
+    async def handle_guild_body(self, request: web.Request) -> web.StreamResponse:
+        try:
+            guild_id = int((await request.json()).get('guild_id'))
+        except (ValueError, TypeError, AttributeError):
+            return web.Response(status=400, text="Invalid Guild ID")
+        return await self._proxy(self.worker_for(guild_id), request)
+
+    async def handle_passthrough(self, request: web.Request) -> web.StreamResponse:
+        return await self._proxy(self.workers[0], request)
+
+    async def start(self, port: int) -> web.AppRunner:
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        await web.TCPSite(runner, '0.0.0.0', port).start()
+        log.info("🌐 Dashboard agregado rodando em http://localhost:%d", port)
+        return runner
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+async def main() -> None:
+    load_dotenv(find_dotenv())
+    LogPipeline(level=os.getenv("LOG_LEVEL", "INFO"), levels=os.getenv("LOG_LEVELS", "")).start()
+    parser = argparse.ArgumentParser(description="Roda o CabaBot em vários processos, um por grupo de shards.")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("SHARD_PROCESSES", os.cpu_count() or 1)))
+    parser.add_argument("--shards", type=int, default=int(os.getenv("SHARD_TOTAL", 0)) or None,
+                        help="Total de shards (padrão: o recomendado pelo Discord)")
+    parser.add_argument("--port", type=int, default=int(os.getenv("DASHBOARD_PORT", 8080)))
+    args = parser.parse_args()
+
+    shard_count = args.shards
+    if shard_count is None:
+        token = (os.getenv("TOKEN") or os.getenv("DISCORD_TOKEN") or "").strip().strip('"').strip("'")
+        if not token:
+            raise SystemExit("TOKEN não encontrado. Defina 'TOKEN' ou passe --shards.")
+        shard_count = await recommended_shards(token)
+        log.info("✅ Discord recomenda %d shard(s)", shard_count)
+
+    data_dir = Path(os.getenv("CABABOT_DATA_DIR") or (SCRIPT_DIR / "data"))
+    compact_shared_logs(data_dir)
+
+    groups = split_groups(shard_count, args.processes)
+    workers = [Worker(i, ids, shard_count, args.port + 1 + i) for i, ids in enumerate(groups)]
+    coordinator = Coordinator(workers, shard_count)
+    runner = await coordinator.start(args.port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C encerra via KeyboardInterrupt
+
+    supervisors = [asyncio.create_task(w.supervise()) for w in workers]
+    try:
+        await stop.wait()
+    finally:
+        log.info("🛑 Encerrando grupos de shards...")
+        await asyncio.gather(*(w.stop() for w in workers))
+        for task in supervisors:
+            task.cancel()
+        await coordinator.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())